@@ -1,19 +1,29 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Response
 import uvicorn
 from pydantic import BaseModel
-from pymongo import MongoClient
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from data_layer import Repository, connect, ndjson_lines, parse_fields
+from search_index import TitleIndex
+from response_cache import ResponseCache
+from recipe_catalog import RecipeCatalog
+from meal_planner import daily_targets, plan_week
+from llm_client import LLMClient
+from llm_cache import LLMCache
+from job_queue import JobQueue, QueueFull
+from store_availability import StoreAvailability
+from ingredient_index import IngredientIndex
+from shopping_list import ITEM_FIELDS, build_shopping_list, ingredient_names, resolve_ingredients, scheduled_recipe_ids
 import os
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
-import random
-import requests
-from openai import OpenAI
 import json
+import asyncio
+import time
 
-import csv
-import re
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 
 
@@ -21,15 +31,58 @@ from fastapi.responses import JSONResponse
 # Load environment variables from .env file
 load_dotenv()
 
-# Connect to MongoDB
+# Connect to MongoDB (MONGODB_DATABASE selects another database, e.g. for benchmarks)
 mongodb_uri = os.getenv("MONGODB_URI")
 OPENAI_KEY = os.getenv("OPENAI_KEY")
-client = MongoClient(mongodb_uri)
-db = client["Sweet_Violet"]
+client, db = connect(mongodb_uri, os.getenv("MONGODB_DATABASE", "Sweet_Violet"))
 items_collection = db["Trader_Joes_Items"]
 recipes_collection = db["Recipes_new"]
 meal_plans_collection = db["MealPlan_Collection"]  # New collection for meal plans
 users_collection = db["Users_Collection"]  # New collection for users
+meal_plan_jobs_collection = db["MealPlan_Jobs"]  # State of background meal-plan jobs
+store_index_collection = db["Store_Index"]  # Store order of the item storeBitmap fields
+store_items_collection = db["Store_Items"]  # Inverted index: store code -> skus sold there
+
+# Async repositories that every CRUD route goes through
+items_repo = Repository(items_collection)
+recipes_repo = Repository(recipes_collection)
+meal_plans_repo = Repository(meal_plans_collection)
+users_repo = Repository(users_collection)
+
+# In-memory title index used by /items/search/, loaded at startup and rebuilt
+# on the recipe catalog's timer
+item_title_index = TitleIndex()
+
+# Per-item store bitmaps for the availability endpoints, loaded at startup and
+# reloaded on the recipe catalog's timer
+store_availability = StoreAvailability()
+# An unknown sku triggers a reload, at most once per this many seconds
+STORE_AVAILABILITY_RELOAD_SECONDS = 30
+
+# Fuzzy ingredient -> item matching for /get-matches over remade_recipes.csv
+# and the item titles, loaded at startup
+ingredient_index = IngredientIndex(
+    ingredient_threshold=float(os.getenv("INGREDIENT_MATCH_THRESHOLD", "0.75")),
+    item_threshold=float(os.getenv("ITEM_MATCH_THRESHOLD", "0.6")),
+)
+
+# LRU + TTL cache for the read-heavy recipe and item lookups. Entries are
+# dropped by the POST/PUT/DELETE handlers of the collection they came from.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+    ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", "300")),
+)
+
+# Columnar in-memory copy of recipes_collection used by the filter and meal-plan
+# endpoints. It is reloaded at startup, after recipe writes and on a timer.
+recipe_catalog = RecipeCatalog()
+RECIPE_CATALOG_REFRESH_SECONDS = int(os.getenv("RECIPE_CATALOG_REFRESH", "300"))
+
+# Shared async OpenAI client, created at startup and closed at shutdown
+llm_client = None
+
+# Meal-plan generator used when the request does not pick one: "llm" or "local"
+DEFAULT_MEAL_PLANNER = os.getenv("MEAL_PLANNER", "llm")
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -41,6 +94,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-After"],  # Pagination cursor for the list endpoints
 )
 
 
@@ -74,6 +128,11 @@ class MealPlan(BaseModel):
     targetNutrition: dict[str, int]
     description: str
 
+class MealPlanJobRequest(BaseModel):
+    preferences: dict
+    limit: int = 70
+    planner: str = None
+
 class User(BaseModel):
     firstName: str
     Username: str
@@ -81,6 +140,222 @@ class User(BaseModel):
     Password: str
 
 
+# Rebuild the item title search index (and the item side of the ingredient
+# index) from the collection
+async def refresh_item_titles():
+    titles = []
+    async for item in items_collection.find({}, {"item_title": 1}):
+        titles.append((str(item["_id"]), item.get("item_title", "")))
+    item_title_index.build(titles)
+    ingredient_index.load_items(titles)
+
+# Item uploads bypass the item endpoints, so the titles are rebuilt on the
+# same schedule as the recipe catalog
+async def keep_item_titles_fresh():
+    while True:
+        await asyncio.sleep(RECIPE_CATALOG_REFRESH_SECONDS)
+        try:
+            await refresh_item_titles()
+        except Exception as e:
+            print(f"Item title index refresh failed: {e}")
+
+@app.on_event("startup")
+async def load_item_title_index():
+    await refresh_item_titles()
+    print(f"Indexed {len(item_title_index)} item titles for search")
+    asyncio.create_task(keep_item_titles_fresh())
+
+
+# Reload the store order and every item's store bitmap. Returns False when
+# there is no store index yet.
+async def refresh_store_availability():
+    store_index = await store_index_collection.find_one({"_id": "trader_joes"})
+    if store_index is None:
+        return False
+    items = []
+    async for item in items_collection.find({"storeBitmap": {"$exists": True}}, {"sku": 1, "storeBitmap": 1}):
+        items.append((str(item["_id"]), item["sku"], item["storeBitmap"]))
+    store_availability.load(store_index["stores"], items)
+    return True
+
+# Uploads and apply_store_deltas.py rewrite the bitmaps (and the store order)
+# behind the API's back, so the availability is reloaded on the same schedule
+# as the recipe catalog
+async def keep_store_availability_fresh():
+    while True:
+        await asyncio.sleep(RECIPE_CATALOG_REFRESH_SECONDS)
+        try:
+            await refresh_store_availability()
+        except Exception as e:
+            print(f"Store availability refresh failed: {e}")
+
+@app.on_event("startup")
+async def load_store_availability():
+    if await refresh_store_availability():
+        print(f"Loaded store availability for {len(store_availability)} items across {len(store_availability.stores)} stores")
+    else:
+        print("No store index found; item store bitmaps will not be decoded")
+    asyncio.create_task(keep_store_availability_fresh())
+
+
+# Items keep their stores as a binary storeBitmap. Responses decode it into the
+# storeCode list, or carry it as hex when the client asks for ?bitmap=true
+# (or the store index is not loaded yet).
+def present_item(item, bitmap=False):
+    store_bitmap = item.get("storeBitmap")
+    if isinstance(store_bitmap, bytes):
+        item = dict(item)
+        if not bitmap and store_availability.stores:
+            del item["storeBitmap"]
+            item["storeCode"] = store_availability.decode(store_bitmap)
+        else:
+            item["storeBitmap"] = store_bitmap.hex()
+    return item
+
+
+# ?fields= for items: storeCode is served from the stored storeBitmap
+def item_projection(fields):
+    projection = parse_fields(fields)
+    if projection and projection.pop("storeCode", None):
+        projection["storeBitmap"] = 1
+    return projection
+
+
+# Item writes send a storeCode list, which is always stored as a bitmap. The
+# collection validator requires storeBitmap, so without a store index to
+# encode against the write is refused.
+async def encode_item_stores(item_dict):
+    if not store_availability.stores:
+        await refresh_store_availability()
+    if not store_availability.stores:
+        raise HTTPException(status_code=503, detail="The store index is not loaded; try again later")
+    try:
+        item_dict["storeBitmap"] = store_availability.encode(item_dict.pop("storeCode"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return item_dict
+
+
+# Keep the Store_Items inverted index in step with an item write. Each store
+# document is upserted, so a store without one yet gets it; previous_sku is the
+# item's sku before a PUT that changed it.
+async def sync_store_items(sku, store_codes, previous_sku=None):
+    store_codes = [int(store_code) for store_code in store_codes]
+    if previous_sku is not None and previous_sku != sku:
+        await store_items_collection.update_many({"skus": previous_sku}, {"$pull": {"skus": previous_sku}})
+    if store_codes:
+        await store_items_collection.bulk_write(
+            [UpdateOne({"_id": store_code}, {"$addToSet": {"skus": sku}}, upsert=True) for store_code in store_codes],
+            ordered=False)
+    await store_items_collection.update_many({"_id": {"$nin": store_codes}, "skus": sku}, {"$pull": {"skus": sku}})
+
+
+# Resolve the ingredients of each recipe to Trader Joe's items (the tjItems
+# field): one batched match lookup over every ingredient, then one item query
+# for all the matched titles
+async def recipe_items(recipes):
+    ingredient_lists = [recipe.get("ingredients") or [] for recipe in recipes]
+    names = [name for ingredients in ingredient_lists for name in ingredient_names(ingredients)]
+    matches = ingredient_index.lookup(names, titles_only=True) if names else []
+    titles = list({match for match, _, source in matches if source is not None})
+    items_by_title = {}
+    if titles:
+        async for item in items_collection.find({"item_title": {"$in": titles}}, {field: 1 for field in ITEM_FIELDS}):
+            items_by_title[item["item_title"]] = item
+    resolved = []
+    offset = 0
+    for ingredients in ingredient_lists:
+        resolved.append(resolve_ingredients(ingredients, matches[offset:offset + len(ingredients)], items_by_title))
+        offset += len(ingredients)
+    return resolved
+
+
+# tjItems for a recipe being written, or None if they could not be resolved.
+# Materializing is best effort: the shopping list resolves a recipe without
+# tjItems on the fly, so a failure here must never fail the write itself.
+async def materialize_recipe(recipe_dict):
+    try:
+        return (await recipe_items([recipe_dict]))[0]
+    except Exception as e:
+        print(f"Could not resolve Trader Joe's items for {recipe_dict.get('Recipe_Name')!r}: {e}")
+        return None
+
+
+# Reload the recipe catalog from the collection
+async def refresh_recipe_catalog():
+    recipes = []
+    async for recipe in recipes_collection.find().sort("_id", 1):
+        recipe["_id"] = str(recipe["_id"])
+        recipes.append(recipe)
+    recipe_catalog.load(recipes)
+
+# Keep the catalog in sync with changes made outside the API (e.g. batch uploads)
+async def keep_recipe_catalog_fresh():
+    while True:
+        await asyncio.sleep(RECIPE_CATALOG_REFRESH_SECONDS)
+        try:
+            await refresh_recipe_catalog()
+        except Exception as e:
+            print(f"Recipe catalog refresh failed: {e}")
+
+@app.on_event("startup")
+async def load_recipe_catalog():
+    await refresh_recipe_catalog()
+    print(f"Loaded {len(recipe_catalog)} recipes into the in-memory catalog")
+    asyncio.create_task(keep_recipe_catalog_fresh())
+
+
+# Create the app-wide LLM client inside the running event loop
+@app.on_event("startup")
+async def create_llm_client():
+    global llm_client
+    if not OPENAI_KEY:
+        print("OPENAI_KEY is not set; meal plans will use the local planner")
+        return
+    llm_client = LLMClient(
+        api_key=OPENAI_KEY,
+        base_url=os.getenv("OPENAI_BASE_URL"),
+        timeout=float(os.getenv("OPENAI_TIMEOUT", "60")),
+        max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "3")),
+        max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+        cache=LLMCache(
+            os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "llm_cache.sqlite3")),
+            ttl_seconds=int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("LLM_CACHE_SIZE", "5000")),
+        ),
+    )
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    if llm_client is not None:
+        await llm_client.close()
+
+
+# Shared handler for the paginated list endpoints. Without ?limit= the whole
+# collection is returned as before; with it, the cursor for the next page is
+# sent back in the X-Next-After header so the body stays a plain list.
+async def list_page(repo, response, limit, after, fields, projection_for=parse_fields):
+    try:
+        documents, next_after = await repo.find_page(limit=limit or 0, after=after, projection=projection_for(fields))
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid after cursor")
+    if next_after:
+        response.headers["X-Next-After"] = next_after
+    return documents
+
+
+# GET hit/miss counters for the response cache
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return response_cache.stats()
+
+# GET hit/miss counters plus tokens and time saved by the LLM response cache
+@app.get("/cache/llm/stats")
+async def get_llm_cache_stats():
+    if llm_client is None or llm_client.cache is None:
+        raise HTTPException(status_code=503, detail="LLM is not configured")
+    return await asyncio.to_thread(llm_client.cache.stats)
+
 @app.get("/api/google-maps-key")
 async def get_google_maps_key():
     google_maps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
@@ -89,20 +364,15 @@ async def get_google_maps_key():
 # User endpoints
 # GET all users
 @app.get("/users/")
-async def get_users():
-    users = []
-    for user in users_collection.find():
-        user["_id"] = str(user["_id"])
-        users.append(user)
-    return users
+async def get_users(response: Response, limit: int = Query(None, ge=1, le=1000), after: str = None, fields: str = None):
+    return await list_page(users_repo, response, limit, after, fields)
 
 # GET a single user by ID
 @app.get("/users/{user_id}")
 async def get_user(user_id: str):
     try:
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await users_repo.find_by_id(user_id)
         if user:
-            user["_id"] = str(user["_id"])
             return user
         raise HTTPException(status_code=404, detail="User not found")
     except Exception as e:
@@ -112,16 +382,16 @@ async def get_user(user_id: str):
 @app.post("/users/")
 async def create_user(user: User):
     user_dict = user.dict()
-    result = users_collection.insert_one(user_dict)
-    return {"inserted_id": str(result.inserted_id)}
+    inserted_id = await users_repo.insert(user_dict)
+    return {"inserted_id": inserted_id}
 
 # PUT (update) an existing user by ID
 @app.put("/users/{user_id}")
 async def update_user(user_id: str, user: User):
     updated_user = user.dict()
     try:
-        result = users_collection.update_one({"_id": ObjectId(user_id)}, {"$set": updated_user})
-        if result.matched_count > 0:
+        matched_count = await users_repo.update_by_id(user_id, updated_user)
+        if matched_count > 0:
             return {"message": "User updated successfully"}
         else:
             raise HTTPException(status_code=404, detail="User not found")
@@ -132,8 +402,8 @@ async def update_user(user_id: str, user: User):
 @app.delete("/users/{user_id}")
 async def delete_user(user_id: str):
     try:
-        result = users_collection.delete_one({"_id": ObjectId(user_id)})
-        if result.deleted_count > 0:
+        deleted_count = await users_repo.delete_by_id(user_id)
+        if deleted_count > 0:
             return {"message": "User deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="User not found")
@@ -142,21 +412,23 @@ async def delete_user(user_id: str):
 
 # GET all items
 @app.get("/items/")
-async def get_items():
-    items = []
-    for item in items_collection.find():
-        item["_id"] = str(item["_id"])
-        items.append(item)
-    return items
+async def get_items(response: Response, limit: int = Query(None, ge=1, le=1000), after: str = None, fields: str = None,
+                    bitmap: bool = False):
+    items = await list_page(items_repo, response, limit, after, fields, item_projection)
+    return [present_item(item, bitmap) for item in items]
 
 # GET a single item by ID
 @app.get("/items/{item_id}")
-async def get_item(item_id: str):
+async def get_item(item_id: str, bitmap: bool = False):
     try:
-        item = items_collection.find_one({"_id": ObjectId(item_id)})
+        cache_key = ResponseCache.make_key("items", item_id=item_id)
+        item = response_cache.get(cache_key)
+        if item is None:
+            item = await items_repo.find_by_id(item_id)
+            if item:
+                response_cache.set(cache_key, item)
         if item:
-            item["_id"] = str(item["_id"])
-            return item
+            return present_item(item, bitmap)
         raise HTTPException(status_code=404, detail="Item not found")
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid item ID")
@@ -164,17 +436,28 @@ async def get_item(item_id: str):
 # POST a new item
 @app.post("/items/")
 async def create_item(item: Item):
-    item_dict = item.dict()
-    result = items_collection.insert_one(item_dict)
-    return {"inserted_id": str(result.inserted_id)}
+    item_dict = await encode_item_stores(item.dict())
+    inserted_id = await items_repo.insert(item_dict)
+    await sync_store_items(item.sku, item.storeCode)
+    response_cache.invalidate("items")
+    item_title_index.add(inserted_id, item.item_title)
+    ingredient_index.set_item(inserted_id, item.item_title)
+    store_availability.set_item(inserted_id, item.sku, item_dict["storeBitmap"])
+    return {"inserted_id": inserted_id}
 
 # PUT (update) an existing item by ID
 @app.put("/items/{item_id}")
 async def update_item(item_id: str, item: Item):
-    updated_item = item.dict()
+    updated_item = await encode_item_stores(item.dict())
     try:
-        result = items_collection.update_one({"_id": ObjectId(item_id)}, {"$set": updated_item})
-        if result.matched_count > 0:
+        previous = await items_repo.find_by_id(item_id)
+        matched_count = await items_repo.update_by_id(item_id, updated_item)
+        response_cache.invalidate("items")
+        if matched_count > 0:
+            await sync_store_items(item.sku, item.storeCode, previous["sku"] if previous else None)
+            item_title_index.add(item_id, item.item_title)
+            ingredient_index.set_item(item_id, item.item_title)
+            store_availability.set_item(item_id, item.sku, updated_item["storeBitmap"])
             return {"message": "Item updated successfully"}
         else:
             raise HTTPException(status_code=404, detail="Item not found")
@@ -185,8 +468,14 @@ async def update_item(item_id: str, item: Item):
 @app.delete("/items/{item_id}")
 async def delete_item(item_id: str):
     try:
-        result = items_collection.delete_one({"_id": ObjectId(item_id)})
-        if result.deleted_count > 0:
+        item = await items_repo.find_by_id(item_id)
+        deleted_count = await items_repo.delete_by_id(item_id)
+        response_cache.invalidate("items")
+        if deleted_count > 0:
+            await sync_store_items(item["sku"], [])
+            item_title_index.remove(item_id)
+            ingredient_index.remove_item(item_id)
+            store_availability.remove_item(item_id)
             return {"message": "Item deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Item not found")
@@ -195,35 +484,95 @@ async def delete_item(item_id: str):
 
 # NEW: GET items by item_title (search)
 @app.get("/items/search/")
-async def search_items(item_title: str):
+async def search_items(item_title: str, limit: int = Query(None, ge=1), bitmap: bool = False):
     try:
-        # Perform a case-insensitive search for items by item_title
-        query = {"item_title": {"$regex": item_title, "$options": "i"}}
-        items = []
-        for item in items_collection.find(query):
-            item["_id"] = str(item["_id"])
-            items.append(item)
-        return items
+        # Rank matches with the in-memory title index, then load just those items
+        if len(item_title_index) > 0:
+            item_ids = item_title_index.search(item_title, limit=limit)
+            items = await items_repo.find_by_ids(item_ids)
+        else:
+            # Fall back to a case-insensitive regex scan if the index is not loaded
+            query = {"item_title": {"$regex": item_title, "$options": "i"}}
+            items = await items_repo.find_all(query, limit=limit or 0)
+        return [present_item(item, bitmap) for item in items]
     except Exception as e:
         raise HTTPException(status_code=400, detail="Error searching for items")
 
+# GET the items sold at one store, optionally within a category. The store's
+# skus come from the Store_Items inverted index built at upload time, so this
+# is one _id lookup plus an indexed sku $in query. Paginated like /items/.
+@app.get("/stores/{store_code}/items")
+async def get_store_items(store_code: int, response: Response, category_1: str = None, category_2: str = None,
+                          limit: int = Query(None, ge=1, le=1000), after: str = None, fields: str = None,
+                          bitmap: bool = False):
+    cache_key = ResponseCache.make_key("items", store_code=store_code, category_1=category_1, category_2=category_2,
+                                       limit=limit, after=after, fields=fields, bitmap=bitmap)
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        store = await store_items_collection.find_one({"_id": store_code})
+        if store is None:
+            raise HTTPException(status_code=404, detail="Store not found")
+        query = {"sku": {"$in": store["skus"]}}
+        if category_1:
+            query["category_1"] = category_1
+        if category_2:
+            query["category_2"] = category_2
+        try:
+            items, next_after = await items_repo.find_page(query, limit=limit or 0, after=after,
+                                                           projection=item_projection(fields))
+        except InvalidId:
+            raise HTTPException(status_code=400, detail="Invalid after cursor")
+        cached = ([present_item(item, bitmap) for item in items], next_after)
+        response_cache.set(cache_key, cached)
+    items, next_after = cached
+    if next_after:
+        response.headers["X-Next-After"] = next_after
+    return items
+
+# GET the skus sold at one store, from the in-memory store bitmaps
+@app.get("/availability/stores/{store_code}")
+async def get_store_skus(store_code: int):
+    result = store_availability.items_at(store_code)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Store not found")
+    item_ids, skus = result
+    return {"store_code": store_code, "count": len(skus), "skus": skus}
+
+# GET the stores that carry every one of a comma separated list of skus
+@app.get("/availability/skus/")
+async def get_stores_with_skus(skus: str):
+    try:
+        sku_list = [int(sku) for sku in skus.split(",") if sku.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="skus must be a comma separated list of integers")
+    if not sku_list:
+        raise HTTPException(status_code=400, detail="No skus given")
+    try:
+        store_codes = store_availability.stores_with_all(sku_list)
+    except KeyError as e:
+        # The sku may have been uploaded since the last reload
+        if (store_availability.loaded_at is not None and
+                time.monotonic() - store_availability.loaded_at < STORE_AVAILABILITY_RELOAD_SECONDS):
+            raise HTTPException(status_code=404, detail=f"Unknown sku {e.args[0]}")
+        await refresh_store_availability()
+        try:
+            store_codes = store_availability.stores_with_all(sku_list)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=f"Unknown sku {e.args[0]}")
+    return {"skus": sku_list, "count": len(store_codes), "stores": store_codes}
+
 # Recipe endpoints
 # GET all recipes
 @app.get("/recipes/")
-async def get_recipes():
-    recipes = []
-    for recipe in recipes_collection.find():
-        recipe["_id"] = str(recipe["_id"])
-        recipes.append(recipe)
-    return recipes
+async def get_recipes(response: Response, limit: int = Query(None, ge=1, le=1000), after: str = None, fields: str = None):
+    return await list_page(recipes_repo, response, limit, after, fields)
 
 # GET a single recipe by ID
 @app.get("/recipes/{recipe_id}")
 async def get_recipe(recipe_id: str):
     try:
-        recipe = recipes_collection.find_one({"_id": ObjectId(recipe_id)})
+        recipe = await recipes_repo.find_by_id(recipe_id)
         if recipe:
-            recipe["_id"] = str(recipe["_id"])
             return recipe
         raise HTTPException(status_code=404, detail="Recipe not found")
     except Exception as e:
@@ -232,50 +581,80 @@ async def get_recipe(recipe_id: str):
 # GET recipe by recipe name
 @app.get("/recipes/search/")
 async def get_recipe_by_name(recipe_name: str = Query(..., description="Name of the recipe to search for")):
-    recipe = recipes_collection.find_one({"Recipe_Name": recipe_name})
+    cache_key = ResponseCache.make_key("recipes", recipe_name=recipe_name)
+    recipe = response_cache.get(cache_key)
+    if recipe is None:
+        recipe = await recipes_repo.find_one({"Recipe_Name": recipe_name})
+        if recipe:
+            response_cache.set(cache_key, recipe)
     if recipe:
-        recipe["_id"] = str(recipe["_id"])  # Convert ObjectId to string for JSON compatibility
         return recipe
     raise HTTPException(status_code=404, detail="Recipe not found")
 
 # Get list of recipes based on certain filters
 @app.get("/recipes/filter/")
 async def get_filtered_recipes(calories: float = None, cuisine_type: str = None, meal_type: str = None, diet_label: str = None,health_label: str=None):
-    query = {}
-    if calories is not None:
-        query["calories"] = {"$lte": calories}
-    if cuisine_type:
-        query["cuisine_type"] = cuisine_type
-    if meal_type:
-        query["meal_type"] = meal_type
-    if diet_label:
-        query["diet_labels"] = diet_label
-    if health_label:
-        query["health_labels"] = health_label
-
-    recipes = []
-    for recipe in recipes_collection.find(query):
-        recipe["_id"] = str(recipe["_id"])
-        recipes.append(recipe)
+    cache_key = ResponseCache.make_key("recipes", calories=calories, cuisine_type=cuisine_type, meal_type=meal_type,
+                                       diet_label=diet_label, health_label=health_label)
+    recipes = response_cache.get(cache_key)
+    if recipes is not None:
+        return recipes
+
+    # Answer from the in-memory catalog, falling back to Mongo if it is empty
+    if len(recipe_catalog) > 0:
+        recipes = recipe_catalog.filter(calories=calories, cuisine_type=cuisine_type, meal_type=meal_type,
+                                        diet_label=diet_label, health_label=health_label)
+    else:
+        query = {}
+        if calories is not None:
+            query["calories"] = {"$lte": calories}
+        if cuisine_type:
+            query["cuisine_type"] = cuisine_type
+        if meal_type:
+            query["meal_type"] = meal_type
+        if diet_label:
+            query["diet_labels"] = diet_label
+        if health_label:
+            query["health_labels"] = health_label
+        recipes = await recipes_repo.find_all(query)
+    response_cache.set(cache_key, recipes)
     return recipes
 
 # POST a new recipe
 @app.post("/recipes/")
 async def create_recipe(recipe: Edamam):
     recipe_dict = recipe.dict()
-    result = recipes_collection.insert_one(recipe_dict)
-    return {"inserted_id": str(result.inserted_id)}
+    tj_items = await materialize_recipe(recipe_dict)
+    if tj_items is not None:
+        recipe_dict["tjItems"] = tj_items
+    try:
+        inserted_id = await recipes_repo.insert(recipe_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A recipe with this name already exists")
+    await refresh_recipe_catalog()
+    response_cache.invalidate("recipes")
+    return {"inserted_id": inserted_id}
 
 # PUT (update) an existing recipe by ID
 @app.put("/recipes/{recipe_id}")
 async def update_recipe(recipe_id: str, recipe: Edamam):
     updated_recipe = recipe.dict()
+    tj_items = await materialize_recipe(updated_recipe)
+    if tj_items is not None:
+        updated_recipe["tjItems"] = tj_items
     try:
-        result = recipes_collection.update_one({"_id": ObjectId(recipe_id)}, {"$set": updated_recipe})
-        if result.matched_count > 0:
+        matched_count = await recipes_repo.update_by_id(recipe_id, updated_recipe)
+        if tj_items is None:
+            # Drop the old tjItems so they cannot describe the previous ingredients
+            await recipes_collection.update_one({"_id": ObjectId(recipe_id)}, {"$unset": {"tjItems": ""}})
+        await refresh_recipe_catalog()
+        response_cache.invalidate("recipes")
+        if matched_count > 0:
             return {"message": "Recipe updated successfully"}
         else:
             raise HTTPException(status_code=404, detail="Recipe not found")
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A recipe with this name already exists")
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid recipe ID")
 
@@ -283,31 +662,52 @@ async def update_recipe(recipe_id: str, recipe: Edamam):
 @app.delete("/recipes/{recipe_id}")
 async def delete_recipe(recipe_id: str):
     try:
-        result = recipes_collection.delete_one({"_id": ObjectId(recipe_id)})
-        if result.deleted_count > 0:
+        deleted_count = await recipes_repo.delete_by_id(recipe_id)
+        await refresh_recipe_catalog()
+        response_cache.invalidate("recipes")
+        if deleted_count > 0:
             return {"message": "Recipe deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Recipe not found")
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid recipe ID")
 
+# Bulk export endpoints
+# Collections that can be exported in full for offline analytics
+export_repos = {
+    "items": items_repo,
+    "recipes": recipes_repo,
+}
+
+# Items are exported in the same format as /items/ (storeCode lists)
+async def present_items(documents):
+    async for document in documents:
+        yield present_item(document)
+
+# GET a whole collection as newline-delimited JSON, streamed from the cursor
+@app.get("/export/{collection_name}")
+async def export_collection(collection_name: str, fields: str = None):
+    repo = export_repos.get(collection_name)
+    if repo is None:
+        raise HTTPException(status_code=404, detail="Unknown export collection")
+    if collection_name == "items":
+        documents = present_items(repo.stream(projection=item_projection(fields)))
+    else:
+        documents = repo.stream(projection=parse_fields(fields))
+    return StreamingResponse(ndjson_lines(documents), media_type="application/x-ndjson")
+
 # Meal Plan endpoints
 # GET all meal plans
 @app.get("/meal_plans/")
-async def get_meal_plans():
-    meal_plans = []
-    for meal_plan in meal_plans_collection.find():
-        meal_plan["_id"] = str(meal_plan["_id"])
-        meal_plans.append(meal_plan)
-    return meal_plans
+async def get_meal_plans(response: Response, limit: int = Query(None, ge=1, le=1000), after: str = None, fields: str = None):
+    return await list_page(meal_plans_repo, response, limit, after, fields)
 
 # GET a single meal plan by ID
 @app.get("/meal_plans/{meal_plan_id}")
 async def get_meal_plan(meal_plan_id: str):
     try:
-        meal_plan = meal_plans_collection.find_one({"_id": ObjectId(meal_plan_id)})
+        meal_plan = await meal_plans_repo.find_by_id(meal_plan_id)
         if meal_plan:
-            meal_plan["_id"] = str(meal_plan["_id"])
             return meal_plan
         raise HTTPException(status_code=404, detail="Meal Plan not found")
     except Exception as e:
@@ -317,16 +717,16 @@ async def get_meal_plan(meal_plan_id: str):
 @app.post("/meal_plans/")
 async def create_meal_plan(meal_plan: MealPlan):
     meal_plan_dict = meal_plan.dict()
-    result = meal_plans_collection.insert_one(meal_plan_dict)
-    return {"inserted_id": str(result.inserted_id)}
+    inserted_id = await meal_plans_repo.insert(meal_plan_dict)
+    return {"inserted_id": inserted_id}
 
 # PUT (update) an existing meal plan by ID
 @app.put("/meal_plans/{meal_plan_id}")
 async def update_meal_plan(meal_plan_id: str, meal_plan: MealPlan):
     updated_meal_plan = meal_plan.dict()
     try:
-        result = meal_plans_collection.update_one({"_id": ObjectId(meal_plan_id)}, {"$set": updated_meal_plan})
-        if result.matched_count > 0:
+        matched_count = await meal_plans_repo.update_by_id(meal_plan_id, updated_meal_plan)
+        if matched_count > 0:
             return {"message": "Meal Plan updated successfully"}
         else:
             raise HTTPException(status_code=404, detail="Meal Plan not found")
@@ -337,24 +737,84 @@ async def update_meal_plan(meal_plan_id: str, meal_plan: MealPlan):
 @app.delete("/meal_plans/{meal_plan_id}")
 async def delete_meal_plan(meal_plan_id: str):
     try:
-        result = meal_plans_collection.delete_one({"_id": ObjectId(meal_plan_id)})
-        if result.deleted_count > 0:
+        deleted_count = await meal_plans_repo.delete_by_id(meal_plan_id)
+        if deleted_count > 0:
             return {"message": "Meal Plan deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Meal Plan not found")
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid meal plan ID")
 
+# GET the shopping list for a meal plan in one call: every Trader Joe's item
+# its scheduledDates need, with quantities summed over all the scheduled meals.
+# Recipes are read with their materialized tjItems; any recipe not yet
+# materialized is resolved on the fly.
+@app.get("/meal_plans/{meal_plan_id}/shopping_list")
+async def get_shopping_list(meal_plan_id: str):
+    try:
+        meal_plan = await meal_plans_repo.find_by_id(meal_plan_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid meal plan ID")
+    if not meal_plan:
+        raise HTTPException(status_code=404, detail="Meal Plan not found")
+
+    recipe_ids = scheduled_recipe_ids(meal_plan.get("scheduledDates"))
+    try:
+        recipes = await recipes_repo.find_by_ids(list(dict.fromkeys(recipe_ids)))
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Meal Plan has an invalid recipe ID")
+    unmaterialized = [recipe for recipe in recipes if "tjItems" not in recipe]
+    if unmaterialized:
+        for recipe, entries in zip(unmaterialized, await recipe_items(unmaterialized)):
+            recipe["tjItems"] = entries
+
+    items_by_recipe = {recipe["_id"]: recipe["tjItems"] for recipe in recipes}
+    return {
+        "meal_plan_id": meal_plan_id,
+        "meals": len(recipe_ids),
+        "recipes": len(recipes),
+        "missing_recipes": sorted(set(recipe_ids) - set(items_by_recipe)),
+        **build_shopping_list(recipe_ids, items_by_recipe),
+    }
+
+# Meal-plan generators a request can pick with ?planner=
+MEAL_PLANNERS = ("llm", "local")
+
+# Check the planner and the optional daily "targetCalories" before any work is
+# done; returns the planner name. Bad values are the client's fault (400).
+def check_meal_plan_request(preferences, planner):
+    planner = (planner or DEFAULT_MEAL_PLANNER).lower()
+    if planner not in MEAL_PLANNERS:
+        raise HTTPException(status_code=400, detail=f"planner must be one of {', '.join(MEAL_PLANNERS)}")
+    target = preferences.get("targetCalories")
+    if target not in (None, ""):
+        try:
+            valid = not isinstance(target, bool) and 0 < float(target) < float("inf")
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            raise HTTPException(status_code=400, detail="targetCalories must be a positive number")
+    return planner
+
+# Build a meal plan with the in-process optimizer instead of the LLM.
+# preferences may carry a daily "targetCalories"; otherwise the default target is used.
+def local_meal_plan(recipes, preferences):
+    targets = daily_targets(float(preferences.get("targetCalories") or daily_targets()["calories"]))
+    try:
+        return plan_week(recipes, targets)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="No recipes match the preferences")
+
+# The JSON object in an LLM meal-plan reply; raises ValueError when it is not one
+def parse_meal_plan_reply(content):
+    response_data = json.loads(content.strip('json').strip(''))
+    if not isinstance(response_data, dict):
+        raise ValueError("The meal-plan reply is not a JSON object")
+    return response_data
+
 # AI ENDPOINTS
-# Using OPENAI to generate meal plan
-@app.get("/recipes/random/{packaged_preferences}/")
-async def get_random_recipes(
-        cuisine_type: str = None,
-        meal_type: str = None,
-        diet_label: str = None,
-        limit: int = 70,
-        packaged_preferences: str = None
-):
+# Build a one-week meal plan for the given preferences, with the LLM or the local planner
+async def generate_meal_plan(preferences, limit=70, planner=None):
 
     # Function to Simplify the recipe data
     def simplify_meal_data(meal_data,n):
@@ -364,32 +824,27 @@ async def get_random_recipes(
             "calories": meal_data["calories"],
         }
 
-    #Unpack User Preferences from Frontend
-    try:
-        preferences = json.loads(packaged_preferences)
-    except json.JSONDecodeError:
-        return {"error": "Invalid packaged_preferences format"}
+    planner = check_meal_plan_request(preferences, planner)
 
     query = {}
     if preferences["gender"]:
         query["health_labels"] = preferences["gender"]
 
-    #construct recipe list for AI
-    recipes = []
-    a=0
-    for recipe in recipes_collection.find(query):
-        recipe["_id"] = str(recipe["_id"])
-        recipes.append(recipe)
-        a+=1
-        if (a==limit):
-            break
+    #construct recipe list for AI (the local planner can consider every match)
+    recipe_limit = 0 if planner == "local" else limit
+    if len(recipe_catalog) > 0:
+        recipes = recipe_catalog.filter(limit=recipe_limit, health_label=query.get("health_labels"))
+    else:
+        recipes = await recipes_repo.find_all(query, limit=recipe_limit)
+    a = len(recipes)
+
+    # Local planner: pick the 21 meals in-process against a calorie/macro target
+    if planner == "local" or llm_client is None:
+        return local_meal_plan(recipes, preferences)
 
     simplified_recipes = [simplify_meal_data(recipe, n) for n, recipe in enumerate(recipes)]
 
     #Feed Recipe List to AI for Response
-    api_key = os.getenv("OPENAI_KEY")
-    client = OpenAI(api_key=api_key)
-
     prompt = (
         f"You will receive {a} recipes. Construct a one-week meal plan based on those recipes and the user's preferences."
         f"The user currently feels {preferences['selectedMood']} and wants to {preferences['selectedEmotionGoal']} with the help of the meal plan you generate."
@@ -398,11 +853,13 @@ async def get_random_recipes(
         "Make sure that every No. you recommend to me can be found in recipes I am sending you. Ensure the response contains only valid JSON. Avoid comments or additional text."
     )
 
-    # Create a response using the GPT-4o mini model
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    # Create a response using the GPT-4o mini model; only replies that parse
+    # into a meal list are cached
+    response_content = await llm_client.chat(
         messages=[{"role": "system", "content": prompt},
                   {"role": "user", "content": str(simplified_recipes)}],
+        cache_inputs={"preferences": preferences, "recipes": [recipe["_id"] for recipe in recipes]},
+        validate=lambda content: isinstance(parse_meal_plan_reply(content).get("meals"), list),
         temperature=1,
         max_tokens=8000,
         top_p=1,
@@ -410,11 +867,13 @@ async def get_random_recipes(
         presence_penalty=0
     )
 
-    # Convert the response to a dictionary and extract the content
-    response_dict = response.model_dump()
-    response_message = response_dict["choices"][0]["message"]["content"].strip('json').strip('')
-
-    response_data = json.loads(response_message)
+    # Fall back to the local planner when the model does not return valid JSON
+    try:
+        response_data = parse_meal_plan_reply(response_content)
+        if not isinstance(response_data.get("meals"), list):
+            raise ValueError("No meals list in the reply")
+    except (ValueError, AttributeError):
+        return local_meal_plan(recipes, preferences)
     meal_ids = []
     for n in response_data["meals"]:
         try:
@@ -454,8 +913,71 @@ async def get_random_recipes(
     return meal_plan
 
 
-@app.post("/openai/explanations")
-async def generate_general_explanation(data: dict):
+# Using OPENAI to generate meal plan
+@app.get("/recipes/random/{packaged_preferences}/")
+async def get_random_recipes(
+        cuisine_type: str = None,
+        meal_type: str = None,
+        diet_label: str = None,
+        limit: int = 70,
+        packaged_preferences: str = None,
+        planner: str = None
+):
+    #Unpack User Preferences from Frontend
+    try:
+        preferences = json.loads(packaged_preferences)
+    except json.JSONDecodeError:
+        return {"error": "Invalid packaged_preferences format"}
+
+    return await generate_meal_plan(preferences, limit, planner)
+
+
+# Background meal-plan jobs
+# Submitting returns a job id right away instead of holding the connection open
+# for the whole LLM round trip; clients then poll (or long-poll) for the result.
+async def run_meal_plan_job(payload):
+    return await generate_meal_plan(payload["preferences"], payload["limit"], payload["planner"])
+
+meal_plan_jobs = JobQueue(
+    meal_plan_jobs_collection,
+    run_meal_plan_job,
+    workers=int(os.getenv("MEAL_PLAN_WORKERS", "4")),
+    max_pending=int(os.getenv("MEAL_PLAN_MAX_PENDING", "100")),
+    # Jobs untouched this long are treated as left behind by a stopped process
+    orphan_seconds=int(os.getenv("MEAL_PLAN_ORPHAN_SECONDS", "600")),
+    # Finished jobs are deleted by a TTL index after this long
+    finished_ttl_seconds=int(os.getenv("MEAL_PLAN_JOB_TTL", "86400")),
+)
+
+@app.on_event("startup")
+async def start_meal_plan_jobs():
+    await meal_plan_jobs.start()
+
+@app.on_event("shutdown")
+async def stop_meal_plan_jobs():
+    await meal_plan_jobs.stop()
+
+# POST preferences to start generating a meal plan
+@app.post("/meal_plan_jobs/", status_code=202)
+async def submit_meal_plan_job(job_request: MealPlanJobRequest):
+    check_meal_plan_request(job_request.preferences, job_request.planner)
+    try:
+        job_id, deduplicated = await meal_plan_jobs.submit(job_request.dict())
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Too many meal plans are being generated, try again shortly")
+    return {"job_id": job_id, "deduplicated": deduplicated}
+
+# GET the state of a meal-plan job; ?wait=N long-polls up to N seconds for it to finish
+@app.get("/meal_plan_jobs/{job_id}")
+async def get_meal_plan_job(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    job = await meal_plan_jobs.get(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# Build the chat messages and cache inputs for a meal-plan explanation
+def explanation_request(data):
     meal_details = data.get("mealDetails")
     selected_emotion_goal = data.get("selectedEmotionGoal")
     selected_mood = data.get("selectedMood")
@@ -470,24 +992,52 @@ async def generate_general_explanation(data: dict):
     Provide a general explanation for why this meal plan aligns with my emotional goal.
     """
 
-    api_key = os.getenv("OPENAI_KEY")
-    client = OpenAI(api_key=api_key)
+    messages = [{"role": "system",
+                 "content": "You are an assistant providing general explanations for meal plans. It's best if explanations are concise and based on nutrition evidence."},
+                {"role": "user", "content": prompt}]
+    cache_inputs = {"mealDetails": meal_details, "selectedEmotionGoal": selected_emotion_goal,
+                    "selectedMood": selected_mood}
+    return messages, cache_inputs
+
+# Sampling parameters shared by the JSON and streaming explanation endpoints
+EXPLANATION_PARAMS = {
+    "temperature": 1,
+    "max_tokens": 8000,
+    "top_p": 1,
+    "frequency_penalty": 0,
+    "presence_penalty": 0,
+}
+
+# Server-sent events for a streamed explanation: one "token" event per chunk,
+# then a "done" event carrying the same body as the JSON response
+async def explanation_events(messages, cache_inputs):
+    parts = []
+    try:
+        async for token in llm_client.stream_chat(messages, cache_inputs=cache_inputs, **EXPLANATION_PARAMS):
+            parts.append(token)
+            yield f"event: token\ndata: {json.dumps({'delta': token})}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        return
+    response_message = "".join(parts).strip('json').strip('')
+    yield f"event: done\ndata: {json.dumps({'generalExplanation': response_message})}\n\n"
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "system",
-                   "content": "You are an assistant providing general explanations for meal plans. It's best if explanations are concise and based on nutrition evidence."},
-                  {"role": "user", "content": prompt}],
-        temperature=1,
-        max_tokens=8000,
-        top_p=1,
-        frequency_penalty=0,
-        presence_penalty=0
-    )
+# With ?stream=true the explanation is sent as server-sent events while it is
+# generated; without it the response is the original {"generalExplanation": ...}
+@app.post("/openai/explanations")
+async def generate_general_explanation(data: dict, stream: bool = False):
+    if llm_client is None:
+        raise HTTPException(status_code=503, detail="LLM is not configured")
+
+    messages, cache_inputs = explanation_request(data)
+
+    if stream:
+        return StreamingResponse(explanation_events(messages, cache_inputs), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-    response_dict = response.model_dump()
-    response_message = response_dict["choices"][0]["message"]["content"].strip('json').strip('')
-    print(response_message)
+    response_content = await llm_client.chat(messages, cache_inputs=cache_inputs, **EXPLANATION_PARAMS)
+
+    response_message = response_content.strip('json').strip('')
     return {"generalExplanation": response_message}
 
 
@@ -499,47 +1049,29 @@ if __name__ == "__main__":
 
 
 #endpoint to convert edamam ingredients to real trader joe's ingredients
-# Load CSV into a dictionary
-ingredient_matches = {}
-
-def load_csv(file_path):
-    """Load CSV data into a dictionary, ignoring numbers at the beginning of keys and normalizing whitespace."""
-    global ingredient_matches
-    with open(file_path, mode='r', encoding='utf-8') as csvfile:
-        reader = csv.reader(csvfile)
-        next(reader)  # Skip the header row
-        for row in reader:
-            if len(row) >= 2:
-                # Remove leading numbers, dots, and spaces from the ingredient names
-                key = re.sub(r"^\d+\.\s*", "", row[0]).strip().lower()  # Normalize key by stripping trailing spaces
-                value = row[1].strip()  # Normalize value by stripping spaces
-
-                # If the value starts with "No direct match. Substitute:", remove it
-                if value.startswith("No direct match. Substitute:"):
-                    value = value.replace("No direct match. Substitute:", "").strip()
-
-                ingredient_matches[key.lower()] = value  # Store normalized, lowercase key for case-insensitive matching
-    print(f"Loaded Ingredients: {ingredient_matches}")
-
-# Load the CSV data
+# Load the precomputed matches into the ingredient index
 current_dir = os.path.dirname(__file__)  # Directory of the current file
 csv_path = os.path.join(current_dir, "../Product/remade_recipes.csv")  # Relative path to the CSV file
 
-load_csv(csv_path)
+ingredient_index.load_matches_csv(csv_path)
+print(f"Loaded {len(ingredient_index.matches)} precomputed ingredient matches")
 
 # Define input model
 class IngredientRequest(BaseModel):
     ingredients: list[str]
 
-# API endpoint
+# API endpoint. Async like the item write handlers, so a lookup never runs in
+# the threadpool while an item write is changing the index on the event loop
 @app.post("/get-matches")
-def get_matches(request: IngredientRequest):
+async def get_matches(request: IngredientRequest, details: bool = False):
     """Return matching items or substitutes for the given ingredients."""
-    results = {}
-    for ingredient in request.ingredients:
-        # Normalize input ingredient by stripping spaces and converting to lowercase
-        normalized_ingredient = ingredient.strip().lower()
-        match = ingredient_matches.get(normalized_ingredient, "No match found")
-        results[ingredient] = match
-    return {"results": results}
-
+    matches = ingredient_index.lookup(request.ingredients)
+    results = {ingredient: match for ingredient, (match, _, _) in zip(request.ingredients, matches)}
+    if not details:
+        return {"results": results}
+    # ?details=true also reports how each ingredient was matched and how closely
+    return {
+        "results": results,
+        "details": {ingredient: {"match": match, "score": score, "source": source}
+                    for ingredient, (match, score, source) in zip(request.ingredients, matches)},
+    }
@@ -0,0 +1,100 @@
+import json
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+# Convert the Mongo ObjectId to a string so the document is JSON compatible
+def stringify_id(document):
+    document["_id"] = str(document["_id"])
+    return document
+
+
+# Binary fields (item store bitmaps) are written as hex, anything else as str
+def json_default(value):
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+# Encode documents from Repository.stream() as newline-delimited JSON
+async def ndjson_lines(documents):
+    async for document in documents:
+        yield json.dumps(document, default=json_default) + "\n"
+
+
+# Turn a comma separated ?fields= value into a Mongo projection
+def parse_fields(fields):
+    if not fields:
+        return None
+    return {field.strip(): 1 for field in fields.split(",") if field.strip()}
+
+
+# Async data-access layer shared by every CRUD route in api.py.
+# Motor talks to MongoDB without blocking the event loop, so one slow query
+# no longer stalls every other request on the same uvicorn worker.
+class Repository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_all(self, query=None, limit=0):
+        documents = []
+        async for document in self.collection.find(query or {}, limit=limit):
+            documents.append(stringify_id(document))
+        return documents
+
+    # Keyset pagination: documents come back in _id order starting after the
+    # `after` cursor, so each page is an index range scan instead of a skip.
+    # Returns the page and the cursor for the next one (None on the last page).
+    async def find_page(self, query=None, limit=0, after=None, projection=None):
+        query = dict(query or {})
+        if after:
+            query["_id"] = {"$gt": ObjectId(after)}
+        documents = []
+        async for document in self.collection.find(query, projection).sort("_id", 1).limit(limit):
+            documents.append(stringify_id(document))
+        next_after = None
+        if limit and len(documents) == limit:
+            next_after = documents[-1]["_id"]
+        return documents, next_after
+
+    # Yield documents straight off the Mongo cursor one batch at a time, so a
+    # full-collection export never holds more than one batch in memory
+    async def stream(self, query=None, projection=None, batch_size=500):
+        async for document in self.collection.find(query or {}, projection, batch_size=batch_size):
+            yield stringify_id(document)
+
+    async def find_one(self, query):
+        document = await self.collection.find_one(query)
+        if document:
+            stringify_id(document)
+        return document
+
+    # Fetch the documents for a list of ids, keeping the order of the ids
+    async def find_by_ids(self, document_ids):
+        documents = await self.find_all({"_id": {"$in": [ObjectId(document_id) for document_id in document_ids]}})
+        by_id = {document["_id"]: document for document in documents}
+        return [by_id[document_id] for document_id in document_ids if document_id in by_id]
+
+    # ObjectId() raises InvalidId for malformed ids; the routes turn that into a 400
+    async def find_by_id(self, document_id):
+        return await self.find_one({"_id": ObjectId(document_id)})
+
+    async def insert(self, document):
+        result = await self.collection.insert_one(document)
+        return str(result.inserted_id)
+
+    async def update_by_id(self, document_id, fields):
+        result = await self.collection.update_one({"_id": ObjectId(document_id)}, {"$set": fields})
+        return result.matched_count
+
+    async def delete_by_id(self, document_id):
+        result = await self.collection.delete_one({"_id": ObjectId(document_id)})
+        return result.deleted_count
+
+
+# Build the async client and return it with the database handle; api.py wraps
+# each collection it uses in a Repository
+def connect(mongodb_uri, database_name="Sweet_Violet"):
+    client = AsyncIOMotorClient(mongodb_uri)
+    return client, client[database_name]
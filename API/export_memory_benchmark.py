@@ -0,0 +1,176 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+# Peak server memory of the /export/* endpoints at several collection sizes.
+# For every size the items and recipes collections of a scratch database are
+# filled with that many synthetic documents, the API is started against it
+# (MONGODB_DATABASE) and each export is streamed to the end while the server's
+# peak RSS is read from /proc (Linux only). A streamed export should peak at
+# the same RSS whatever the size; /items/ builds the whole list in memory and
+# is measured alongside for contrast.
+#   python API/export_memory_benchmark.py --sizes 10000,100000
+# The scratch database is dropped at the end unless --keep is given.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+PATHS = ["/export/items", "/export/recipes", "/items/"]
+
+CATEGORIES = ["Snacks & Sweets", "From The Freezer", "For the Pantry", "Fresh Prepared Foods"]
+CUISINES = ["american", "italian", "mexican", "asian", "french"]
+NUTRIENT_CODES = ["ENERC_KCAL", "FAT", "CHOCDF", "PROCNT", "FIBTG", "SUGAR", "NA", "CA"]
+
+
+def make_item(rng, n):
+    return {
+        "item_title": f"Item {n} {rng.choice(CATEGORIES)}",
+        "sku": n,
+        "storeBitmap": bytes(rng.getrandbits(8) for _ in range(73)),
+        "sales_size": round(rng.uniform(1, 32), 1),
+        "sales_uom_description": "Oz",
+        "retail_price": round(rng.uniform(0.99, 14.99), 2),
+        "fun_tags": ["Family Style", "Midday Snacks"],
+        "item_characteristics": ["Kosher"],
+        "category_1": rng.choice(CATEGORIES),
+        "category_2": "Cereals",
+    }
+
+
+def make_recipe(rng, n):
+    return {
+        "Recipe_Name": f"Recipe {n}",
+        "calories": round(rng.uniform(100, 1200), 1),
+        "cuisine_type": rng.choice(CUISINES),
+        "meal_type": rng.choice(["breakfast", "lunch/dinner"]),
+        "diet_labels": ["Balanced"],
+        "ingredients": [{"name": f"ingredient {rng.randrange(2000)}", "quantity": "1", "unit": "cup"}
+                        for _ in range(10)],
+        "nutrients": {code: round(rng.uniform(0, 100), 2) for code in NUTRIENT_CODES},
+    }
+
+
+def seed(db, size, batch_size=5000):
+    rng = random.Random(size)
+    for collection_name, make in (("Trader_Joes_Items", make_item), ("Recipes_new", make_recipe)):
+        collection = db[collection_name]
+        collection.drop()
+        for offset in range(0, size, batch_size):
+            collection.insert_many([make(rng, n) for n in range(offset, min(size, offset + batch_size))],
+                                   ordered=False)
+
+
+def proc_status_kb(pid, field):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+# Writing 5 to clear_refs resets the peak RSS (VmHWM) to the current RSS, so
+# each export is measured without the startup loading that came before it
+def reset_peak(pid):
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def start_server(database, port):
+    python_path = os.pathsep.join(filter(None, [os.path.dirname(current_dir), os.environ.get("PYTHONPATH")]))
+    env = dict(os.environ, MONGODB_DATABASE=database, RECIPE_CATALOG_REFRESH="86400", PYTHONPATH=python_path)
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=current_dir, env=env, stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("The API server exited during startup")
+        try:
+            httpx.get(base_url + "/cache/stats", timeout=1).raise_for_status()
+            return server, base_url
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("The API server did not start within 300s")
+
+
+# Stream one response to the end without keeping it. Returns (bytes, seconds).
+def download(client, path):
+    received = 0
+    start = time.perf_counter()
+    with client.stream("GET", path) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            received += len(chunk)
+    return received, time.perf_counter() - start
+
+
+def measure(database, size, port):
+    server, base_url = start_server(database, port)
+    rows = []
+    try:
+        with httpx.Client(base_url=base_url, timeout=None) as client:
+            for path in PATHS:
+                exact = reset_peak(server.pid)
+                before_kb = proc_status_kb(server.pid, "VmRSS")
+                received, seconds = download(client, path)
+                peak_kb = proc_status_kb(server.pid, "VmHWM")
+                rows.append((size, path, received, seconds, before_kb, peak_kb, exact))
+    finally:
+        server.terminate()
+        server.wait()
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'documents':>10}  {'path':<16} {'MB sent':>9} {'seconds':>8} {'RSS before':>11} {'peak RSS':>9} {'growth':>8}")
+    for size, path, received, seconds, before_kb, peak_kb, exact in rows:
+        note = "" if exact else "  (peak since startup)"
+        print(f"{size:>10}  {path:<16} {received / 1e6:>9.1f} {seconds:>8.2f} {before_kb / 1024:>9.0f}MB "
+              f"{peak_kb / 1024:>7.0f}MB {(peak_kb - before_kb) / 1024:>6.0f}MB{note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the peak server RSS of the export endpoints")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma separated documents per collection")
+    parser.add_argument("--database", default="Sweet_Violet_Export_Benchmark", help="Scratch database to fill")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database afterwards")
+    args = parser.parse_args()
+
+    if args.database == "Sweet_Violet":
+        print("Refusing to overwrite the Sweet_Violet database; pick a scratch --database")
+        exit(1)
+    if not os.path.exists("/proc/self/status"):
+        print("Peak RSS is read from /proc; run this on Linux")
+        exit(1)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGODB_URI"))
+    db = client[args.database]
+    rows = []
+    try:
+        for size in sizes:
+            start = time.perf_counter()
+            seed(db, size)
+            print(f"Seeded {size} items and {size} recipes in {time.perf_counter() - start:.1f}s")
+            rows.extend(measure(args.database, size, args.port))
+    finally:
+        if not args.keep:
+            client.drop_database(args.database)
+    print_rows(rows)
+
+
+if __name__ == "__main__":
+    main()
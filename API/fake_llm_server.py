@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import json
+import re
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+# Local stand-in for the OpenAI chat completions API, for exercising the LLM
+# code paths (client pooling, response cache, streaming, meal-plan jobs)
+# without a key or network. Start it, then point the API at it:
+#   python API/fake_llm_server.py --port 9000 --latency 2
+#   OPENAI_KEY=fake OPENAI_BASE_URL=http://localhost:9000/v1 python API/api.py
+
+app = FastAPI()
+settings = {"latency": 1.0}
+call_count = {"completions": 0}
+
+
+# Meal-plan prompts get a valid plan over the recipes they were sent; anything
+# else gets a short explanation
+def fake_reply(messages):
+    system_prompt = messages[0]["content"] if messages else ""
+    match = re.search(r"You will receive (\d+) recipes", system_prompt)
+    if match:
+        recipe_count = max(int(match.group(1)), 1)
+        return json.dumps({"meals": [n % recipe_count for n in range(21)]})
+    return "This meal plan balances protein, complex carbohydrates and healthy fats to support a steady mood."
+
+
+def usage_for(messages, reply):
+    prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+    completion_tokens = len(reply.split())
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    call_count["completions"] += 1
+    messages = body.get("messages", [])
+    reply = fake_reply(messages)
+    created = int(time.time())
+
+    if body.get("stream"):
+        async def events():
+            words = reply.split(" ")
+            for n, word in enumerate(words):
+                await asyncio.sleep(settings["latency"] / len(words))
+                chunk = {"id": "fake", "object": "chat.completion.chunk", "created": created, "model": body.get("model"),
+                         "choices": [{"index": 0, "delta": {"content": word if n == 0 else " " + word}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {"id": "fake", "object": "chat.completion.chunk", "created": created, "model": body.get("model"),
+                     "choices": [], "usage": usage_for(messages, reply)}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await asyncio.sleep(settings["latency"])
+    return {
+        "id": "fake",
+        "object": "chat.completion",
+        "created": created,
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": usage_for(messages, reply),
+    }
+
+
+# Number of completions served, to check cache hits and job deduplication
+@app.get("/calls")
+async def get_calls():
+    return call_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds each completion takes")
+    args = parser.parse_args()
+    settings["latency"] = args.latency
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,124 @@
+import csv
+
+# The n-gram matcher is shared with the offline matching pipeline in Product/;
+# run the API with the repository root on PYTHONPATH
+from Product.item_matcher import NgramIndex, ngram_counts, normalize
+
+
+NO_MATCH = "No match found"
+
+
+# Served ingredient -> Trader Joe's item matching for /get-matches.
+# An ingredient is looked up in three steps: the exact normalized name in the
+# precomputed matches from remade_recipes.csv, then the closest precomputed
+# ingredient ("fresh lemons" -> "lemons"), then the closest item title in the
+# live catalog. The two fuzzy steps score the whole request batch at once
+# against n-gram indexes, so a request costs two vectorized passes however
+# many ingredients it carries.
+class IngredientIndex:
+    def __init__(self, ingredient_threshold=0.75, item_threshold=0.6):
+        self.ingredient_threshold = ingredient_threshold
+        self.item_threshold = item_threshold
+        self.matches = {}
+        self.ingredients = []
+        self.ingredient_index = NgramIndex([])
+        self.item_titles = {}  # item _id -> title
+        self.titles = []
+        self.title_set = set()
+        self.title_index = NgramIndex([])
+        self.dirty = False
+
+    # rows: (ingredient, match) pairs; later rows win, as with the old dict,
+    # except that a "none" never replaces a real match for the same ingredient
+    def load_matches(self, rows):
+        matches = {}
+        for ingredient, match in rows:
+            key = normalize(ingredient)
+            match = match.strip()
+            # Older match files prefix substitutes with this note
+            if match.startswith("No direct match. Substitute:"):
+                match = match.replace("No direct match. Substitute:", "").strip()
+            if key and not (match.lower() == "none" and key in matches):
+                matches[key] = match
+        self.matches = matches
+        self.ingredients = list(matches)
+        self.ingredient_index = NgramIndex(self.ingredients)
+
+    # The first two columns are ingredient and match; later columns are ignored
+    def load_matches_csv(self, path):
+        with open(path, mode="r", encoding="utf-8") as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader)  # Skip the header row
+            self.load_matches((row[0], row[1]) for row in reader if len(row) >= 2)
+
+    # items: (item_id, title) tuples
+    def load_items(self, items):
+        self.item_titles = {item_id: title.strip() for item_id, title in items if title}
+        self._rebuild()
+
+    def set_item(self, item_id, title):
+        self.item_titles[item_id] = title.strip()
+        self.dirty = True
+
+    def remove_item(self, item_id):
+        if self.item_titles.pop(item_id, None) is not None:
+            self.dirty = True
+
+    # Item writes only mark the title index stale; it is rebuilt on the next lookup
+    def _rebuild(self):
+        self.titles = sorted(set(self.item_titles.values()))
+        self.title_set = set(self.titles)
+        self.title_index = NgramIndex(self.titles)
+        self.dirty = False
+
+    # (match, score, source) for every ingredient, in order. source is "exact",
+    # "ingredient" (closest precomputed ingredient), "catalog" or None.
+    # With titles_only every match is an item title: precomputed answers that
+    # are free text (LLM substitutes) are snapped onto the closest title.
+    def lookup(self, ingredients, titles_only=False):
+        if self.dirty:
+            self._rebuild()
+        keys = [normalize(ingredient) for ingredient in ingredients]
+        results = [None] * len(keys)
+        pending = []
+        for position, key in enumerate(keys):
+            # An ingredient the pipeline could not match ("none") defers to the catalog
+            if key in self.matches and self.matches[key].lower() != "none":
+                results[position] = (self.matches[key], 1.0, "exact")
+            else:
+                pending.append(position)
+        if not pending:
+            return self._snap_to_titles(results) if titles_only else results
+
+        query_counts = [ngram_counts(keys[position]) for position in pending]
+        nearest_ingredients = self._best(self.ingredient_index, query_counts)
+        nearest_titles = self._best(self.title_index, query_counts)
+        for position, (row, score), (title_row, title_score) in zip(pending, nearest_ingredients, nearest_titles):
+            # A neighbour the pipeline could not match ("none") defers to the catalog
+            if score >= self.ingredient_threshold and self.matches[self.ingredients[row]].lower() != "none":
+                results[position] = (self.matches[self.ingredients[row]], round(score, 3), "ingredient")
+            elif title_score >= self.item_threshold:
+                results[position] = (self.titles[title_row], round(title_score, 3), "catalog")
+            else:
+                results[position] = (NO_MATCH, round(max(score, title_score), 3), None)
+        return self._snap_to_titles(results) if titles_only else results
+
+    def _snap_to_titles(self, results):
+        positions = [position for position, (match, _, source) in enumerate(results)
+                     if source is not None and match not in self.title_set]
+        free_text = [results[position][0] for position in positions]
+        nearest = self._best(self.title_index, [ngram_counts(text) for text in free_text])
+        for position, text, (row, score) in zip(positions, free_text, nearest):
+            if text.lower() != "none" and score >= self.item_threshold:
+                results[position] = (self.titles[row], results[position][1], results[position][2])
+            else:
+                results[position] = (NO_MATCH, results[position][1], None)
+        return results
+
+    @staticmethod
+    def _best(index, query_counts):
+        if len(index) == 0:
+            return [(None, 0.0)] * len(query_counts)
+        scores = index.scores_from_counts(query_counts)
+        rows = scores.argmax(axis=1)
+        return list(zip(rows.tolist(), scores[range(len(query_counts)), rows].tolist()))
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+# Raised when the queue already holds max_pending jobs
+class QueueFull(Exception):
+    pass
+
+
+# Background job queue for slow work such as meal-plan generation.
+# Submitting returns a job id at once; a fixed pool of worker tasks runs the
+# handler and the job state (queued -> running -> done/failed, plus the result)
+# is written to a Mongo collection, so any API worker can answer a status poll.
+# Identical payloads submitted while a job is still in flight share that job.
+# Jobs left queued or running by a process that stopped are picked up again
+# once they have gone orphan_seconds without an update, and finished jobs are
+# removed by a TTL index after finished_ttl_seconds.
+class JobQueue:
+    def __init__(self, collection, handler, workers=4, max_pending=100,
+                 orphan_seconds=600, finished_ttl_seconds=24 * 3600):
+        self.collection = collection
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.orphan_seconds = orphan_seconds
+        self.finished_ttl_seconds = finished_ttl_seconds
+        self.queue = None
+        self.tasks = []
+        self.in_flight = {}
+        self.finished_events = {}
+        # Held across the dedup check, the job insert and the enqueue, so
+        # concurrent submits cannot both pass the checks while one is inserting
+        self.lock = asyncio.Lock()
+
+    # Same payload in any key order always gives the same key
+    @staticmethod
+    def make_key(payload):
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    # Start the workers and the orphan sweep; call from inside the running event loop
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        try:
+            await self.collection.create_index("finished_at", name="finished_at_ttl",
+                                               expireAfterSeconds=self.finished_ttl_seconds)
+        except Exception as e:
+            print(f"Could not create the job TTL index: {e}")
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._sweep_orphans()))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    # Queue a job, or return the in-flight job for an identical payload.
+    # Returns (job_id, deduplicated).
+    async def submit(self, payload):
+        key = self.make_key(payload)
+        async with self.lock:
+            if key in self.in_flight:
+                return self.in_flight[key], True
+            if self.queue.full():
+                raise QueueFull()
+
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            await self.collection.insert_one({
+                "_id": job_id,
+                "key": key,
+                "payload": payload,
+                "status": "queued",
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            })
+            try:
+                self._enqueue(job_id, key, payload)
+            except asyncio.QueueFull:
+                # Leave no orphan "queued" document behind
+                await self.collection.delete_one({"_id": job_id})
+                raise QueueFull()
+        return job_id, False
+
+    # Undoes its own bookkeeping when the queue is full
+    def _enqueue(self, job_id, key, payload):
+        self.in_flight[key] = job_id
+        self.finished_events[job_id] = asyncio.Event()
+        try:
+            self.queue.put_nowait((job_id, key, payload))
+        except asyncio.QueueFull:
+            self.in_flight.pop(key, None)
+            self.finished_events.pop(job_id, None)
+            raise
+
+    # Put a job back on the queue, or fail it when the queue has no room.
+    # Returns True if it was queued.
+    async def _requeue(self, job):
+        job_id, key, payload = job["_id"], job.get("key"), job.get("payload")
+        async with self.lock:
+            if payload is None:
+                reason = "Interrupted by a server restart"
+            elif key in self.in_flight:
+                reason = f"Interrupted by a server restart; job {self.in_flight[key]} has the same request"
+            else:
+                try:
+                    self._enqueue(job_id, key, payload)
+                    return True
+                except asyncio.QueueFull:
+                    reason = "Interrupted by a server restart and the queue is full"
+        await self._finish(job_id, status="failed", error=reason)
+        return False
+
+    # Claim jobs that have gone orphan_seconds without an update. Jobs this
+    # process is running are skipped; the claim is one atomic update, so two
+    # API processes never take the same job.
+    async def recover_orphans(self):
+        requeued = failed = 0
+        while True:
+            now = time.time()
+            job = await self.collection.find_one_and_update(
+                {"status": {"$in": ["queued", "running"]}, "updated_at": {"$lt": now - self.orphan_seconds},
+                 "_id": {"$nin": list(self.finished_events)}},
+                {"$set": {"status": "queued", "updated_at": now}},
+            )
+            if job is None:
+                break
+            if await self._requeue(job):
+                requeued += 1
+            else:
+                failed += 1
+        if requeued or failed:
+            print(f"Recovered orphaned jobs: {requeued} re-queued, {failed} failed")
+        return requeued, failed
+
+    async def _sweep_orphans(self):
+        while True:
+            try:
+                await self.recover_orphans()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Orphaned job sweep failed: {e}")
+            await asyncio.sleep(max(self.orphan_seconds / 2, 1))
+
+    # Read a job. With wait > 0 this long-polls: it returns as soon as the job
+    # finishes, or with the current state once `wait` seconds have passed.
+    async def get(self, job_id, wait=0):
+        deadline = time.monotonic() + wait
+        while True:
+            job = await self.collection.find_one({"_id": job_id}, {"key": 0, "payload": 0})
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in ("done", "failed") or remaining <= 0:
+                return job
+            event = self.finished_events.get(job_id)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                # Job is owned by another API process; poll the stored state
+                await asyncio.sleep(min(0.5, remaining))
+
+    async def _set_status(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        await self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+    # Record a final state; finished_at is what the TTL index expires on
+    async def _finish(self, job_id, **fields):
+        await self._set_status(job_id, finished_at=datetime.now(timezone.utc), **fields)
+
+    async def _worker(self):
+        while True:
+            job_id, key, payload = await self.queue.get()
+            try:
+                await self._set_status(job_id, status="running")
+                result = await self.handler(payload)
+                await self._finish(job_id, status="done", result=result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # HTTPException carries its message in .detail
+                await self._finish(job_id, status="failed", error=str(getattr(e, "detail", e)))
+            finally:
+                self.in_flight.pop(key, None)
+                event = self.finished_events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+                self.queue.task_done()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+# Persistent cache for LLM completions, stored in SQLite so it survives restarts
+# and is shared by every worker on the host.
+# Entries are keyed on a hash of the model, the canonical prompt inputs (mood,
+# goals, recipe ids, ...) and the sampling parameters. They expire after a TTL,
+# and the least recently used ones are evicted once the table is over size.
+# Each entry keeps the token count and latency of the original call, so a hit
+# can report how many tokens and how much time it saved.
+# The calls block on disk, so async code should run them with asyncio.to_thread;
+# a lock keeps those threads from using the connection at the same time.
+class LLMCache:
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " total_tokens INTEGER NOT NULL,"
+            " latency_seconds REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.latency_saved_seconds = 0.0
+
+    # Same inputs in any key order always give the same key
+    @staticmethod
+    def make_key(model, inputs, params):
+        canonical = json.dumps({"model": model, "inputs": inputs, "params": params},
+                               sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    # With validate, an entry it rejects (e.g. written before the caller checked
+    # its answers) is dropped and counted as a miss
+    def get(self, key, validate=None):
+        with self.lock:
+            now = time.time()
+            row = self.connection.execute(
+                "SELECT response, total_tokens, latency_seconds, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[3] + self.ttl_seconds < now:
+                self.misses += 1
+                return None
+            response, total_tokens, latency_seconds, _ = row
+            if validate is not None and not validate(response):
+                self.connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.connection.commit()
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+            self.tokens_saved += total_tokens
+            self.latency_saved_seconds += latency_seconds
+            return response
+
+    def set(self, key, response, total_tokens, latency_seconds):
+        with self.lock:
+            now = time.time()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, total_tokens, latency_seconds, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, total_tokens, latency_seconds, now, now),
+            )
+            self.evict(now)
+            self.connection.commit()
+
+    # Drop expired entries, then the least recently used ones above max_entries
+    def evict(self, now):
+        self.connection.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.connection.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,125 @@
+import asyncio
+import random
+import time
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+
+# Errors worth retrying: the request may succeed if sent again a moment later
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+# One async OpenAI client shared by the whole app.
+# The underlying httpx pool keeps connections to the API open between calls,
+# every call has a timeout, a semaphore caps how many completions run at once,
+# and transient failures are retried with exponential backoff plus jitter.
+# Create it inside the running event loop (e.g. in a startup handler) so the
+# semaphore belongs to the loop that serves requests.
+# With an LLMCache attached, calls that pass cache_inputs are answered from the
+# cache when the same inputs were seen before. Cache reads and writes run in a
+# worker thread so SQLite never blocks the event loop.
+class LLMClient:
+    def __init__(self, api_key, base_url=None, model="gpt-4o-mini", timeout=60.0,
+                 max_retries=3, max_concurrency=8, backoff_seconds=0.5, cache=None):
+        self.model = model
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=timeout,
+        )
+        # Retries are handled here so the backoff and the semaphore work together
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout,
+                                  max_retries=0, http_client=http_client)
+
+    # Send a chat completion and return the message text. cache_inputs should
+    # hold the values the prompt is built from, so equal inputs share an entry.
+    # validate(content) -> bool decides whether an answer may be cached (and
+    # whether a cached one may be served); without it any non-empty answer is.
+    async def chat(self, messages, cache_inputs=None, validate=None, **params):
+        cache_key = None
+        if self.cache is not None and cache_inputs is not None:
+            cache_key = self.cache.make_key(self.model, cache_inputs, params)
+            cached = await self._cached(cache_key, validate)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
+        async with self.semaphore:
+            response = await self._create_with_retries(messages, **params)
+        content = response.choices[0].message.content
+        if cache_key is not None and self._cacheable(content, validate):
+            total_tokens = response.usage.total_tokens if response.usage else 0
+            await asyncio.to_thread(self.cache.set, cache_key, content, total_tokens, time.perf_counter() - start)
+        return content
+
+    # Stream a chat completion, yielding text chunks as the model produces them.
+    # A cached answer is yielded in one piece. Retries only cover opening the
+    # stream; once tokens have been sent a failure is raised to the caller.
+    async def stream_chat(self, messages, cache_inputs=None, validate=None, **params):
+        cache_key = None
+        if self.cache is not None and cache_inputs is not None:
+            cache_key = self.cache.make_key(self.model, cache_inputs, params)
+            cached = await self._cached(cache_key, validate)
+            if cached is not None:
+                yield cached
+                return
+
+        start = time.perf_counter()
+        parts = []
+        total_tokens = 0
+        async with self.semaphore:
+            stream = await self._create_with_retries(
+                messages, stream=True, stream_options={"include_usage": True}, **params
+            )
+            async for chunk in stream:
+                if chunk.usage:
+                    total_tokens = chunk.usage.total_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+
+        content = "".join(parts)
+        if cache_key is not None and self._cacheable(content, validate):
+            await asyncio.to_thread(self.cache.set, cache_key, content, total_tokens, time.perf_counter() - start)
+
+    async def _cached(self, cache_key, validate):
+        check = None if validate is None else (lambda content: self._cacheable(content, validate))
+        return await asyncio.to_thread(self.cache.get, cache_key, check)
+
+    # A validator that raises counts as rejecting the answer
+    @staticmethod
+    def _cacheable(content, validate):
+        if not content:
+            return False
+        if validate is None:
+            return True
+        try:
+            return bool(validate(content))
+        except Exception:
+            return False
+
+    # Callers hold the semaphore, so a call waiting out its backoff keeps its slot
+    async def _create_with_retries(self, messages, **params):
+        attempt = 0
+        while True:
+            try:
+                return await self.client.chat.completions.create(
+                    model=self.model, messages=messages, timeout=self.timeout, **params
+                )
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt) + random.uniform(0, self.backoff_seconds)
+                print(f"LLM call failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def close(self):
+        await self.client.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+# Load benchmark for the API: N simultaneous clients hammer one endpoint and we
+# report throughput and latency percentiles. Start the server first, e.g.
+#   python API/api.py
+#   python API/load_benchmark.py --path /recipes/filter/?meal_type=breakfast --clients 150
+
+# One simulated client sends its share of requests back to back
+async def run_client(client, path, requests_per_client, latencies, errors):
+    for _ in range(requests_per_client):
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            errors.append(path)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_benchmark(base_url, path, clients, requests_per_client):
+    latencies = []
+    errors = []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            run_client(client, path, requests_per_client, latencies, errors)
+            for _ in range(clients)
+        ])
+        elapsed = time.perf_counter() - start
+
+    print(f"Endpoint: {path}")
+    print(f"Clients: {clients}, requests per client: {requests_per_client}")
+    print(f"Completed: {len(latencies)}, errors: {len(errors)}, wall time: {elapsed:.2f}s")
+    if latencies:
+        print(f"Throughput: {len(latencies) / elapsed:.1f} req/s")
+        print(f"Latency p50: {percentile(latencies, 50) * 1000:.1f} ms, "
+              f"p95: {percentile(latencies, 95) * 1000:.1f} ms, "
+              f"p99: {percentile(latencies, 99) * 1000:.1f} ms, "
+              f"mean: {statistics.mean(latencies) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load benchmark for the Sweet Violet API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/recipes/")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20, help="Requests sent by each client")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.base_url, args.path, args.clients, args.requests))
@@ -0,0 +1,88 @@
+import csv
+import os
+import random
+import re
+import time
+
+from ingredient_index import IngredientIndex, NO_MATCH
+from load_benchmark import percentile
+
+
+# Benchmark /get-matches lookups in-process: the fuzzy ingredient index against
+# the old exact dict lookup, over batches of real recipe ingredients. Half of
+# each batch is reworded ("fresh", plurals, typos) the way recipe text varies,
+# which is where the exact lookup answered "No match found".
+
+current_dir = os.path.dirname(__file__)
+matches_path = os.path.join(current_dir, "../Product/remade_recipes.csv")
+items_path = os.path.join(current_dir, "../Trader_Joes/Cleaned_trader_joes_items.csv")
+recipes_path = os.path.join(current_dir, "../Edamam/recipes.csv")
+
+PREFIXES = ["fresh ", "chopped ", "2 cups ", "organic ", "large "]
+
+
+def load_titles(path):
+    with open(path, mode="r", encoding="latin1") as csvfile:
+        return [(str(n), row["item_title"]) for n, row in enumerate(csv.DictReader(csvfile))]
+
+
+def load_recipe_ingredients(path):
+    with open(path, mode="r", encoding="latin1") as csvfile:
+        reader = csv.DictReader(csvfile)
+        names = set()
+        for row in reader:
+            row = {key.strip(): value for key, value in row.items() if key}
+            for i in range(1, 16):
+                name = (row.get(f"ingredient_{i}_name") or "").strip()
+                if name:
+                    names.add(name)
+        return sorted(names)
+
+
+# The dict the endpoint used to build: leading numbers stripped, lowercased
+def load_exact_matches(path):
+    with open(path, mode="r", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader)
+        return {re.sub(r"^\d+\.\s*", "", row[0]).strip().lower(): row[1] for row in reader if len(row) >= 2}
+
+
+def reword(ingredient, rng):
+    choice = rng.randrange(3)
+    if choice == 0:
+        return rng.choice(PREFIXES) + ingredient
+    if choice == 1:
+        return ingredient + "s" if not ingredient.endswith("s") else ingredient[:-1]
+    # Drop one letter, as a typo would
+    position = rng.randrange(len(ingredient))
+    return ingredient[:position] + ingredient[position + 1:]
+
+
+if __name__ == "__main__":
+    rng = random.Random(7)
+    index = IngredientIndex()
+    start = time.perf_counter()
+    index.load_matches_csv(matches_path)
+    index.load_items(load_titles(items_path))
+    print(f"Indexed {len(index.matches)} precomputed matches and {len(index.titles)} item titles "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    ingredients = load_recipe_ingredients(recipes_path)
+    exact = load_exact_matches(matches_path)
+
+    for batch_size in [1, 15, 50, 200]:
+        timings = []
+        hits_old = 0
+        hits_new = 0
+        total = 0
+        for _ in range(200):
+            batch = [reword(name, rng) if rng.random() < 0.5 else name for name in rng.sample(ingredients, batch_size)]
+            begin = time.perf_counter()
+            results = index.lookup(batch)
+            timings.append(time.perf_counter() - begin)
+            hits_new += sum(match != NO_MATCH for match, _, _ in results)
+            hits_old += sum(name.strip().lower() in exact for name in batch)
+            total += batch_size
+        print(f"batch {batch_size:>3}: p50 {percentile(timings, 50) * 1000:.2f} ms, "
+              f"p99 {percentile(timings, 99) * 1000:.2f} ms, "
+              f"answered {hits_new / total:.0%} (exact lookup {hits_old / total:.0%})")
@@ -0,0 +1,97 @@
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import ConnectionFailure
+
+from ingredient_index import IngredientIndex
+from shopping_list import ITEM_FIELDS, ingredient_names, resolve_ingredients
+
+# Ingest stage that writes each recipe's resolved Trader Joe's items (tjItems:
+# sku, price and size per ingredient) onto the recipe documents, so the API can
+# serve recipes and shopping lists without matching anything per request.
+# Ingredients are resolved with the same index as /get-matches, a batch of
+# recipes per lookup, and only recipes whose tjItems changed are written, so
+# the stage can be re-run after every catalog or match update.
+
+current_dir = os.path.dirname(__file__)
+
+
+def materialize(recipes_collection, index, items_by_title, batch_size=500, force=False):
+    recipes = 0
+    written = 0
+    ingredients_total = 0
+    ingredients_matched = 0
+    start = time.perf_counter()
+    batch = []
+
+    def flush():
+        nonlocal written, ingredients_total, ingredients_matched
+        names = [name for recipe in batch for name in ingredient_names(recipe.get("ingredients") or [])]
+        matches = index.lookup(names, titles_only=True) if names else []
+        operations = []
+        offset = 0
+        for recipe in batch:
+            ingredients = recipe.get("ingredients") or []
+            entries = resolve_ingredients(ingredients, matches[offset:offset + len(ingredients)], items_by_title)
+            offset += len(ingredients)
+            ingredients_total += len(entries)
+            ingredients_matched += sum(1 for entry in entries if entry["sku"] is not None)
+            if force or recipe.get("tjItems") != entries:
+                operations.append(UpdateOne({"_id": recipe["_id"]}, {"$set": {"tjItems": entries}}))
+        if operations:
+            written += recipes_collection.bulk_write(operations, ordered=False).modified_count
+        batch.clear()
+        print(f"{recipes} recipes ({recipes / (time.perf_counter() - start):.0f} recipes/sec), {written} updated")
+
+    for recipe in recipes_collection.find({}, {"ingredients": 1, "tjItems": 1}, batch_size=batch_size):
+        recipes += 1
+        batch.append(recipe)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    share = ingredients_matched / ingredients_total if ingredients_total else 0
+    print(f"Materialized {recipes} recipes in {elapsed:.2f}s: {written} updated, {recipes - written} unchanged; "
+          f"{ingredients_matched}/{ingredients_total} ingredients ({share:.0%}) resolved to an item")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the resolved Trader Joe's items onto every recipe")
+    parser.add_argument("--collection", default="Recipes_new")
+    parser.add_argument("--matches", default=os.path.join(current_dir, "../Product/remade_recipes.csv"),
+                        help="Precomputed ingredient matches")
+    parser.add_argument("--batch-size", type=int, default=500, help="Recipes per lookup and bulk_write")
+    parser.add_argument("--force", action="store_true", help="Rewrite tjItems even when unchanged")
+    args = parser.parse_args()
+
+    # MongoDB connection setup
+    load_dotenv()
+    client = MongoClient(os.getenv('MONGODB_URI'))
+    try:
+        client.admin.command('ping')
+    except ConnectionFailure as e:
+        print(f"Could not connect to MongoDB: {e}")
+        exit(1)
+    db = client["Sweet_Violet"]
+
+    items_by_title = {}
+    for item in db["Trader_Joes_Items"].find({}, {field: 1 for field in ITEM_FIELDS}):
+        items_by_title[item["item_title"]] = item
+    index = IngredientIndex(
+        ingredient_threshold=float(os.getenv("INGREDIENT_MATCH_THRESHOLD", "0.75")),
+        item_threshold=float(os.getenv("ITEM_MATCH_THRESHOLD", "0.6")),
+    )
+    index.load_matches_csv(args.matches)
+    index.load_items((str(item["_id"]), title) for title, item in items_by_title.items())
+    print(f"Loaded {len(index.matches)} precomputed matches and {len(items_by_title)} items")
+
+    materialize(db[args.collection], index, items_by_title, args.batch_size, args.force)
+
+
+if __name__ == "__main__":
+    main()
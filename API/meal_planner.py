@@ -0,0 +1,125 @@
+import numpy as np
+
+
+# Nutrients the planner balances, and the targetNutrition key each one fills
+PLAN_NUTRIENTS = [("ENERC_KCAL", "calories"), ("PROCNT", "protein"), ("CHOCDF", "carbs"), ("FAT", "fat")]
+
+# Daily target used when the user has not given one: 2000 kcal split
+# 30% protein / 40% carbs / 30% fat
+DEFAULT_DAILY_CALORIES = 2000
+MACRO_SPLIT = {"protein": (0.30, 4), "carbs": (0.40, 4), "fat": (0.30, 9)}
+
+DAYS = 7
+MEALS_PER_DAY = ["breakfast", "lunch", "dinner"]
+
+# Cost added each time a recipe is reused, so the week is not one dish 21 times
+REPEAT_PENALTY = 0.05
+MAX_PASSES = 10
+
+
+# Daily calorie/macro target in grams, in the same shape as targetNutrition
+def daily_targets(calories=DEFAULT_DAILY_CALORIES):
+    targets = {"calories": int(calories)}
+    for macro, (share, kcal_per_gram) in MACRO_SPLIT.items():
+        targets[macro] = int(round(calories * share / kcal_per_gram))
+    return targets
+
+
+def nutrient_matrix(recipes):
+    matrix = np.zeros((len(recipes), len(PLAN_NUTRIENTS)))
+    for row, recipe in enumerate(recipes):
+        nutrients = recipe.get("nutrients") or {}
+        for column, (code, _) in enumerate(PLAN_NUTRIENTS):
+            try:
+                matrix[row, column] = float(nutrients.get(code) or 0)
+            except (TypeError, ValueError):
+                pass
+    return matrix
+
+
+# Recipes allowed in each slot: breakfasts in the morning, everything else later.
+# If a meal type has no recipes, any recipe can fill the slot.
+def slot_candidates(recipes):
+    is_breakfast = np.array(["breakfast" in str(recipe.get("meal_type", "")).lower() for recipe in recipes])
+    breakfast = np.flatnonzero(is_breakfast)
+    other = np.flatnonzero(~is_breakfast)
+    everything = np.arange(len(recipes))
+    candidates = []
+    for _ in range(DAYS):
+        candidates.append(breakfast if len(breakfast) else everything)
+        candidates.append(other if len(other) else everything)
+        candidates.append(other if len(other) else everything)
+    return candidates
+
+
+# Cost of swapping each candidate into one slot: squared relative deviation of
+# the weekly totals from the weekly target, plus the repeat penalty. Computed
+# for every candidate at once.
+def swap_costs(totals, current_vector, candidate_vectors, weekly_target, use_counts, candidates, current):
+    new_totals = totals - current_vector + candidate_vectors
+    deviation = ((new_totals - weekly_target) / weekly_target) ** 2
+    repeats = use_counts[candidates] - (candidates == current)
+    return deviation.sum(axis=1) + REPEAT_PENALTY * repeats
+
+
+# Pick 21 meals (7 days x breakfast/lunch/dinner) whose summed calories and
+# macros land as close as possible to the weekly target. A greedy pass fills
+# the slots in order, then local search re-optimizes one slot at a time until
+# no single swap improves the plan. Ties go to the lowest index, so the same
+# recipes and target always produce the same plan.
+def plan_week(recipes, targets=None):
+    if not recipes:
+        raise ValueError("No recipes available to plan with")
+    targets = targets or daily_targets()
+    matrix = nutrient_matrix(recipes)
+    weekly_target = np.array([max(targets[key], 1) * DAYS for _, key in PLAN_NUTRIENTS], dtype=float)
+    candidates = slot_candidates(recipes)
+    use_counts = np.zeros(len(recipes), dtype=int)
+    totals = np.zeros(len(PLAN_NUTRIENTS))
+    slots = []
+
+    # Greedy fill: aim each slot at the remaining target spread over the rest of the week
+    total_slots = len(candidates)
+    for slot, slot_rows in enumerate(candidates):
+        remaining = total_slots - slot
+        goal = totals + (weekly_target - totals) / remaining
+        deviation = (((totals + matrix[slot_rows] - goal) / weekly_target) ** 2).sum(axis=1)
+        cost = deviation + REPEAT_PENALTY * use_counts[slot_rows]
+        choice = slot_rows[int(np.argmin(cost))]
+        slots.append(choice)
+        use_counts[choice] += 1
+        totals += matrix[choice]
+
+    # Local search: best single-slot swap until nothing improves
+    for _ in range(MAX_PASSES):
+        improved = False
+        for slot, slot_rows in enumerate(candidates):
+            current = slots[slot]
+            current_cost = swap_costs(totals, matrix[current], matrix[[current]], weekly_target,
+                                      use_counts, np.array([current]), current)[0]
+            costs = swap_costs(totals, matrix[current], matrix[slot_rows], weekly_target,
+                               use_counts, slot_rows, current)
+            best = int(np.argmin(costs))
+            if costs[best] < current_cost - 1e-12:
+                choice = slot_rows[best]
+                totals += matrix[choice] - matrix[current]
+                use_counts[current] -= 1
+                use_counts[choice] += 1
+                slots[slot] = choice
+                improved = True
+        if not improved:
+            break
+
+    meal_ids = [recipes[row]["_id"] for row in slots]
+    scheduled_dates = []
+    for day in range(DAYS):
+        entry = {"day": str(day + 1)}
+        for meal_number, meal_name in enumerate(MEALS_PER_DAY):
+            entry[meal_name] = meal_ids[day * len(MEALS_PER_DAY) + meal_number]
+        scheduled_dates.append(entry)
+
+    return {
+        "meals": meal_ids,
+        "scheduledDates": scheduled_dates,
+        "targetNutrition": targets,
+    }
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+# Nutrient codes stored on every recipe (same order as the Edamam pipeline)
+NUTRIENT_CODES = ["ENERC_KCAL", "FAT", "FASAT", "FATRN", "FAMS", "FAPU",
+                  "CHOCDF", "FIBTG", "SUGAR", "PROCNT", "CHOLE", "NA", "CA",
+                  "MG", "K", "FE", "ZN", "P", "VITA_RAE", "VITC",
+                  "VITD", "TOCPHA", "VITK1", "WATER"]
+
+# Categorical fields that get one row mask per distinct value
+LABEL_FIELDS = ["cuisine_type", "meal_type", "diet_labels", "health_labels"]
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# Columnar in-memory copy of the recipe collection.
+# Calories and the 24 nutrient codes live in float arrays and every label value
+# (cuisine, meal type, each diet/health label) has a boolean row mask, so a
+# filter is a handful of vectorized ANDs instead of a Mongo round trip.
+class RecipeCatalog:
+    def __init__(self):
+        self.recipes = []
+        self.calories = np.empty(0)
+        self.nutrients = np.empty((0, len(NUTRIENT_CODES)))
+        self.label_masks = {field: {} for field in LABEL_FIELDS}
+
+    def __len__(self):
+        return len(self.recipes)
+
+    # Build every array first and swap them in together, so requests served
+    # during a refresh always see one consistent snapshot
+    def load(self, recipes):
+        count = len(recipes)
+        calories = np.array([to_float(recipe.get("calories")) for recipe in recipes], dtype=float)
+        nutrients = np.full((count, len(NUTRIENT_CODES)), np.nan)
+        label_masks = {field: {} for field in LABEL_FIELDS}
+
+        for row, recipe in enumerate(recipes):
+            recipe_nutrients = recipe.get("nutrients") or {}
+            for column, code in enumerate(NUTRIENT_CODES):
+                nutrients[row, column] = to_float(recipe_nutrients.get(code))
+            for field in LABEL_FIELDS:
+                values = recipe.get(field)
+                if values is None:
+                    continue
+                if not isinstance(values, list):
+                    values = [values]
+                for value in values:
+                    if value not in label_masks[field]:
+                        label_masks[field][value] = np.zeros(count, dtype=bool)
+                    label_masks[field][value][row] = True
+
+        self.recipes = recipes
+        self.calories = calories
+        self.nutrients = nutrients
+        self.label_masks = label_masks
+
+    def nutrient_column(self, code):
+        return self.nutrients[:, NUTRIENT_CODES.index(code)]
+
+    # Row indexes matching the same filters as the Mongo query in get_filtered_recipes.
+    # A missing calorie value compares as NaN and never passes `calories <=`,
+    # which matches Mongo's $lte skipping null fields.
+    def filter_rows(self, calories=None, cuisine_type=None, meal_type=None, diet_label=None, health_label=None):
+        mask = np.ones(len(self.recipes), dtype=bool)
+        if calories is not None:
+            mask &= self.calories <= calories
+        for field, value in [("cuisine_type", cuisine_type), ("meal_type", meal_type),
+                             ("diet_labels", diet_label), ("health_labels", health_label)]:
+            if value:
+                label_mask = self.label_masks[field].get(value)
+                if label_mask is None:
+                    return np.empty(0, dtype=int)
+                mask &= label_mask
+        return np.flatnonzero(mask)
+
+    def filter(self, limit=0, **filters):
+        rows = self.filter_rows(**filters)
+        if limit:
+            rows = rows[:limit]
+        return [self.recipes[row] for row in rows]
@@ -0,0 +1,56 @@
+import time
+from collections import OrderedDict
+
+
+# Bounded LRU cache with a time-to-live for read-heavy API responses.
+# Keys start with a namespace ("recipes", "items") so the write handlers for a
+# collection can drop every cached response that came from it. All access
+# happens on the event loop thread, so no locking is needed.
+class ResponseCache:
+    def __init__(self, max_entries=1024, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Build a key from the namespace and query parameters, ignoring unset ones
+    # and parameter order so equivalent requests share an entry
+    @staticmethod
+    def make_key(namespace, **params):
+        return (namespace, tuple(sorted((name, value) for name, value in params.items() if value is not None)))
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, namespace):
+        for key in [key for key in self.entries if key[0] == namespace]:
+            del self.entries[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
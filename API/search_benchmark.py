@@ -0,0 +1,66 @@
+import csv
+import os
+import re
+import statistics
+import time
+
+from search_index import TitleIndex
+
+
+# Benchmark the title index used by /items/search/ against the old unanchored
+# case-insensitive regex, which Mongo can only answer with a collection scan.
+# The regex path is replayed in-process over the same titles, so this measures
+# the matching work alone and leaves out the network round trip.
+
+current_dir = os.path.dirname(__file__)
+csv_path = os.path.join(current_dir, "../Trader_Joes/Cleaned_trader_joes_items.csv")
+
+# Queries the search box sends while a user types
+queries = ["c", "ch", "chi", "chick", "chicken", "chicken s", "org", "organic ban",
+           "mac", "gnocchi", "dark choc", "frozen", "cold brew", "salsa", "pumpkin"]
+
+
+def load_titles(path):
+    with open(path, mode="r", encoding="latin1") as csvfile:
+        reader = csv.DictReader(csvfile)
+        return [(str(n), row["item_title"].strip()) for n, row in enumerate(reader)]
+
+
+def time_queries(search, rounds):
+    timings = []
+    for _ in range(rounds):
+        for query in queries:
+            start = time.perf_counter()
+            search(query)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def regex_search(titles, query):
+    pattern = re.compile(query, re.IGNORECASE)
+    return [doc_id for doc_id, title in titles if pattern.search(title)]
+
+
+if __name__ == "__main__":
+    titles = load_titles(csv_path)
+
+    start = time.perf_counter()
+    index = TitleIndex()
+    index.build(titles)
+    build_time = time.perf_counter() - start
+    print(f"Indexed {len(index)} titles in {build_time * 1000:.1f} ms")
+
+    rounds = 200
+    index_timings = time_queries(index.search, rounds)
+    top_timings = time_queries(lambda query: index.search(query, limit=20), rounds)
+    regex_timings = time_queries(lambda query: regex_search(titles, query), rounds)
+
+    for name, timings in [("Title index", index_timings), ("Title index top 20", top_timings), ("Regex scan", regex_timings)]:
+        ordered = sorted(timings)
+        print(f"{name}: mean {statistics.mean(timings) * 1e6:.1f} us, "
+              f"p50 {ordered[len(ordered) // 2] * 1e6:.1f} us, "
+              f"p99 {ordered[int(len(ordered) * 0.99)] * 1e6:.1f} us")
+
+    for query in ["chick", "dark choc", "gnocchi"]:
+        top = [index.titles[doc_id] for doc_id in index.search(query, limit=3)]
+        print(f"{query!r} -> {top}")
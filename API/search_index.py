@@ -0,0 +1,112 @@
+import bisect
+import heapq
+import math
+import re
+from collections import defaultdict
+
+
+# Split a title into lowercase alphanumeric tokens ("Mac & Cheese" -> ["mac", "cheese"])
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+
+# In-memory inverted index over item titles.
+# Every token maps to the set of item ids whose title contains it, and a sorted
+# vocabulary lets the last word of the query match as a prefix, which is what
+# the frontend search box sends on each keystroke. Scoring is IDF based, so
+# rare words ("gnocchi") outweigh common ones ("organic").
+class TitleIndex:
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.titles = {}
+        self.normalized = {}
+        self.vocabulary = []
+
+    def build(self, documents):
+        self.postings = defaultdict(set)
+        self.titles = {}
+        self.normalized = {}
+        for doc_id, title in documents:
+            self._add_postings(doc_id, title)
+        self.vocabulary = sorted(self.postings)
+
+    def _add_postings(self, doc_id, title):
+        tokens = tokenize(title)
+        self.titles[doc_id] = title
+        self.normalized[doc_id] = (" ".join(tokens), len(tokens))
+        for token in tokens:
+            self.postings[token].add(doc_id)
+
+    def add(self, doc_id, title):
+        self.remove(doc_id)
+        self._add_postings(doc_id, title)
+        for token in tokenize(title):
+            position = bisect.bisect_left(self.vocabulary, token)
+            if position == len(self.vocabulary) or self.vocabulary[position] != token:
+                self.vocabulary.insert(position, token)
+
+    def remove(self, doc_id):
+        title = self.titles.pop(doc_id, None)
+        if title is None:
+            return
+        del self.normalized[doc_id]
+        for token in tokenize(title):
+            ids = self.postings.get(token)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.postings[token]
+                    position = bisect.bisect_left(self.vocabulary, token)
+                    if position < len(self.vocabulary) and self.vocabulary[position] == token:
+                        del self.vocabulary[position]
+
+    def __len__(self):
+        return len(self.titles)
+
+    # All vocabulary tokens starting with prefix, found with two binary searches
+    def _expand_prefix(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\uffff")
+        return self.vocabulary[start:end]
+
+    def _idf(self, token):
+        return math.log(1 + len(self.titles) / len(self.postings[token]))
+
+    # Return item ids ranked by relevance. Every query word must match; the
+    # last one may be a prefix. Exact word hits score higher than prefix hits
+    # and titles that start with the query get a bonus.
+    def search(self, query, limit=None):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        scores = None
+        for position, token in enumerate(tokens):
+            is_last = position == len(tokens) - 1
+            candidates = self._expand_prefix(token) if is_last else [token]
+            token_scores = {}
+            for candidate in candidates:
+                if candidate not in self.postings:
+                    continue
+                weight = self._idf(candidate)
+                if candidate != token:
+                    weight *= 0.5
+                for doc_id in self.postings[candidate]:
+                    if weight > token_scores.get(doc_id, 0):
+                        token_scores[doc_id] = weight
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: scores[doc_id] + weight for doc_id, weight in token_scores.items() if doc_id in scores}
+            if not scores:
+                return []
+
+        query_text = " ".join(tokens)
+        ranked = []
+        for doc_id, score in scores.items():
+            normalized_title, token_count = self.normalized[doc_id]
+            if normalized_title.startswith(query_text):
+                score *= 1.5
+            ranked.append((-score, token_count, self.titles[doc_id], doc_id))
+        ranked = heapq.nsmallest(limit, ranked) if limit else sorted(ranked)
+        return [doc_id for _, _, _, doc_id in ranked]
@@ -0,0 +1,99 @@
+from meal_planner import MEALS_PER_DAY
+
+
+# Recipe -> Trader Joe's item resolution and weekly shopping lists.
+# Every recipe carries a materialized tjItems list, one entry per ingredient
+# with the item it resolved to (sku, price, size) or a null sku when nothing
+# matched, so a meal plan's shopping list is one recipe query and a fold over
+# its scheduledDates instead of a /get-matches and item search per ingredient.
+
+# Item fields copied onto each tjItems entry
+ITEM_FIELDS = ["sku", "item_title", "retail_price", "sales_size", "sales_uom_description"]
+
+
+def parse_quantity(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Edamam writes "<unit>" for countable ingredients ("2 <unit> eggs")
+def unit_name(unit):
+    unit = str(unit or "").strip()
+    return "" if unit == "<unit>" else unit
+
+
+# Recipe ingredients are {name, quantity, unit} objects, but the recipe model
+# accepts any list, so a bare "eggs" is read as an ingredient with that name
+def ingredient_fields(ingredient):
+    if isinstance(ingredient, dict):
+        return ingredient
+    return {"name": "" if ingredient is None else str(ingredient)}
+
+
+def ingredient_names(ingredients):
+    return [str(ingredient_fields(ingredient).get("name") or "") for ingredient in ingredients]
+
+
+# The tjItems entries of one recipe. matches are the (match, score, source)
+# results of IngredientIndex.lookup for the ingredient names, and
+# items_by_title maps an item title to its document.
+def resolve_ingredients(ingredients, matches, items_by_title):
+    entries = []
+    for ingredient, (match, score, source) in zip(ingredients, matches):
+        ingredient = ingredient_fields(ingredient)
+        item = items_by_title.get(match) or {}
+        entry = {
+            "ingredient": str(ingredient.get("name") or ""),
+            "quantity": parse_quantity(ingredient.get("quantity")),
+            "unit": unit_name(ingredient.get("unit")),
+            "score": score,
+            "source": source,
+        }
+        entry.update({field: item.get(field) for field in ITEM_FIELDS})
+        entries.append(entry)
+    return entries
+
+
+# Recipe ids in the order the plan schedules them, one per meal eaten
+def scheduled_recipe_ids(scheduled_dates):
+    recipe_ids = []
+    for day in scheduled_dates or []:
+        if isinstance(day, dict):
+            recipe_ids.extend(str(day[meal]) for meal in MEALS_PER_DAY if day.get(meal))
+    return recipe_ids
+
+
+# Fold the tjItems of every scheduled meal into one list per sku, summing the
+# quantities per unit. Ingredients without an item are listed separately.
+def build_shopping_list(recipe_ids, items_by_recipe):
+    items = {}
+    unmatched = {}
+    for recipe_id in recipe_ids:
+        for entry in items_by_recipe.get(recipe_id, []):
+            if entry.get("sku") is None:
+                line = unmatched.setdefault(entry["ingredient"].strip().lower(), {
+                    "ingredient": entry["ingredient"], "quantities": {}, "meals": 0})
+            else:
+                line = items.setdefault(entry["sku"], {
+                    **{field: entry.get(field) for field in ITEM_FIELDS},
+                    "ingredients": [], "quantities": {}, "meals": 0})
+                if entry["ingredient"] not in line["ingredients"]:
+                    line["ingredients"].append(entry["ingredient"])
+            line["meals"] += 1
+            if entry.get("quantity") is not None:
+                unit = entry.get("unit", "")
+                line["quantities"][unit] = line["quantities"].get(unit, 0) + entry["quantity"]
+
+    for line in list(items.values()) + list(unmatched.values()):
+        line["quantities"] = [{"quantity": round(quantity, 3), "unit": unit}
+                              for unit, quantity in line["quantities"].items()]
+    item_lines = sorted(items.values(), key=lambda line: line["item_title"] or "")
+    # One package of every item, as a rough price for the week
+    estimated_total = sum(line["retail_price"] or 0 for line in item_lines)
+    return {
+        "items": item_lines,
+        "unmatched": sorted(unmatched.values(), key=lambda line: line["ingredient"].lower()),
+        "estimated_total": round(estimated_total, 2),
+    }
@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+
+
+# Which stores carry which items, decoded from the storeBitmap field.
+# Each item stores a fixed bitset over the store list saved in the Store_Index
+# collection: bit i (byte i // 8, bit i % 8) is set when store i carries it.
+# The bitmaps are kept as rows of a uint8 matrix, so "items at store X" is one
+# column test and "stores carrying all of these skus" is an AND over rows.
+class StoreAvailability:
+    def __init__(self):
+        self.stores = []
+        self.positions = {}
+        self.bitmaps = {}  # item _id -> (sku, bitmap)
+        self.item_ids = []
+        self.skus = np.empty(0, dtype=np.int64)
+        self.matrix = np.zeros((0, 0), dtype=np.uint8)
+        self.sku_rows = {}
+        self.dirty = False
+        self.loaded_at = None  # time.monotonic() of the last load
+
+    def __len__(self):
+        return len(self.bitmaps)
+
+    @property
+    def width(self):
+        return (len(self.stores) + 7) // 8
+
+    # stores: store codes in bit order; items: (item_id, sku, bitmap) tuples
+    def load(self, stores, items):
+        self.stores = [int(store_code) for store_code in stores]
+        self.positions = {store_code: position for position, store_code in enumerate(self.stores)}
+        self.bitmaps = {item_id: (int(sku), bytes(bitmap or b"")) for item_id, sku, bitmap in items}
+        self._rebuild()
+        self.loaded_at = time.monotonic()
+
+    def encode(self, store_codes):
+        bitmap = bytearray(self.width)
+        for store_code in store_codes:
+            position = self.positions.get(int(store_code))
+            if position is None:
+                raise ValueError(f"Unknown store code {store_code}")
+            bitmap[position >> 3] |= 1 << (position & 7)
+        return bytes(bitmap)
+
+    def decode(self, bitmap):
+        bits = np.unpackbits(np.frombuffer(bytes(bitmap), dtype=np.uint8), bitorder="little")[:len(self.stores)]
+        return [self.stores[position] for position in np.flatnonzero(bits)]
+
+    def set_item(self, item_id, sku, bitmap):
+        self.bitmaps[item_id] = (int(sku), bytes(bitmap))
+        self.dirty = True
+
+    def remove_item(self, item_id):
+        if self.bitmaps.pop(item_id, None) is not None:
+            self.dirty = True
+
+    # Item writes only mark the matrix dirty; it is rebuilt on the next query
+    def _rebuild(self):
+        item_ids = list(self.bitmaps)
+        matrix = np.zeros((len(item_ids), self.width), dtype=np.uint8)
+        skus = np.empty(len(item_ids), dtype=np.int64)
+        for row, item_id in enumerate(item_ids):
+            sku, bitmap = self.bitmaps[item_id]
+            skus[row] = sku
+            length = min(len(bitmap), self.width)
+            matrix[row, :length] = np.frombuffer(bitmap[:length], dtype=np.uint8)
+        self.item_ids = item_ids
+        self.skus = skus
+        self.matrix = matrix
+        self.sku_rows = {int(sku): row for row, sku in enumerate(skus)}
+        self.dirty = False
+
+    def _current(self):
+        if self.dirty:
+            self._rebuild()
+
+    # Item ids and skus of every item sold at store_code, None for an unknown store
+    def items_at(self, store_code):
+        self._current()
+        position = self.positions.get(int(store_code))
+        if position is None:
+            return None
+        rows = np.flatnonzero(self.matrix[:, position >> 3] & (1 << (position & 7)))
+        return [self.item_ids[row] for row in rows], self.skus[rows].tolist()
+
+    # Store codes that carry every sku; raises KeyError for an unknown sku
+    def stores_with_all(self, skus):
+        self._current()
+        rows = [self.sku_rows[int(sku)] for sku in skus]
+        combined = np.bitwise_and.reduce(self.matrix[rows], axis=0)
+        return self.decode(combined.tobytes())
@@ -0,0 +1,69 @@
+import argparse
+import csv
+import os
+import random
+import time
+
+import httpx
+
+from load_benchmark import percentile
+
+
+# Latency of GET /stores/{store_code}/items against the only option clients had
+# before: download every item with /items/ (storeCode lists) and filter by store and
+# category locally. Start the server first, then
+#   python API/store_items_benchmark.py --stores 50
+# Each store is requested once cold and once more warm (served by the response cache).
+
+current_dir = os.path.dirname(__file__)
+store_numbers_path = os.path.join(current_dir, "../Trader_Joes/store_numbers.csv")
+
+categories = [None, "Snacks & Sweets", "From The Freezer", "For the Pantry", "Fresh Prepared Foods"]
+
+
+def load_store_codes(path):
+    with open(path, newline="") as csvfile:
+        return [int(row["Store Number"]) for row in csv.DictReader(csvfile)]
+
+
+def timed_get(client, path, params=None):
+    start = time.perf_counter()
+    response = client.get(path, params=params)
+    response.raise_for_status()
+    return time.perf_counter() - start, response.json()
+
+
+def report(label, latencies):
+    print(f"{label:<28} p50 {percentile(latencies, 50) * 1000:7.1f} ms   "
+          f"p95 {percentile(latencies, 95) * 1000:7.1f} ms   p99 {percentile(latencies, 99) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the store-scoped item endpoint")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--stores", type=int, default=50, help="Random stores to query")
+    parser.add_argument("--baseline-requests", type=int, default=5, help="Full /items/ downloads to time")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    store_codes = rng.sample(load_store_codes(store_numbers_path), args.stores)
+    cold, warm, baseline = [], [], []
+
+    with httpx.Client(base_url=args.base_url, timeout=120) as client:
+        for store_code in store_codes:
+            category = rng.choice(categories)
+            params = {"category_1": category} if category else None
+            seconds, items = timed_get(client, f"/stores/{store_code}/items", params)
+            cold.append(seconds)
+            warm.append(timed_get(client, f"/stores/{store_code}/items", params)[0])
+
+        for store_code in store_codes[:args.baseline_requests]:
+            start = time.perf_counter()
+            _, all_items = timed_get(client, "/items/")
+            [item for item in all_items if store_code in item.get("storeCode", [])]
+            baseline.append(time.perf_counter() - start)
+
+    print(f"{len(store_codes)} stores, {len(items)} items in the last response")
+    report("/stores/{code}/items cold", cold)
+    report("/stores/{code}/items warm", warm)
+    report("/items/ + client filter", baseline)
@@ -3,6 +3,8 @@ from dotenv import load_dotenv  # Importing dotenv to load environment variables
 import pymongo  # Importing pymongo for MongoDB interaction
 from pymongo.mongo_client import MongoClient  # Importing MongoClient for MongoDB connection
 from pymongo.server_api import ServerApi  # Importing ServerApi for server configurations
+from pymongo import ASCENDING, IndexModel  # Importing index helpers for query performance
+from pymongo.errors import OperationFailure  # Raised when an index cannot be built
 
 # Load environment variables from .env file
 load_dotenv()
@@ -133,6 +135,26 @@ meal_plan_schema = {
     }
 }
 
+# Schema for the Trader_Joes_Items collection, as in Trader_Joe_Item_Data_Cleaning_n_Upload.py
+trader_joes_items_schema = {
+    "$jsonSchema": {
+        "bsonType": "object",
+        "required": ["item_title", "sku", "storeBitmap", "sales_size", "sales_uom_description", "retail_price", "fun_tags", "item_characteristics", "category_1", "category_2"],
+        "properties": {
+            "item_title": {"bsonType": "string"},
+            "sku": {"bsonType": "int"},
+            "storeBitmap": {"bsonType": "binData"},
+            "sales_size": {"bsonType": "double"},
+            "sales_uom_description": {"bsonType": "string"},
+            "retail_price": {"bsonType": "double"},
+            "fun_tags": {"bsonType": "array", "items": {"bsonType": "string"}},
+            "item_characteristics": {"bsonType": "array", "items": {"bsonType": "string"}},
+            "category_1": {"bsonType": "string"},
+            "category_2": {"bsonType": "string"},
+        }
+    }
+}
+
 
 # Function to create collections with specified schema validation in MongoDB
 def create_collections():
@@ -157,6 +179,108 @@ def create_collections():
     else:
         print("MealPlan_Collection already exists.")
 
+    # Check and create Trader_Joes_Items before create_indexes, which would
+    # otherwise create it implicitly without a validator
+    if "Trader_Joes_Items" not in db.list_collection_names():
+        db.create_collection("Trader_Joes_Items", validator=trader_joes_items_schema)
+        print("Created Trader_Joes_Items collection with validation.")
+    else:
+        print("Trader_Joes_Items collection already exists.")
+
+# Indexes for the recipe query shapes used by the API:
+# - get_recipe_by_name looks up a single Recipe_Name, which is unique because
+#   Recipe_Upload.py upserts on it
+# - get_filtered_recipes filters on meal_type/cuisine_type equality plus a calories $lte range,
+#   and on the diet_labels / health_labels arrays (multikey)
+# - get_random_recipes filters on health_labels
+# Equality fields come first and the calories range last. diet_labels and health_labels are
+# both arrays, and MongoDB cannot put two arrays in one compound index, so each gets its own.
+recipe_indexes = [
+    IndexModel([("Recipe_Name", ASCENDING)], name="recipe_name", unique=True),
+    IndexModel([("meal_type", ASCENDING), ("cuisine_type", ASCENDING), ("calories", ASCENDING)], name="meal_cuisine_calories"),
+    IndexModel([("cuisine_type", ASCENDING), ("calories", ASCENDING)], name="cuisine_calories"),
+    IndexModel([("diet_labels", ASCENDING), ("calories", ASCENDING)], name="diet_labels_calories"),
+    IndexModel([("health_labels", ASCENDING), ("calories", ASCENDING)], name="health_labels_calories"),
+    IndexModel([("calories", ASCENDING)], name="calories"),
+]
+
+# Indexes for the item lookups: GET /stores/{store_code}/items fetches the skus of
+# one store from the Store_Items inverted index, optionally within a category.
+# sku is unique because the item upload upserts on it.
+item_indexes = [
+    IndexModel([("sku", ASCENDING)], name="sku", unique=True),
+    IndexModel([("category_1", ASCENDING), ("category_2", ASCENDING), ("sku", ASCENDING)], name="category_sku"),
+]
+
+# Recipes is filled by Recipe_Upload.py and Recipes_new is the collection the API reads
+indexed_collections = {
+    "Recipes": recipe_indexes,
+    "Recipes_new": recipe_indexes,
+    "Trader_Joes_Items": item_indexes,
+}
+
+# Print a few values of field that more than one document shares
+def report_duplicates(collection, field, limit=5):
+    duplicates = list(collection.aggregate([
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ], allowDiskUse=True))
+    for duplicate in duplicates:
+        print(f"  {field}={duplicate['_id']!r} appears {duplicate['count']} times")
+
+# Function to build the indexes. create_index is a no-op for indexes that already
+# exist with the same definition, so this is safe to run on every initialization.
+# An index that cannot be built (e.g. a unique index over duplicate values left by
+# an older upload) is reported and skipped, so the rest of the setup still runs.
+def create_indexes():
+    for collection_name, indexes in indexed_collections.items():
+        collection = db[collection_name]
+        created = []
+        for index in indexes:
+            try:
+                created.extend(collection.create_indexes([index]))
+            except OperationFailure as e:
+                print(f"Could not create index {index.document['name']} on {collection_name}: {e}")
+                if e.code == 11000:  # Duplicate key on a unique single-field index
+                    report_duplicates(collection, next(iter(index.document["key"])))
+        print(f"Ensured indexes on {collection_name}: {', '.join(created)}")
+
+# Collect every stage name in an explain() winning plan
+def plan_stages(plan):
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages.extend(plan_stages(plan["inputStage"]))
+    for input_stage in plan.get("inputStages", []):
+        stages.extend(plan_stages(input_stage))
+    return stages
+
+# Representative filters sent by the recipe endpoints
+sample_recipe_queries = [
+    {"Recipe_Name": "Chicken Pot Pie"},
+    {"calories": {"$lte": 600}},
+    {"meal_type": "breakfast", "calories": {"$lte": 600}},
+    {"meal_type": "lunch/dinner", "cuisine_type": "italian", "calories": {"$lte": 800}},
+    {"cuisine_type": "american"},
+    {"diet_labels": "Balanced", "calories": {"$lte": 700}},
+    {"health_labels": "Vegetarian"},
+]
+
+# Function to confirm via explain plans that the recipe filters use an index instead of a COLLSCAN
+def verify_indexes(collection_name="Recipes_new"):
+    collection = db[collection_name]
+    all_indexed = True
+    for query in sample_recipe_queries:
+        plan = collection.find(query).explain()["queryPlanner"]["winningPlan"]
+        stages = plan_stages(plan)
+        if "COLLSCAN" in stages:
+            all_indexed = False
+            print(f"COLLSCAN for {query}")
+        else:
+            print(f"Index used for {query}: {' <- '.join(stage for stage in stages if stage)}")
+    return all_indexed
+
 # Function to insert multiple user records into Users_Collection
 def insert_users(users):
     users_collection = db["Users_Collection"]
@@ -263,8 +387,12 @@ meal_plans_data = [
 
 # Run the functions to create collections and insert sample data
 create_collections()
+create_indexes()
 insert_users(users_data)
 insert_meal_plans(meal_plans_data)
 
 # Check MongoDB connection
 check_connection(client)
+
+# Check that the recipe filter queries are served by the indexes
+verify_indexes()
@@ -1,7 +1,12 @@
-import requests
+import argparse
+import asyncio
 import csv
-import time
+import json
 import os
+import random
+import time
+
+import httpx
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -9,6 +14,9 @@ load_dotenv()
 edmama_id = os.getenv("EDAMAM_ID")
 edmama_key = os.getenv("EDAMAM_KEY")
 
+EDAMAM_URL = "https://api.edamam.com/api/recipes/v2"
+FIELDS = ["label", "cuisineType", "mealType", "ingredients", "calories", "dietLabels", "totalNutrients"]
+
 # Define the headers for the CSV
 headers = [
     "recipe_label", "calories", "cuisine_type", "meal_type", "diet_labels"
@@ -27,53 +35,190 @@ nutrients_headers = ["ENERC_KCAL", "FAT", "FASAT", "FATRN", "FAMS", "FAPU",
 # Extend headers with nutrient headers
 headers.extend(nutrients_headers)
 
-# Open the CSV file in append mode
-csv_file = "recipesTest.csv"
-with open(csv_file, mode="a", newline="") as file:
-    writer = csv.writer(file)
 
-    # Only write headers if the file is new (i.e., empty)
-    file.seek(0, 2)  # Move to the end of the file
-    if file.tell() == 0:  # Check if file is empty
-        writer.writerow(headers)
+# Build one CSV row from an Edamam recipe hit
+def recipe_row(recipe_data):
+    # Extract recipe details
+    recipe = recipe_data["recipe"]
+    row = [
+        recipe.get("label", ""),
+        recipe.get("calories", ""),
+        ", ".join(recipe.get("cuisineType", [])),
+        ", ".join(recipe.get("mealType", [])),
+        ", ".join(recipe.get("dietLabels", []))
+    ]
+
+    # Ingredients info (up to 15)
+    ingredients = recipe.get("ingredients", [])
+    for i in range(15):
+        if i < len(ingredients):
+            ingredient = ingredients[i]
+            row.extend([
+                ingredient.get("food", ""),
+                ingredient.get("quantity", ""),
+                ingredient.get("measure", "")
+            ])
+        else:
+            row.extend(["", "", ""])  # Empty slots for missing ingredients
+
+    # Nutrients info (explicitly checking each nutrient)
+    total_nutrients = recipe.get("totalNutrients", {})
+    for nutrient_code in nutrients_headers:
+        nutrient_data = total_nutrients.get(nutrient_code, {})
+        row.append(nutrient_data.get("quantity", ""))  # Append quantity or empty if missing
+    return row
 
-# Function to append recipe data to CSV
-def append_recipe_to_csv(recipe_data):
-    with open(csv_file, mode="a", newline="") as file:
-        writer = csv.writer(file)
 
-        # Extract recipe details
-        recipe = recipe_data["recipe"]
-        row = [
-            recipe.get("label", ""),
-            recipe.get("calories", ""),
-            ", ".join(recipe.get("cuisineType", [])),
-            ", ".join(recipe.get("mealType", [])),
-            ", ".join(recipe.get("dietLabels", []))
-        ]
-
-        # Ingredients info (up to 15)
-        ingredients = recipe.get("ingredients", [])
-        for i in range(15):
-            if i < len(ingredients):
-                ingredient = ingredients[i]
-                row.extend([
-                    ingredient.get("food", ""),
-                    ingredient.get("quantity", ""),
-                    ingredient.get("measure", "")
-                ])
+# Request pacing that adapts to the quota the API actually enforces.
+# Requests are spaced 1/rate seconds apart. Every success nudges the rate up
+# by `increase`; a 429 halves it and pauses all requests for the Retry-After
+# the server sent, so the pipeline settles just under the real limit. 429s
+# from requests already in flight during a pause only count once.
+class AdaptiveRateLimiter:
+    def __init__(self, rate=0.5, min_rate=0.05, max_rate=10.0, increase=0.05):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.next_slot = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    # A request whose slot falls inside a pause that began while it waited
+    # takes a new slot after the pause
+    async def acquire(self):
+        while True:
+            async with self.lock:
+                now = time.monotonic()
+                slot = max(now, self.next_slot, self.paused_until)
+                self.next_slot = slot + 1 / self.rate
+            await asyncio.sleep(slot - now)
+            if time.monotonic() >= self.paused_until:
+                return
+
+    def success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self, retry_after):
+        now = time.monotonic()
+        if now < self.paused_until:
+            return
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.paused_until = now + retry_after
+        self.next_slot = max(self.next_slot, self.paused_until)
+        print(f"Rate limited; waiting {retry_after:.1f}s, then {self.rate:.2f} requests/sec")
+
+
+# Raised when a dish still fails after every retry, so it is not checkpointed
+class FetchError(Exception):
+    pass
+
+
+# Search one dish and return the CSV row of its first hit (None if no hits).
+# 429s are retried after Retry-After; 5xx, network errors and bodies that are
+# not JSON with exponential backoff plus jitter; any other 4xx fails at once.
+async def fetch_recipe(client, limiter, dish, url=EDAMAM_URL, max_retries=5):
+    params = [("type", "public"), ("q", dish), ("app_id", edmama_id), ("app_key", edmama_key)]
+    params.extend(("field", field) for field in FIELDS)
+    error = None
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        try:
+            response = await client.get(url, params=params)
+        except httpx.HTTPError as e:
+            error = e.__class__.__name__
+        else:
+            if response.status_code == 429:
+                try:
+                    retry_after = float(response.headers.get("Retry-After"))
+                except (TypeError, ValueError):
+                    retry_after = min(60, 2 ** attempt)
+                limiter.throttled(retry_after)
+                error = "HTTP 429"
+                continue
+            if response.status_code < 400:
+                try:
+                    recipe_data = response.json()
+                except ValueError:
+                    # A truncated body or a proxy's HTML page; worth another try
+                    recipe_data = None
+                if isinstance(recipe_data, dict):
+                    limiter.success()
+                    # Check if there are recipes available for the dish
+                    if recipe_data.get("hits"):
+                        return recipe_row(recipe_data["hits"][0])  # Get the first recipe result
+                    return None
+                error = "invalid JSON response"
+            elif response.status_code < 500:
+                raise FetchError(f"HTTP {response.status_code} for {dish}")
             else:
-                row.extend(["", "", ""])  # Empty slots for missing ingredients
+                error = f"HTTP {response.status_code}"
+        if attempt < max_retries:
+            await asyncio.sleep(min(60, 2 ** attempt) * random.uniform(0.5, 1.5))
+    raise FetchError(f"Could not fetch {dish}: {error}")
 
-        # Nutrients info (explicitly checking each nutrient)
-        total_nutrients = recipe.get("totalNutrients", {})
-        for nutrient_code in nutrients_headers:
-            nutrient_data = total_nutrients.get(nutrient_code, {})
-            row.append(nutrient_data.get("quantity", ""))  # Append quantity or empty if missing
 
-        # Write the row to CSV
-        writer.writerow(row)
-    print("Appended new recipe data to CSV.")
+# The checkpoint is a JSON line per finished dish, so an interrupted run
+# resumes where it stopped. Returns {dish: row or None}.
+def load_checkpoint(path):
+    done = {}
+    if os.path.exists(path):
+        with open(path) as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Partial last line from an interrupted run
+                done[entry["dish"]] = entry["row"]
+    return done
+
+
+# Fetch every dish not in the checkpoint with up to `concurrency` requests in
+# flight, then write all rows to the CSV in one go (in dish order)
+async def fetch_dishes(dishes, csv_file="recipesTest.csv", checkpoint="edamam_checkpoint.jsonl",
+                       concurrency=4, rate=0.5, max_rate=10.0, url=EDAMAM_URL):
+    done = load_checkpoint(checkpoint)
+    pending = [dish for dish in dishes if dish not in done]
+    print(f"{len(done)} dishes already fetched, {len(pending)} to go")
+    limiter = AdaptiveRateLimiter(rate=rate, max_rate=max_rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = []
+
+    async def fetch_dish(client, checkpoint_file, dish):
+        async with semaphore:
+            try:
+                row = await fetch_recipe(client, limiter, dish, url=url)
+            except FetchError as e:
+                print(e)
+                failed.append(dish)
+                return
+        if row is None:
+            print(f"No recipe found for {dish}")
+        done[dish] = row
+        checkpoint_file.write(json.dumps({"dish": dish, "row": row}) + "\n")
+        checkpoint_file.flush()
+
+    start = time.perf_counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    with open(checkpoint, "a") as checkpoint_file:
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            await asyncio.gather(*[fetch_dish(client, checkpoint_file, dish) for dish in pending])
+    print(f"Fetched {len(pending) - len(failed)} dishes in {time.perf_counter() - start:.1f}s "
+          f"(final rate {limiter.rate:.2f} requests/sec)")
+
+    if failed:
+        print(f"{len(failed)} dishes failed and will be retried on the next run: {', '.join(failed)}")
+        return False
+
+    rows = [done[dish] for dish in dishes if done.get(dish) is not None]
+    with open(csv_file, mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(headers)
+        writer.writerows(rows)
+    print(f"Wrote {len(rows)} recipes to {csv_file}")
+    os.remove(checkpoint)
+    return True
+
 
 # List of dish names
 dishes = [
@@ -146,18 +291,20 @@ dishes = [
     "Mongolian Beef with Noodles", "Seafood Linguine", "Sweet and Sour Pork", "Fish and Chips"
 ]
 
-# Fetch data for each dish and append to CSV
-for dish in dishes:
-    try:
-        url = f"https://api.edamam.com/api/recipes/v2?type=public&q={dish}&app_id={edmama_id}&app_key={edmama_key}&field=label&field=cuisineType&field=mealType&field=ingredients&field=calories&field=dietLabels&field=totalNutrients"
-        response = requests.get(url)
-        recipe_data = response.json()
-        # Check if there are recipes available for the dish
-        if recipe_data.get("hits"):
-            sample_data = recipe_data["hits"][0]  # Get the first recipe result
-            append_recipe_to_csv(sample_data)
-        else:
-            print(f"No recipe found for {dish}")
-        time.sleep(8)
-    except:
-        print("didn't work with this one")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch Edamam recipes for every dish")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at the same time")
+    parser.add_argument("--rate", type=float, default=0.5, help="Starting requests per second")
+    parser.add_argument("--max-rate", type=float, default=10.0, help="Requests per second never exceeded")
+    parser.add_argument("--output", default="recipesTest.csv")
+    parser.add_argument("--checkpoint", default="edamam_checkpoint.jsonl", help="Progress file for resuming")
+    parser.add_argument("--url", default=EDAMAM_URL, help="Recipe search endpoint (e.g. a local mock server)")
+    args = parser.parse_args()
+
+    asyncio.run(fetch_dishes(dishes, args.output, args.checkpoint, args.concurrency,
+                             args.rate, args.max_rate, args.url))
+
+
+if __name__ == "__main__":
+    main()
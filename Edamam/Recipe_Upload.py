@@ -1,82 +1,197 @@
+import argparse
+import codecs
 import csv
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, BulkWriteError
 import os
+import time
+
 from dotenv import load_dotenv
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
 
-# MongoDB connection setup
-try:
-    load_dotenv()
-    mongodb_uri = os.getenv('MONGODB_URI')
-    client = MongoClient(mongodb_uri)  
-    db = client["Sweet_Violet"]
-    collection = db["Recipes"]
-except ConnectionFailure as e:
-    print(f"Could not connect to MongoDB: {e}")
-    exit(1)
-
-# Read CSV file and upload each row as a document to MongoDB
-csv_file_path = "recipes.csv"  # Path to your CSV file
-
-try:
-    with open(csv_file_path, mode="r", encoding="utf-8") as file:
-        csv_reader = csv.DictReader(file)
-
-        documents = []
-        for row in csv_reader:
-            document = {
-                "Recipe_Name": row.get("Recipe_Name", ""),
-                "calories": float(row.get("calories", 0)) if row.get("calories") else None,
-                "cuisine_type": row.get("cuisine_type", ""),
-                "meal_type": row.get("meal_type", ""),
-                "diet_labels": row.get("diet_labels", "").split(", "),
-                "ingredients": [
-                    {
-                        "name": row.get(f"ingredient_{i}_name", ""),
-                        "quantity": row.get(f"ingredient_{i}_quantity", ""),
-                        "unit": row.get(f"ingredient_{i}_unit", "")
-                    }
-                    for i in range(1, 16) if row.get(f"ingredient_{i}_name")
-                ],
-                "nutrients": {
-                    "ENERC_KCAL": float(row.get("ENERC_KCAL", 0)),
-                    "FAT": float(row.get("FAT", 0)),
-                    "FASAT": float(row.get("FASAT", 0)),
-                    "FATRN": float(row.get("FATRN", 0)),
-                    "FAMS": float(row.get("FAMS", 0)),
-                    "FAPU": float(row.get("FAPU", 0)),
-                    "CHOCDF": float(row.get("CHOCDF", 0)),
-                    "FIBTG": float(row.get("FIBTG", 0)),
-                    "SUGAR": float(row.get("SUGAR", 0)),
-                    "PROCNT": float(row.get("PROCNT", 0)),
-                    "CHOLE": float(row.get("CHOLE", 0)),
-                    "NA": float(row.get("NA", 0)),
-                    "CA": float(row.get("CA", 0)),
-                    "MG": float(row.get("MG", 0)),
-                    "K": float(row.get("K", 0)),
-                    "FE": float(row.get("FE", 0)),
-                    "ZN": float(row.get("ZN", 0)),
-                    "P": float(row.get("P", 0)),
-                    "VITA_RAE": float(row.get("VITA_RAE", 0)),
-                    "VITC": float(row.get("VITC", 0)),
-                    "VITD": float(row.get("VITD", 0)),
-                    "TOCPHA": float(row.get("TOCPHA", 0)),
-                    "VITK1": float(row.get("VITK1", 0)),
-                    "WATER": float(row.get("WATER", 0)),
-                }
+# Streaming upload of the Edamam recipe CSV into MongoDB.
+# Rows are read one at a time and written in unordered bulk_write batches that
+# upsert on Recipe_Name, so memory stays bounded by --batch-size and running the
+# upload again updates recipes in place instead of duplicating them. Only the
+# CSV fields are $set, so fields added on the server (tjItems) survive. A row that
+# cannot be converted (or that the collection validator rejects) is copied to
+# the quarantine CSV with the reason, and the rest of the upload carries on.
+
+NUTRIENT_CODES = ["ENERC_KCAL", "FAT", "FASAT", "FATRN", "FAMS", "FAPU",
+                  "CHOCDF", "FIBTG", "SUGAR", "PROCNT", "CHOLE", "NA", "CA",
+                  "MG", "K", "FE", "ZN", "P", "VITA_RAE", "VITC",
+                  "VITD", "TOCPHA", "VITK1", "WATER"]
+
+# Edamam_Data_Pipeline.py writes the recipe name as recipe_label
+NAME_COLUMNS = ["Recipe_Name", "recipe_label"]
+
+
+# recipes.csv is Latin-1 while the pipeline writes UTF-8; check the whole file
+# block by block so the guess costs no memory
+def detect_encoding(path, block_size=1 << 20):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as file:
+        try:
+            while True:
+                block = file.read(block_size)
+                if not block:
+                    decoder.decode(b"", final=True)
+                    return "utf-8-sig"
+                decoder.decode(block)
+        except UnicodeDecodeError:
+            return "latin-1"
+
+
+# Rows with the padding stripped from both the headers and the values
+def read_rows(path, encoding):
+    with open(path, mode="r", encoding=encoding, newline="") as file:
+        reader = csv.reader(file)
+        fieldnames = [name.strip() for name in next(reader)]
+        for values in reader:
+            yield dict(zip(fieldnames, (value.strip() for value in values)))
+
+
+# A blank value is a nutrient Edamam did not report, stored as 0 as before.
+# Anything else that is not a number raises ValueError.
+def to_float(row, column, blank=0.0):
+    value = row.get(column, "")
+    if value == "":
+        return blank
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{column} is not a number: {value!r}")
+
+
+def build_document(row):
+    name = next((row[column] for column in NAME_COLUMNS if row.get(column)), "")
+    if not name:
+        raise ValueError("missing Recipe_Name")
+    diet_labels = row.get("diet_labels", "")
+    return {
+        "Recipe_Name": name,
+        "calories": to_float(row, "calories", blank=None),
+        "cuisine_type": row.get("cuisine_type", ""),
+        "meal_type": row.get("meal_type", ""),
+        "diet_labels": diet_labels.split(", ") if diet_labels else [],
+        "ingredients": [
+            {
+                "name": row.get(f"ingredient_{i}_name", ""),
+                "quantity": row.get(f"ingredient_{i}_quantity", ""),
+                "unit": row.get(f"ingredient_{i}_unit", "")
             }
-            documents.append(document)
-        
-        # Insert documents into MongoDB
+            for i in range(1, 16) if row.get(f"ingredient_{i}_name")
+        ],
+        "nutrients": {code: to_float(row, code) for code in NUTRIENT_CODES},
+    }
+
+
+class Quarantine:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.writer = None
+        self.count = 0
+
+    def add(self, row, reason):
+        if self.writer is None:
+            self.file = open(self.path, mode="w", newline="", encoding="utf-8")
+            self.writer = csv.DictWriter(self.file, fieldnames=["error"] + list(row), extrasaction="ignore")
+            self.writer.writeheader()
+        self.writer.writerow({"error": reason, **row})
+        self.count += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+# The upsert key; unique so concurrent uploads cannot insert the same recipe twice
+def ensure_name_index(collection):
+    try:
+        collection.create_index([("Recipe_Name", ASCENDING)], name="recipe_name", unique=True)
+    except OperationFailure as e:
+        # Duplicate names from older uploads, or the non-unique index of an older setup
+        print(f"Could not create the unique Recipe_Name index: {e}")
+
+
+# Upsert one batch; documents rejected by the server are quarantined
+def write_batch(collection, batch, quarantine):
+    operations = [UpdateOne({"Recipe_Name": document["Recipe_Name"]}, {"$set": document}, upsert=True)
+                  for document, _ in batch]
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        return result.bulk_api_result
+    except BulkWriteError as e:
+        for error in e.details["writeErrors"]:
+            quarantine.add(batch[error["index"]][1], error["errmsg"])
+        return e.details
+
+
+def upload(collection, csv_file_path, batch_size, quarantine, encoding=None):
+    encoding = encoding or detect_encoding(csv_file_path)
+    rows = 0
+    upserted = 0
+    modified = 0
+    batch = []
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal upserted, modified
+        details = write_batch(collection, batch, quarantine)
+        upserted += details["nUpserted"]
+        modified += details["nModified"]
+        batch.clear()
+        print(f"{rows} rows ({rows / (time.perf_counter() - start):.0f} rows/sec), "
+              f"{quarantine.count} quarantined")
+
+    for row in read_rows(csv_file_path, encoding):
+        rows += 1
         try:
-            if documents:
-                collection.insert_many(documents)
-                print("Data successfully uploaded to MongoDB!")
-            else:
-                print("No data to upload.")
-        except BulkWriteError as e:
-            print(f"Error occurred during data insertion: {e.details}")
-except FileNotFoundError:
-    print(f"File not found: {csv_file_path}")
-except csv.Error as e:
-    print(f"Error reading CSV file: {e}")
+            batch.append((build_document(row), row))
+        except ValueError as e:
+            quarantine.add(row, str(e))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/sec): "
+          f"{upserted} new, {modified} changed, {quarantine.count} quarantined")
+    if quarantine.count:
+        print(f"Quarantined rows written to {quarantine.path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upsert the Edamam recipe CSV into MongoDB")
+    parser.add_argument("--csv", default="recipes.csv", help="Path to your CSV file")
+    parser.add_argument("--collection", default="Recipes")
+    parser.add_argument("--batch-size", type=int, default=500, help="Recipes per bulk_write")
+    parser.add_argument("--quarantine", default="recipes_quarantine.csv", help="Where rejected rows are written")
+    parser.add_argument("--encoding", default=None, help="CSV encoding (detected when not given)")
+    args = parser.parse_args()
+
+    # MongoDB connection setup
+    load_dotenv()
+    client = MongoClient(os.getenv('MONGODB_URI'))
+    try:
+        client.admin.command('ping')
+    except ConnectionFailure as e:
+        print(f"Could not connect to MongoDB: {e}")
+        exit(1)
+    collection = client["Sweet_Violet"][args.collection]
+    ensure_name_index(collection)
+
+    quarantine = Quarantine(args.quarantine)
+    try:
+        upload(collection, args.csv, args.batch_size, quarantine, args.encoding)
+    except FileNotFoundError:
+        print(f"File not found: {args.csv}")
+    except csv.Error as e:
+        print(f"Error reading CSV file: {e}")
+    finally:
+        quarantine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# Local stand-in for the Edamam recipe search API, for testing the pipeline
+# without a key or quota. It enforces a requests-per-minute limit like the real
+# API, answering 429 with Retry-After once the limit is hit:
+#   python mock_edamam_server.py --port 8200 --per-minute 60 --fail-rate 0.05
+#   python Edamam_Data_Pipeline.py --url http://localhost:8200/api/recipes/v2 --rate 2
+# --fail-rate answers a share of requests with 503 to exercise retries.
+
+NUTRIENTS = ["ENERC_KCAL", "FAT", "FASAT", "FATRN", "FAMS", "FAPU", "CHOCDF", "FIBTG", "SUGAR", "PROCNT",
+             "CHOLE", "NA", "CA", "MG", "K", "FE", "ZN", "P", "VITA_RAE", "VITC", "VITD", "TOCPHA",
+             "VITK1", "WATER"]
+
+
+# The same dish always gets the same recipe
+def fake_hit(dish):
+    rng = random.Random(dish)
+    words = dish.lower().replace(",", "").split()
+    return {"recipe": {
+        "label": dish,
+        "calories": round(rng.uniform(200, 1500), 2),
+        "cuisineType": [rng.choice(["american", "italian", "mexican", "asian"])],
+        "mealType": [rng.choice(["breakfast", "lunch/dinner", "snack"])],
+        "dietLabels": rng.sample(["Balanced", "High-Protein", "Low-Carb"], rng.randint(0, 2)),
+        "ingredients": [{"food": word, "quantity": rng.randint(1, 4), "measure": "cup"} for word in words],
+        "totalNutrients": {code: {"quantity": round(rng.uniform(0, 100), 3)} for code in NUTRIENTS},
+    }}
+
+
+class EdamamHandler(BaseHTTPRequestHandler):
+    per_minute = 60
+    fail_rate = 0.0
+    # Length of the quota window; tests shorten it so a 429 does not cost a minute
+    window_seconds = 60
+    lock = threading.Lock()
+    request_times = []
+    counts = {"ok": 0, "throttled": 0, "failed": 0}
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        # Request counters, to check how often the pipeline was throttled
+        if url.path == "/stats":
+            self.send_json(200, self.counts)
+            return
+
+        # Sliding one-minute window, like the per-minute quota of the real API
+        with self.lock:
+            now = time.monotonic()
+            self.request_times[:] = [t for t in self.request_times if now - t < self.window_seconds]
+            if len(self.request_times) >= self.per_minute:
+                self.counts["throttled"] += 1
+                retry_after = self.window_seconds - (now - self.request_times[0])
+                self.send_json(429, {"message": "Too many requests"}, {"Retry-After": f"{retry_after:.1f}"})
+                return
+            self.request_times.append(now)
+
+        if random.random() < self.fail_rate:
+            self.counts["failed"] += 1
+            self.send_json(503, {"message": "Unavailable"})
+            return
+
+        dish = parse_qs(url.query).get("q", [""])[0]
+        self.counts["ok"] += 1
+        self.send_json(200, {"from": 1, "to": 1, "count": 1, "hits": [fake_hit(dish)]})
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Edamam recipe search API")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--per-minute", type=int, default=60, help="Requests allowed per sliding minute")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    EdamamHandler.per_minute = args.per_minute
+    EdamamHandler.fail_rate = args.fail_rate
+    print(f"Mock Edamam API on http://localhost:{args.port}/api/recipes/v2 ({args.per_minute} requests/minute)")
+    ThreadingHTTPServer(("127.0.0.1", args.port), EdamamHandler).serve_forever()
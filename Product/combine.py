@@ -1,74 +1,250 @@
+import argparse
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import pandas as pd
 from openai import OpenAI
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+from item_matcher import ItemMatcher, normalize
+from match_store import MatchStore
 
-api_key = os.getenv("OPENAI_KEY")
-client = OpenAI(api_key=api_key)
+# Match every unique recipe ingredient to a Trader Joe's item.
+# The local n-gram matcher answers first; only ingredients whose best score is
+# under --threshold go to the LLM, and each of those is sent with its closest
+# candidate titles instead of the whole catalog. Whatever the LLM answers is
+# snapped back onto a real item title with the matcher.
+# Matches are kept in a SQLite store between runs, so a run only matches
+# ingredients that are new or affected by catalog changes (see plan_matches).
 
-# Load Trader Joe's items
-df_items = pd.read_csv('../Trader_Joes/Cleaned_trader_joes_items.csv', encoding='latin1')
-item_titles = df_items['item_title'].str.strip().tolist()
+OUTPUT_COLUMNS = ['Ingredient', 'Best Matching Trader Joe\'s Item', 'Match Score', 'Match Source']
 
-# Load recipe ingredients
-df_recipes = pd.read_csv('../Edamam/recipes.csv', encoding='latin1')
 
-# Collect unique ingredients from the recipe DataFrame
-df_recipes.columns = df_recipes.columns.str.strip()
+def load_item_titles(items_path):
+    df_items = pd.read_csv(items_path, encoding='latin1')
+    return df_items['item_title'].str.strip().tolist()
 
-ingredient_names = []
-for i in range(1, 16):
-    ingredient_column = f'ingredient_{i}_name'
-    if ingredient_column in df_recipes.columns:
-        ingredient_names.extend(df_recipes[ingredient_column].dropna().str.strip().tolist())
 
-# Remove duplicates by converting to a set, then back to a list
-unique_ingredients = list(set(ingredient_names))
+# Collect unique ingredients from the recipe DataFrame
+def load_ingredients(recipes_path):
+    df_recipes = pd.read_csv(recipes_path, encoding='latin1')
+    df_recipes.columns = df_recipes.columns.str.strip()
 
-batch_size = 200
-ingredient_batches = [
-    unique_ingredients[i:i + batch_size] for i in range(0, len(unique_ingredients), batch_size)
-]
+    ingredient_names = []
+    for i in range(1, 16):
+        ingredient_column = f'ingredient_{i}_name'
+        if ingredient_column in df_recipes.columns:
+            ingredient_names.extend(df_recipes[ingredient_column].dropna().str.strip().tolist())
 
-all_matches = []
+    # Remove duplicates, keeping the first-seen order so runs are repeatable
+    return list(dict.fromkeys(name for name in ingredient_names if name))
 
-for i, batch in enumerate(ingredient_batches):
 
+# Ask the LLM about one batch of low-confidence ingredients.
+# Returns {ingredient: answer}, where answer is an item name or 'none'.
+def llm_matches(client, batch, candidates):
+    lines = "\n".join(f"{ingredient}: {options}" for ingredient, options in zip(batch, candidates))
     prompt = (
-        f"Match every ingredient to the closest related item from Trader Joe's.\n\n"
-        f"Trader Joe's items: {item_titles}\n\n"
-        f"Ingredients to match: {batch}\n\n"
+        "Match every ingredient to the closest related item from Trader Joe's.\n\n"
+        "Each ingredient is listed with the Trader Joe's items whose names are closest to it:\n"
+        f"{lines}\n\n"
         "Please return the best Trader Joe's item match for each ingredient in this format:\n"
         "Ingredient: Best Matching Trader Joe's Item\n"
-        "If no direct match is found, offer the closest substitute name that would have a similar taste / culinary purpose. Do not add any other commentary\n"
+        "If none of the listed items fits, offer the closest Trader Joe's substitute that would have a similar taste / culinary purpose. Do not add any other commentary\n"
         "If there is absolutely nothing similar, return 'none'"
     )
 
     response = client.chat.completions.create(
         model="gpt-4o-mini",
         messages=[{"role": "user", "content": prompt}],
-        temperature=1,
+        temperature=0,
         max_tokens=4000,
-        top_p=1,
-        frequency_penalty=0,
-        presence_penalty=0
     )
+    response_message = response.choices[0].message.content.strip()
 
-    response_message = response.model_dump()["choices"][0]["message"]["content"].strip()
-
-    # Parse the response and append to all_matches
-    matches = []
+    # Parse the "Ingredient: Item" lines
+    answers = {}
     for line in response_message.splitlines():
         if ':' in line:
-            parts = line.split(':', 1)
-            ingredient = parts[0].strip()
-            best_match = parts[1].strip()
-            matches.append((ingredient, best_match))
-    all_matches.extend(matches)
-
-# Save all matches to a CSV file
-df_matches = pd.DataFrame(all_matches, columns=['Ingredient', 'Best Matching Trader Joe\'s Item'])
-df_matches.to_csv('remade_recipes.csv', index=False)
+            ingredient, best_match = line.split(':', 1)
+            answers[ingredient.strip().lstrip('-* ').strip()] = best_match.strip()
+    return answers
+
+
+# Match one batch of ingredients. Confident local matches are kept; the rest
+# go to the LLM in a single request when a client is given. Returns
+# (ingredient, match, score, source, local_score) rows, where source is
+# 'matcher', 'llm', or 'none' for an ingredient the LLM has not been asked about.
+def match_ingredients(ingredients, matcher, threshold, client=None, candidate_count=10):
+    rows = {}
+    uncertain = []
+    for ingredient, (title, score) in zip(ingredients, matcher.match(ingredients)):
+        score = round(score, 3)
+        if score >= threshold:
+            rows[ingredient] = (ingredient, title, score, 'matcher', score)
+        else:
+            uncertain.append(ingredient)
+            rows[ingredient] = (ingredient, 'none', score, 'none', score)
+
+    if client is not None and uncertain:
+        answers = llm_matches(client, uncertain, matcher.candidates(uncertain, candidate_count))
+        for ingredient in uncertain:
+            rows[ingredient] = (ingredient, 'none', 0.0, 'llm', rows[ingredient][4])
+        named = [(ingredient, answers[ingredient]) for ingredient in uncertain
+                 if answers.get(ingredient, 'none').strip("'\" ").lower() != 'none']
+        # Snap free-text answers onto the catalog title they are closest to
+        snapped = matcher.match([answer for _, answer in named]) if named else []
+        for (ingredient, answer), (title, score) in zip(named, snapped):
+            rows[ingredient] = (ingredient, title or answer, round(score, 3), 'llm', rows[ingredient][4])
+
+    return [rows[ingredient] for ingredient in ingredients]
+
+
+# Work out which ingredients need matching against the current catalog.
+# Unchanged stored matches are carried over to the new catalog version; an
+# ingredient is re-matched when it is new, when its matched title left the
+# catalog, when a newly added title scores higher than its best local match,
+# or when it was left at 'none' without the LLM and an LLM is now available.
+def plan_matches(store, ingredients, matcher, version, use_llm, full=False):
+    keys = {}
+    for ingredient in ingredients:
+        keys.setdefault(normalize(ingredient), ingredient)
+    keys.pop('', None)
+
+    previous = store.latest_version()
+    stored = store.matches(previous) if previous and not full else {}
+    report = {'ingredients': len(keys), 'previous_version': previous, 'version': version,
+              'titles_added': 0, 'titles_removed': 0, 'new': 0, 'catalog_changed': 0, 'llm_retry': 0}
+
+    stale = set()
+    if stored and previous != version:
+        old_titles = store.titles(previous)
+        current_titles = set(matcher.item_titles)
+        added = current_titles - old_titles
+        removed = old_titles - current_titles
+        report['titles_added'] = len(added)
+        report['titles_removed'] = len(removed)
+        stale = {key for key, (_, match, _, _, _) in stored.items() if match in removed}
+        if added:
+            # One vectorized pass: best score of every stored ingredient over the added titles
+            columns = sorted({position for position, title in enumerate(matcher.item_titles) if title in added})
+            stored_keys = list(stored)
+            best_added = matcher.index.scores(stored_keys)[:, columns].max(axis=1)
+            stale |= {key for key, score in zip(stored_keys, best_added) if round(score, 3) > stored[key][4]}
+
+    retry = set()
+    if use_llm:
+        retry = {key for key, (_, _, _, source, _) in stored.items() if source == 'none'}
+
+    pending = []
+    for key, ingredient in keys.items():
+        if key not in stored:
+            report['new'] += 1
+        elif key in stale:
+            report['catalog_changed'] += 1
+        elif key in retry:
+            report['llm_retry'] += 1
+        else:
+            continue
+        pending.append(ingredient)
+
+    if stored and previous != version:
+        store.carry_forward(previous, version, [key for key in stored if key not in stale and key not in retry])
+    store.add_version(version, matcher.item_titles)
+    report['reused'] = len(keys) - len(pending)
+    return keys, pending, report
+
+
+# Match the pending ingredients in batches spread over a thread pool (the LLM
+# requests are what the threads wait on) and save each batch as it finishes,
+# so an interrupted run keeps the batches it completed
+def dispatch(pending, matcher, threshold, client, store, version, batch_size=200, workers=4, candidate_count=10):
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    sent_to_llm = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(match_ingredients, batch, matcher, threshold, client, candidate_count)
+                   for batch in batches]
+        for done, future in enumerate(as_completed(futures), start=1):
+            rows = future.result()
+            store.save(version, [(normalize(row[0]), *row) for row in rows])
+            sent_to_llm += sum(1 for row in rows if row[3] == 'llm')
+            print(f"Batch {done}/{len(batches)} saved ({len(rows)} ingredients)")
+    return len(batches), sent_to_llm
+
+
+def print_report(report, batches, sent_to_llm, workers, elapsed):
+    if report['previous_version'] is None:
+        print(f"Catalog version {report['version']} (no earlier matches stored)")
+    elif report['previous_version'] == report['version']:
+        print(f"Catalog version {report['version']} unchanged")
+    else:
+        print(f"Catalog version {report['previous_version']} -> {report['version']}: "
+              f"{report['titles_added']} titles added, {report['titles_removed']} removed")
+    matched = report['ingredients'] - report['reused']
+    skipped = report['reused'] / report['ingredients'] if report['ingredients'] else 0
+    print(f"{report['ingredients']} unique ingredients: {report['reused']} reused from the store "
+          f"({skipped:.1%} of the work skipped), {matched} matched "
+          f"({report['new']} new, {report['catalog_changed']} after catalog changes, "
+          f"{report['llm_retry']} retried with the LLM)")
+    print(f"Matched {matched} ingredients in {batches} batches over {workers} workers in {elapsed:.2f}s; "
+          f"{sent_to_llm} went to the LLM")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match recipe ingredients to Trader Joe's items")
+    parser.add_argument("--items", default="../Trader_Joes/Cleaned_trader_joes_items.csv")
+    parser.add_argument("--recipes", default="../Edamam/recipes.csv")
+    parser.add_argument("--output", default="remade_recipes.csv")
+    parser.add_argument("--store", default="match_store.sqlite3", help="SQLite file keeping matches between runs")
+    parser.add_argument("--full", action="store_true", help="Re-match every ingredient, ignoring stored matches")
+    parser.add_argument("--threshold", type=float, default=0.6,
+                        help="Matcher score at or above which a match is accepted without the LLM")
+    parser.add_argument("--candidates", type=int, default=10, help="Candidate titles sent per ingredient to the LLM")
+    parser.add_argument("--batch-size", type=int, default=200, help="Ingredients per batch (and per LLM request)")
+    parser.add_argument("--workers", type=int, default=4, help="Batches matched at once")
+    parser.add_argument("--no-llm", action="store_true", help="Never call the LLM")
+    args = parser.parse_args()
+
+    # Load environment variables from .env file
+    load_dotenv()
+    api_key = os.getenv("OPENAI_KEY")
+    client = None
+    if args.no_llm:
+        pass
+    elif api_key:
+        client = OpenAI(api_key=api_key)
+    else:
+        print("OPENAI_KEY is not set; running without the LLM fallback")
+
+    item_titles = load_item_titles(args.items)
+    ingredients = load_ingredients(args.recipes)
+
+    start = time.perf_counter()
+    matcher = ItemMatcher(item_titles)
+    print(f"Indexed {len(item_titles)} Trader Joe's items in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    store = MatchStore(args.store)
+    try:
+        version = MatchStore.catalog_version(item_titles)
+        keys, pending, report = plan_matches(store, ingredients, matcher, version, client is not None, args.full)
+        start = time.perf_counter()
+        batches, sent_to_llm = dispatch(pending, matcher, args.threshold, client, store, version,
+                                        args.batch_size, args.workers, args.candidates)
+        print_report(report, batches, sent_to_llm, args.workers, time.perf_counter() - start)
+
+        # The output always covers every current ingredient
+        stored = store.matches(version)
+        all_matches = [stored[key][:4] for key in keys]
+        store.prune(version)
+    finally:
+        store.close()
+
+    # Save all matches to a CSV file
+    df_matches = pd.DataFrame(all_matches, columns=OUTPUT_COLUMNS)
+    df_matches.to_csv(args.output, index=False)
+    print(f"Wrote {len(df_matches)} matches to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import re
+import unicodedata
+
+import numpy as np
+
+
+# Offline nearest-match engine for ingredient -> Trader Joe's item matching.
+# Every title is split into character n-grams of its words (" lemon " -> " le",
+# "lem", "emo", ...) and weighted with TF-IDF, so "lemons", "lemon rind" and
+# "Sicilian Lemon Juice" share most of their grams while spelling variants and
+# plurals still line up. The weights are kept as postings lists (gram -> item
+# rows, weights) in flat numpy arrays, and a batch of queries is scored against
+# every title in one bincount, which answers in well under a millisecond per
+# query on CPU.
+
+
+# Lowercase, strip accents and list numbering ("2. Crème Fraîche" -> "creme fraiche")
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    text = re.sub(r"^\s*\d+\.\s*", "", text.lower())
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+# Character n-grams inside word boundaries, with the count of each gram
+def ngram_counts(text, sizes=(3, 4)):
+    counts = {}
+    for word in normalize(text).split():
+        padded = f" {word} "
+        for size in sizes:
+            for start in range(max(len(padded) - size + 1, 1)):
+                gram = padded[start:start + size]
+                counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+class NgramIndex:
+    def __init__(self, texts, sizes=(3, 4)):
+        self.texts = list(texts)
+        self.sizes = sizes
+        self.vocabulary = {}
+
+        # (row, gram, count) triples for every text
+        rows, grams, counts = [], [], []
+        for row, text in enumerate(self.texts):
+            for gram, count in ngram_counts(text, sizes).items():
+                rows.append(row)
+                grams.append(self.vocabulary.setdefault(gram, len(self.vocabulary)))
+                counts.append(count)
+        rows = np.array(rows, dtype=np.int64)
+        grams = np.array(grams, dtype=np.int64)
+        counts = np.array(counts, dtype=float)
+
+        # Smoothed IDF; a gram no title contains gets the highest weight
+        document_frequency = np.bincount(grams, minlength=len(self.vocabulary))
+        self.idf = np.log((1 + len(self.texts)) / (1 + document_frequency)) + 1
+        self.unknown_idf = np.log(1 + len(self.texts)) + 1
+
+        # Sublinear TF-IDF rows scaled to unit length
+        weights = (1 + np.log(counts)) * self.idf[grams]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(self.texts)))
+        weights /= np.where(norms > 0, norms, 1)[rows]
+
+        # Postings sorted by gram: rows and weights of gram g are in
+        # indptr[g]:indptr[g + 1]
+        order = np.argsort(grams, kind="stable")
+        self.posting_rows = rows[order]
+        self.posting_weights = weights[order]
+        self.indptr = np.concatenate(([0], np.cumsum(document_frequency)))
+
+    def __len__(self):
+        return len(self.texts)
+
+    # Cosine similarity of every query against every text, shape (queries, texts)
+    def scores(self, queries):
+        return self.scores_from_counts([ngram_counts(query, self.sizes) for query in queries])
+
+    # Same, from ngram_counts() of each query, so callers that score one batch
+    # against several indexes only split the queries once. Grams the index has
+    # never seen still count toward the query length, so a query that is mostly
+    # unknown words scores low instead of matching on the few grams it shares.
+    def scores_from_counts(self, query_counts):
+        result = np.zeros((len(query_counts), len(self.texts)))
+        if not self.vocabulary:
+            return result
+        query_rows, query_grams, counts = [], [], []
+        for position, grams in enumerate(query_counts):
+            query_rows.extend([position] * len(grams))
+            query_grams.extend(self.vocabulary.get(gram, -1) for gram in grams)
+            counts.extend(grams.values())
+        query_rows = np.array(query_rows, dtype=np.int64)
+        query_grams = np.array(query_grams, dtype=np.int64)
+        known = query_grams >= 0
+        query_weights = (1 + np.log(np.array(counts, dtype=float))) * np.where(
+            known, self.idf[np.where(known, query_grams, 0)], self.unknown_idf)
+        norms = np.sqrt(np.bincount(query_rows, weights=query_weights ** 2, minlength=len(query_counts)))
+        query_weights = (query_weights / np.where(norms > 0, norms, 1)[query_rows])[known]
+        query_rows = query_rows[known]
+        query_grams = query_grams[known]
+        if not len(query_grams):
+            return result
+
+        # Expand every (query, gram) pair into the postings of that gram
+        starts = self.indptr[query_grams]
+        lengths = self.indptr[query_grams + 1] - starts
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        postings = np.repeat(starts, lengths) + offsets
+        cells = np.repeat(query_rows, lengths) * len(self.texts) + self.posting_rows[postings]
+        products = np.repeat(query_weights, lengths) * self.posting_weights[postings]
+        result += np.bincount(cells, weights=products, minlength=result.size).reshape(result.shape)
+        return result
+
+    # Top k (row, score) pairs for every query, best first
+    def nearest(self, queries, k=1):
+        scores = self.scores(queries)
+        k = min(k, len(self.texts))
+        if k == 0:
+            return [[] for _ in queries]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [list(zip(rows.tolist(), row_scores.tolist())) for rows, row_scores in zip(top, top_scores)]
+
+
+# Matches ingredient names to Trader Joe's item titles
+class ItemMatcher:
+    def __init__(self, item_titles, sizes=(3, 4)):
+        self.item_titles = list(item_titles)
+        self.index = NgramIndex(self.item_titles, sizes)
+
+    # Best title and its score for every ingredient
+    def match(self, ingredients):
+        return [(self.item_titles[row], score) if score > 0 else (None, 0.0)
+                for (row, score), in self.index.nearest(ingredients, k=1)]
+
+    # The k closest titles for every ingredient, to narrow down an LLM prompt
+    def candidates(self, ingredients, k=10):
+        return [[self.item_titles[row] for row, score in nearest if score > 0]
+                for nearest in self.index.nearest(ingredients, k=k)]
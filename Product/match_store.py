@@ -0,0 +1,101 @@
+import hashlib
+import sqlite3
+import time
+
+
+# Persistent ingredient -> item matches, stored in SQLite so a run of
+# combine.py only matches what changed since the last one.
+# Every match is keyed on the normalized ingredient and the catalog version it
+# was made against; the version is a hash of the sorted item titles, and the
+# titles of each version are kept so the next run can diff the catalog.
+# local_score is the best matcher score the ingredient had, which tells whether
+# a newly added title could beat its current match.
+class MatchStore:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS matches ("
+            " ingredient_key TEXT NOT NULL,"
+            " catalog_version TEXT NOT NULL,"
+            " ingredient TEXT NOT NULL,"
+            " match TEXT NOT NULL,"
+            " score REAL NOT NULL,"
+            " source TEXT NOT NULL,"
+            " local_score REAL NOT NULL,"
+            " matched_at REAL NOT NULL,"
+            " PRIMARY KEY (ingredient_key, catalog_version))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS catalog_titles ("
+            " catalog_version TEXT NOT NULL,"
+            " title TEXT NOT NULL,"
+            " PRIMARY KEY (catalog_version, title))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS catalog_versions ("
+            " catalog_version TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def catalog_version(titles):
+        digest = hashlib.sha256("\n".join(sorted(set(titles))).encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    # The most recent catalog version matches were stored for, or None
+    def latest_version(self):
+        row = self.connection.execute(
+            "SELECT catalog_version FROM catalog_versions ORDER BY created_at DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def titles(self, version):
+        rows = self.connection.execute("SELECT title FROM catalog_titles WHERE catalog_version = ?", (version,))
+        return {title for title, in rows}
+
+    def add_version(self, version, titles):
+        self.connection.execute("INSERT OR REPLACE INTO catalog_versions VALUES (?, ?)", (version, time.time()))
+        self.connection.executemany("INSERT OR IGNORE INTO catalog_titles VALUES (?, ?)",
+                                    [(version, title) for title in set(titles)])
+        self.connection.commit()
+
+    # {ingredient_key: (ingredient, match, score, source, local_score)} for one version
+    def matches(self, version):
+        rows = self.connection.execute(
+            "SELECT ingredient_key, ingredient, match, score, source, local_score"
+            " FROM matches WHERE catalog_version = ?", (version,)
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    # rows: (ingredient_key, ingredient, match, score, source, local_score)
+    def save(self, version, rows):
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO matches"
+            " (ingredient_key, catalog_version, ingredient, match, score, source, local_score, matched_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(key, version, *values, now) for key, *values in rows],
+        )
+        self.connection.commit()
+
+    # Copy the matches of old_version that are still valid to new_version
+    def carry_forward(self, old_version, new_version, keys):
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO matches"
+            " SELECT ingredient_key, ?, ingredient, match, score, source, local_score, matched_at"
+            " FROM matches WHERE catalog_version = ? AND ingredient_key = ?",
+            [(new_version, old_version, key) for key in keys],
+        )
+        self.connection.commit()
+
+    # Keep only the given version once a run against it has finished
+    def prune(self, keep_version):
+        self.connection.execute("DELETE FROM matches WHERE catalog_version != ?", (keep_version,))
+        self.connection.execute("DELETE FROM catalog_titles WHERE catalog_version != ?", (keep_version,))
+        self.connection.execute("DELETE FROM catalog_versions WHERE catalog_version != ?", (keep_version,))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
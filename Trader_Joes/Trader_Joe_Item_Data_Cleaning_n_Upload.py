@@ -1,83 +1,22 @@
-import pandas as pd
-import ast
+import argparse
 import os
 
 import pandas as pd
-import pymongo
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
+from item_cleaning import clean_items, parse_string_lists
+from item_loader import ensure_collection, prune_documents, upsert_documents
+from store_bitmap import load_store_numbers, store_order_hash, store_positions, build_store_skus
 
-#Extract necessary category information from the category column data
-def extract_category_names(cat_list):
-    names = []
-    for category in cat_list:
-        names.append(category['name'])
-    return names
-
-# Load the CSV data into a DataFrame
-file_path = 'trader_joes_items.csv'
-df = pd.read_csv(file_path)
-
-#Clear all spaces
-df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-df.columns = df.columns.str.strip()
-for col in df.columns:
-    if df[col].dtype == 'object':
-        df[col] = df[col].str.strip()
-
-#Select necessary columns
-df = df[
-    ['item_title',
-     'sku',
-     'storeCode',
-     'category_hierarchy',
-     'sales_size',
-     'sales_uom_description',
-     'retail_price',
-     'fun_tags',
-     'item_characteristics']
-]
-
-#Build new columns for category and input the extracted category labels
-df['category_hierarchy'] = df['category_hierarchy'].apply(ast.literal_eval)
-df['category_names'] = df['category_hierarchy'].apply(extract_category_names)
-
-category_names_expanded = df['category_names'].apply(pd.Series)
-category_names_expanded.drop(columns=1)
-category_names_expanded.drop(columns=[0, 1], inplace=True)
-
-category_names_expanded.columns = [f'category_{i+1}' for i in range(category_names_expanded.shape[1])]
-
-# Concatenate the new columns back to the original DataFrame
-df = pd.concat([df, category_names_expanded], axis=1)
-
-# Drop some unecessary columns from the original database
-df.drop(columns=['category_hierarchy'], inplace=True)
-df.drop(columns=['category_names'], inplace=True)
-
-csv_file_path = 'Cleaned_trader_joes_items.csv'
-df.to_csv(csv_file_path, index=False)
-
-# THE FOLLOWING CODE UPLOADS THE CSV DATA TO OUR MONGODB DATABASE
-#Connect to the database
-uri = os.getenv('MONGODB_URI')
-client = MongoClient(uri, server_api=ServerApi('1'))
-try:
-    client.admin.command('ping')
-    print("Pinged your deployment. You successfully connected to MongoDB!")
-except Exception as e:
-    print("Connection error:", e)
-
-# Define database and schema
-db = client["Sweet_Violet"]
+# Schema for the Trader_Joes_Items collection
 trader_joes_items_schema = {
     "$jsonSchema": {
         "bsonType": "object",
-        "required": ["item_title", "sku", "storeCode", "sales_size", "sales_uom_description", "retail_price", "fun_tags", "item_characteristics", "category_1", "category_2"],
+        "required": ["item_title", "sku", "storeBitmap", "sales_size", "sales_uom_description", "retail_price", "fun_tags", "item_characteristics", "category_1", "category_2"],
         "properties": {
             "item_title": {"bsonType": "string"},
             "sku": {"bsonType": "int"},
-            "storeCode": {"bsonType": "array", "items": {"bsonType": "int"}},
+            "storeBitmap": {"bsonType": "binData"},
             "sales_size": {"bsonType": "double"},
             "sales_uom_description": {"bsonType": "string"},
             "retail_price": {"bsonType": "double"},
@@ -89,38 +28,84 @@ trader_joes_items_schema = {
     }
 }
 
-# Create Trader_Joes_Items collection with schema
-collection_name = "Trader_Joes_Items"
-db.create_collection(collection_name, validator=trader_joes_items_schema)
-
-# Load the csv data into a DataFrame
-file_path = 'Cleaned_trader_joes_items.csv'
-df = pd.read_csv(file_path)
-
-# Further data cleaning before upload
-df.columns = df.columns.str.strip()  # Strip whitespace from column headers
-
-# Ensure data types match the schema
-df['sku'] = pd.to_numeric(df['sku'], errors='coerce').fillna(0).astype(int)
-df['sales_size'] = pd.to_numeric(df['sales_size'], errors='coerce').fillna(0).astype(float)
-df['retail_price'] = pd.to_numeric(df['retail_price'], errors='coerce').fillna(0).astype(float)
-
-# Convert storeCode to list of integers
-df['storeCode'] = df['storeCode'].apply(lambda x: list(map(int, str(x).split(','))) if isinstance(x, str) else [x])
-
-# Convert fun_tags and item_characteristics to lists, replacing NaN with empty lists
-df['fun_tags'] = df['fun_tags'].apply(lambda x: eval(x) if isinstance(x, str) else [])  # Convert to list or empty list if NaN
-df['item_characteristics'] = df['item_characteristics'].apply(lambda x: eval(x) if isinstance(x, str) else [])
-
-# Handle NaN values in fun_tags and item_characteristics
-df['fun_tags'] = df['fun_tags'].apply(lambda x: x if isinstance(x, list) else [])
-df['item_characteristics'] = df['item_characteristics'].apply(lambda x: x if isinstance(x, list) else [])
-
-# Insert data into Trader_Joes_Items collection
-trader_joes_items = df.to_dict(orient='records')
-items_collection = db[collection_name]
-try:
-    items_collection.insert_many(trader_joes_items)
-    print("Data inserted successfully!")
-except pymongo.errors.BulkWriteError as e:
-    print("BulkWriteError:", e.details)
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the scraped Trader Joe's items and upsert them into MongoDB")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per bulk_write")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Raw CSV rows cleaned at a time")
+    parser.add_argument("--skip-clean", action="store_true", help="Upload the existing Cleaned_trader_joes_items.csv")
+    parser.add_argument("--prune", action="store_true", help="Delete items whose sku is not in this upload")
+    args = parser.parse_args()
+
+    # Clean the raw scrape in chunks: trimmed text, store bitmaps and category columns
+    store_numbers = load_store_numbers('store_numbers.csv')
+    positions = store_positions(store_numbers)
+    csv_file_path = 'Cleaned_trader_joes_items.csv'
+    # The store order the cleaned bitmaps were built with is recorded next to them
+    store_order_path = csv_file_path + '.store_order'
+    if not args.skip_clean:
+        rows = clean_items('trader_joes_items.csv', csv_file_path, positions, args.chunk_size)
+        with open(store_order_path, 'w') as f:
+            f.write(store_order_hash(store_numbers) + '\n')
+        print(f"Cleaned {rows} items into {csv_file_path}")
+
+    # Refuse to upload bitmaps under a store order they were not built with
+    try:
+        with open(store_order_path) as f:
+            recorded_order = f.read().strip()
+    except FileNotFoundError:
+        recorded_order = None
+    if recorded_order != store_order_hash(store_numbers):
+        print(f"{csv_file_path} was not cleaned with the current store_numbers.csv "
+              f"({store_order_path} is missing or differs); re-run without --skip-clean")
+        exit(1)
+
+    # THE FOLLOWING CODE UPLOADS THE CSV DATA TO OUR MONGODB DATABASE
+    #Connect to the database
+    uri = os.getenv('MONGODB_URI')
+    client = MongoClient(uri, server_api=ServerApi('1'))
+    try:
+        client.admin.command('ping')
+        print("Pinged your deployment. You successfully connected to MongoDB!")
+    except Exception as e:
+        print("Connection error:", e)
+    db = client["Sweet_Violet"]
+
+    # Create the Trader_Joes_Items collection with its schema, or reuse it on a re-run
+    items_collection = ensure_collection(db, "Trader_Joes_Items", trader_joes_items_schema)
+
+    # Load the csv data into a DataFrame
+    df = pd.read_csv(csv_file_path, dtype={'storeBitmap': str})
+
+    # Further data cleaning before upload
+    df.columns = df.columns.str.strip()  # Strip whitespace from column headers
+
+    # Ensure data types match the schema
+    df['sku'] = pd.to_numeric(df['sku'], errors='coerce').fillna(0).astype(int)
+    df['sales_size'] = pd.to_numeric(df['sales_size'], errors='coerce').fillna(0).astype(float)
+    df['retail_price'] = pd.to_numeric(df['retail_price'], errors='coerce').fillna(0).astype(float)
+
+    # Store bitmaps are uploaded as binary; bit i is the store on row i of store_numbers.csv
+    df['storeBitmap'] = df['storeBitmap'].apply(bytes.fromhex)
+
+    # Convert fun_tags and item_characteristics to lists, replacing NaN with empty lists
+    df['fun_tags'] = parse_string_lists(df['fun_tags'])
+    df['item_characteristics'] = parse_string_lists(df['item_characteristics'])
+
+    # Save the store order the bitmaps were built with, so the API can decode them
+    db["Store_Index"].replace_one({"_id": "trader_joes"}, {"_id": "trader_joes", "stores": store_numbers}, upsert=True)
+
+    # Upsert every item on its sku, so re-running the upload never duplicates items
+    upsert_documents(items_collection, df.to_dict(orient='records'), "sku", args.batch_size)
+    if args.prune:
+        prune_documents(items_collection, df['sku'].tolist(), "sku")
+
+    # Build the store -> skus inverted index used by GET /stores/{store_code}/items
+    store_skus = build_store_skus(df['sku'].tolist(), df['storeBitmap'].tolist(), store_numbers)
+    store_items = [{"_id": store_code, "skus": skus} for store_code, skus in store_skus.items()]
+    upsert_documents(db["Store_Items"], store_items, "_id", args.batch_size)
+    prune_documents(db["Store_Items"], list(store_skus), "_id")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import random
+import time
+
+from traderjoes import aggregate_items
+
+
+# Times the scraper's merge step on synthetic data shaped like a full scrape:
+# every store carries a random subset of one shared catalog.
+#   python Trader_Joes/aggregation_benchmark.py --stores 600 --items 1500
+
+
+def synthetic_scrape(store_count, item_count, coverage, seed=0):
+    rng = random.Random(seed)
+    catalog = [{'item_title': f"Item {n}", 'sku': str(100000 + n), 'retail_price': "2.99"} for n in range(item_count)]
+    all_items = []
+    for store in range(1, store_count + 1):
+        for item in catalog:
+            if rng.random() < coverage:
+                all_items.append({**item, 'storeCode': str(store)})
+    return all_items
+
+
+# The merge loop main() used before: storeCode is a growing comma-joined
+# string that is split again for every membership check
+def string_merge(all_items):
+    item_dict = {}
+    for item in all_items:
+        item_name = item['item_title'].lower()
+        if item_name not in item_dict:
+            item_dict[item_name] = item
+            item_dict[item_name]['storeCode'] = str(item['storeCode'])
+        else:
+            existing_store_codes = item_dict[item_name]['storeCode']
+            new_store_code = str(item['storeCode'])
+            if new_store_code not in existing_store_codes.split(', '):
+                item_dict[item_name]['storeCode'] += f", {new_store_code}"
+    return list(item_dict.values())
+
+
+def timed(function, all_items):
+    # Both merges modify or copy the item dicts, so each gets its own copy
+    items = [dict(item) for item in all_items]
+    start = time.perf_counter()
+    result = function(items)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scraper's item/store aggregation")
+    parser.add_argument("--stores", type=int, default=600)
+    parser.add_argument("--items", type=int, default=1500)
+    parser.add_argument("--coverage", type=float, default=0.9, help="Share of the catalog each store carries")
+    args = parser.parse_args()
+
+    all_items = synthetic_scrape(args.stores, args.items, args.coverage)
+    print(f"{len(all_items)} (store, item) rows from {args.stores} stores x {args.items} items")
+
+    old_seconds, old_result = timed(string_merge, all_items)
+    new_seconds, new_result = timed(aggregate_items, all_items)
+
+    old_stores = {item['sku']: set(item['storeCode'].split(', ')) for item in old_result}
+    new_stores = {item['sku']: set(item['storeCode'].split(', ')) for item in new_result}
+    assert old_stores == new_stores, "aggregations disagree"
+
+    print(f"string merge:    {old_seconds:.2f}s")
+    print(f"set aggregation: {new_seconds:.2f}s ({old_seconds / new_seconds:.1f}x faster)")
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.server_api import ServerApi
+from store_bitmap import store_positions
+
+
+# Apply the (store, sku) deltas written by `traderjoes.py --incremental` to the
+# Trader_Joes_Items collection, so a nightly run only touches what changed
+# instead of re-uploading the whole catalog:
+#   added   -> store bit set in the item's storeBitmap (item created if new)
+#   removed -> store bit cleared in the item's storeBitmap
+#   changed -> item fields updated
+# Bits follow the store order saved in the Store_Index collection. The
+# Store_Items inverted index (store -> skus) is updated to match.
+# Field cleaning matches Trader_Joe_Item_Data_Cleaning_n_Upload.py.
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def clean_item(item):
+    category_names = [category['name'] for category in item.get('category_hierarchy') or []]
+    return {
+        "item_title": str(item.get('item_title', '')).strip(),
+        "sales_size": to_float(item.get('sales_size')),
+        "sales_uom_description": str(item.get('sales_uom_description') or '').strip(),
+        "retail_price": to_float(item.get('retail_price')),
+        "fun_tags": item.get('fun_tags') or [],
+        "item_characteristics": item.get('item_characteristics') or [],
+        "category_1": category_names[2] if len(category_names) > 2 else "",
+        "category_2": category_names[3] if len(category_names) > 3 else "",
+    }
+
+
+# Fold every delta for one sku into its current bitmap and fields, giving one
+# update per sku. bitmaps maps sku -> the storeBitmap stored in Mongo.
+# A sku that is not in Mongo yet can only be created from a delta carrying its
+# item; one with nothing but "removed" deltas is skipped. Returns the
+# operations and the skipped skus.
+def sku_operations(deltas, bitmaps, positions):
+    by_sku = {}
+    for delta in deltas:
+        by_sku.setdefault(int(delta['sku']), []).append(delta)
+
+    operations = []
+    skipped = []
+    for sku, sku_deltas in by_sku.items():
+        bitmap = bytearray(bitmaps.get(sku) or bytes((len(positions) + 7) // 8))
+        fields = None
+        new_item = sku not in bitmaps
+        for delta in sku_deltas:
+            position = positions[int(delta['store_code'])]
+            if delta['change'] == "removed":
+                bitmap[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+            else:
+                bitmap[position >> 3] |= 1 << (position & 7)
+            if delta['change'] == "changed" or (new_item and delta['item'] is not None):
+                fields = clean_item(delta['item'])
+        if new_item and fields is None:
+            skipped.append(sku)
+            continue
+        update = {"$set": {"storeBitmap": bytes(bitmap)}}
+        if fields is not None:
+            update["$set"].update(fields)
+        operations.append(UpdateOne({"sku": sku}, update, upsert=new_item))
+    return operations, skipped
+
+
+# Keep Store_Items in step: a sku is added to or pulled from its store's list
+def store_item_operations(deltas):
+    operations = []
+    for delta in deltas:
+        store_code = int(delta['store_code'])
+        sku = int(delta['sku'])
+        if delta['change'] == "added":
+            operations.append(UpdateOne({"_id": store_code}, {"$addToSet": {"skus": sku}}, upsert=True))
+        elif delta['change'] == "removed":
+            operations.append(UpdateOne({"_id": store_code}, {"$pull": {"skus": sku}}))
+    return operations
+
+
+def load_deltas(delta_file):
+    with open(delta_file) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply incremental store deltas to MongoDB")
+    parser.add_argument("--delta-file", default="store_deltas.jsonl")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--keep", action="store_true", help="Keep the delta file after applying it")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.delta_file):
+        print(f"No deltas to apply ({args.delta_file} not found)")
+        return
+    deltas = load_deltas(args.delta_file)
+    print(f"Applying {len(deltas)} deltas")
+
+    load_dotenv()
+    client = MongoClient(os.getenv('MONGODB_URI'), server_api=ServerApi('1'))
+    db = client["Sweet_Violet"]
+    items_collection = db["Trader_Joes_Items"]
+    positions = store_positions(db["Store_Index"].find_one({"_id": "trader_joes"})["stores"])
+
+    skus = list({int(delta['sku']) for delta in deltas})
+    bitmaps = {item["sku"]: item.get("storeBitmap")
+               for item in items_collection.find({"sku": {"$in": skus}}, {"sku": 1, "storeBitmap": 1})}
+    operations, skipped = sku_operations(deltas, bitmaps, positions)
+    if skipped:
+        print(f"Skipped {len(skipped)} skus that are not in the collection and have no item data: {skipped[:10]}")
+    failed = 0
+    for start in range(0, len(operations), args.batch_size):
+        batch = operations[start:start + args.batch_size]
+        try:
+            result = items_collection.bulk_write(batch, ordered=False)
+            print(f"Batch {start // args.batch_size + 1}: {result.modified_count} modified, "
+                  f"{result.upserted_count} created")
+        except BulkWriteError as e:
+            # The valid updates of an unordered batch are still applied
+            errors = e.details["writeErrors"]
+            failed += len(errors)
+            print(f"Batch {start // args.batch_size + 1}: {e.details['nModified']} modified, "
+                  f"{e.details['nUpserted']} created, {len(errors)} failed")
+            for error in errors[:3]:
+                print(f"  {error.get('op', {}).get('q')}: {error['errmsg']}")
+
+    # Skipped skus have no item, so they are left out of the store index too
+    store_operations = store_item_operations([delta for delta in deltas if int(delta['sku']) not in skipped])
+    for start in range(0, len(store_operations), args.batch_size):
+        db["Store_Items"].bulk_write(store_operations[start:start + args.batch_size], ordered=False)
+    print(f"Updated the store item index with {len(store_operations)} changes")
+
+    # Deltas are only removed once they are all applied, so a failed run can be retried
+    if failed:
+        print(f"{failed} item updates failed; keeping {args.delta_file} so the run can be retried")
+    elif not args.keep:
+        os.remove(args.delta_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import ast
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from item_cleaning import clean_items, parse_string_lists
+from store_bitmap import decode_stores, load_store_numbers, store_positions
+
+
+# Before/after timing of the item cleaning stage. The raw scrape is not kept in
+# the repo, so a raw-format copy is rebuilt from Cleaned_trader_joes_items.csv
+# (store codes, category_hierarchy and tag lists as the scraper writes them)
+# and repeated --scale times.
+#   python cleaning_benchmark.py --scale 10
+
+
+def build_raw_copy(path, store_numbers, scale):
+    cleaned = pd.read_csv('Cleaned_trader_joes_items.csv', encoding='latin1', dtype={'storeBitmap': str})
+    raw = pd.DataFrame({
+        'item_title': cleaned['item_title'],
+        'sku': cleaned['sku'],
+        'storeCode': [', '.join(map(str, decode_stores(bytes.fromhex(bitmap), store_numbers)))
+                      for bitmap in cleaned['storeBitmap']],
+        'category_hierarchy': [
+            str([{'id': 2, 'name': 'Products'}, {'id': 8, 'name': 'Food'},
+                 {'id': 1, 'name': category_1}, {'id': 3, 'name': category_2}])
+            for category_1, category_2 in zip(cleaned['category_1'], cleaned['category_2'])
+        ],
+        'sales_size': cleaned['sales_size'],
+        'sales_uom_description': cleaned['sales_uom_description'],
+        'retail_price': cleaned['retail_price'],
+        'fun_tags': cleaned['fun_tags'],
+        'item_characteristics': cleaned['item_characteristics'],
+    })
+    pd.concat([raw] * scale, ignore_index=True).to_csv(path, index=False)
+
+
+# The cleaning and list parsing as the script did them before: literal_eval
+# and eval per row, pd.Series expansion and a per-row store code split
+def old_clean(raw_path):
+    df = pd.read_csv(raw_path)
+    df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
+    df['category_hierarchy'] = df['category_hierarchy'].apply(ast.literal_eval)
+    df['category_names'] = df['category_hierarchy'].apply(lambda cat_list: [category['name'] for category in cat_list])
+    category_names_expanded = df['category_names'].apply(pd.Series)
+    category_names_expanded.drop(columns=[0, 1], inplace=True)
+    category_names_expanded.columns = [f'category_{i+1}' for i in range(category_names_expanded.shape[1])]
+    df = pd.concat([df, category_names_expanded], axis=1)
+    df.drop(columns=['category_hierarchy', 'category_names'], inplace=True)
+    df['storeCode'] = df['storeCode'].apply(lambda x: list(map(int, str(x).split(','))) if isinstance(x, str) else [x])
+    df['fun_tags'] = df['fun_tags'].apply(lambda x: eval(x) if isinstance(x, str) else [])
+    df['item_characteristics'] = df['item_characteristics'].apply(lambda x: eval(x) if isinstance(x, str) else [])
+    return df
+
+
+def new_clean(raw_path, cleaned_path, positions, chunk_size):
+    clean_items(raw_path, cleaned_path, positions, chunk_size)
+    df = pd.read_csv(cleaned_path, dtype={'storeBitmap': str})
+    df['fun_tags'] = parse_string_lists(df['fun_tags'])
+    df['item_characteristics'] = parse_string_lists(df['item_characteristics'])
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Trader Joe's item cleaning stage")
+    parser.add_argument("--scale", type=int, default=10, help="Copies of the catalog in the raw file")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    store_numbers = load_store_numbers('store_numbers.csv')
+    positions = store_positions(store_numbers)
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, 'raw.csv')
+        cleaned_path = os.path.join(tmp, 'cleaned.csv')
+        build_raw_copy(raw_path, store_numbers, args.scale)
+        print(f"Raw copy: {os.path.getsize(raw_path) / 1e6:.0f} MB")
+
+        start = time.perf_counter()
+        old = old_clean(raw_path)
+        old_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = new_clean(raw_path, cleaned_path, positions, args.chunk_size)
+        new_seconds = time.perf_counter() - start
+
+    for column in ['category_1', 'category_2', 'fun_tags', 'item_characteristics']:
+        assert old[column].tolist() == new[column].tolist(), column
+    assert old['storeCode'].map(sorted).tolist() == [
+        sorted(decode_stores(bytes.fromhex(bitmap), store_numbers)) for bitmap in new['storeBitmap']
+    ]
+
+    print(f"{len(new)} rows, outputs match")
+    print(f"before: {old_seconds:.2f}s")
+    print(f"after:  {new_seconds:.2f}s ({old_seconds / new_seconds:.1f}x faster)")
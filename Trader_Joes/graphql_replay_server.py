@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Local stand-in for the Trader Joe's GraphQL API that replays responses saved
+# by `traderjoes.py --record-dir`. Use it to test the scraper offline:
+#   python traderjoes.py --record-dir recorded_responses      (once, against the real API)
+#   python graphql_replay_server.py --responses recorded_responses --port 8100 --fail-rate 0.1
+#   python traderjoes.py --url http://localhost:8100/api/graphql --checkpoint-dir test_checkpoints
+# --fail-rate answers a share of requests with 429/503 to exercise retries.
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    responses_dir = "recorded_responses"
+    fail_rate = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        variables = body.get("variables", {})
+
+        if random.random() < self.fail_rate:
+            self.send_response(random.choice([429, 503]))
+            self.send_header("Retry-After", "0.1")
+            self.end_headers()
+            return
+
+        path = os.path.join(self.responses_dir, f"{variables.get('storeCode')}_{variables.get('currentPage')}.json")
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                payload = file.read()
+        else:
+            # Unknown store/page: an empty result like the real API returns
+            payload = json.dumps({"data": {"products": {"items": [], "total_count": 0,
+                                                        "pageInfo": {"currentPage": 1, "totalPages": 1}}}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded Trader Joe's GraphQL responses")
+    parser.add_argument("--responses", default="recorded_responses")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    ReplayHandler.responses_dir = args.responses
+    ReplayHandler.fail_rate = args.fail_rate
+    print(f"Replaying {args.responses} on http://localhost:{args.port}/api/graphql")
+    ThreadingHTTPServer(("127.0.0.1", args.port), ReplayHandler).serve_forever()
@@ -0,0 +1,81 @@
+import ast
+import re
+
+import pandas as pd
+
+from store_bitmap import store_codes_to_hex
+
+
+# Cleaning stage for the raw scrape (trader_joes_items.csv). The scraper writes
+# list columns as Python reprs, e.g. "['Kosher', 'Organic']" and
+# "[{'id': 2, 'name': 'Products'}, ...]". They are parsed a column at a time
+# with one compiled regex over the quoted strings, never with eval(), and
+# without building an AST per value. Only the rare value holding a backslash
+# escape goes through ast.literal_eval, which is safe but slow.
+
+RAW_COLUMNS = ['item_title', 'sku', 'storeCode', 'category_hierarchy', 'sales_size',
+               'sales_uom_description', 'retail_price', 'fun_tags', 'item_characteristics']
+
+# A single- or double-quoted string without escapes; one of the two groups matches
+QUOTED = re.compile(r"""'([^'\\]*)'|"([^"\\]*)\"""")
+CATEGORY_NAME = re.compile(r"""'name':\s*(?:'([^'\\]*)'|"([^"\\]*)")""")
+
+
+# The strings matched by pattern in each value; missing values give []
+def findall_column(values, pattern, parse_literal):
+    parsed = []
+    for value in values:
+        if not isinstance(value, str):
+            parsed.append([])
+        elif '\\' in value:
+            parsed.append(parse_literal(value))
+        else:
+            parsed.append([single or double for single, double in pattern.findall(value)])
+    return pd.Series(parsed, index=values.index, dtype=object)
+
+
+# "['Kosher', 'Organic']" -> ['Kosher', 'Organic']
+def parse_string_lists(values):
+    return findall_column(values, QUOTED, ast.literal_eval)
+
+
+def literal_category_names(value):
+    return [category['name'] for category in ast.literal_eval(value)]
+
+
+# The item schema keeps two category levels
+CATEGORY_COLUMNS = ['category_1', 'category_2']
+
+
+# category_hierarchy -> category_1, category_2. The first two names are
+# always "Products" and "Food", so they are dropped. The columns are fixed so
+# every chunk writes the same header.
+def category_columns(category_hierarchy):
+    names = findall_column(category_hierarchy, CATEGORY_NAME, literal_category_names)
+    expanded = pd.DataFrame(names.tolist(), index=names.index).iloc[:, 2:2 + len(CATEGORY_COLUMNS)]
+    expanded.columns = CATEGORY_COLUMNS[:expanded.shape[1]]
+    return expanded.reindex(columns=CATEGORY_COLUMNS)
+
+
+def clean_chunk(df, positions):
+    #Clear all spaces
+    df.columns = df.columns.str.strip()
+    df = df[RAW_COLUMNS].apply(lambda x: x.str.strip() if x.dtype == "object" else x)
+
+    #Replace the comma-joined store codes with a compact store bitmap (hex in the CSV)
+    df['storeCode'] = store_codes_to_hex(df['storeCode'], positions)
+    df = df.rename(columns={'storeCode': 'storeBitmap'})
+
+    #Build new columns for category and drop the raw hierarchy
+    df = pd.concat([df.drop(columns=['category_hierarchy']), category_columns(df['category_hierarchy'])], axis=1)
+    return df
+
+
+# Clean the raw CSV chunk by chunk, so memory stays bounded by chunk_size rows
+def clean_items(raw_path, cleaned_path, positions, chunk_size=50000):
+    rows = 0
+    for n, chunk in enumerate(pd.read_csv(raw_path, chunksize=chunk_size)):
+        cleaned = clean_chunk(chunk, positions)
+        cleaned.to_csv(cleaned_path, index=False, mode='w' if n == 0 else 'a', header=n == 0)
+        rows += len(cleaned)
+    return rows
@@ -0,0 +1,66 @@
+import time
+
+from pymongo import ASCENDING, ReplaceOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+
+
+# Idempotent loading of the cleaned items into MongoDB. Every document is
+# upserted on its sku, so running the upload again replaces items in place
+# instead of inserting duplicates.
+
+
+# Create the collection with its validator, or update the validator if it
+# already exists from an earlier run
+def ensure_collection(db, collection_name, schema):
+    try:
+        db.create_collection(collection_name, validator=schema)
+        print(f"Created collection {collection_name}")
+    except CollectionInvalid:
+        db.command("collMod", collection_name, validator=schema)
+        print(f"Collection {collection_name} already exists; validator updated")
+    collection = db[collection_name]
+    try:
+        collection.create_index([("sku", ASCENDING)], name="sku", unique=True)
+    except OperationFailure as e:
+        # Duplicate skus left by older insert_many uploads block the unique index
+        print(f"Could not create the unique sku index: {e}")
+    return collection
+
+
+# Upsert documents keyed on key_field in unordered batches, printing progress
+# and throughput. A batch with invalid documents still writes the valid ones.
+def upsert_documents(collection, documents, key_field="sku", batch_size=1000):
+    total = len(documents)
+    written = 0
+    upserted = 0
+    modified = 0
+    errors = 0
+    start = time.perf_counter()
+    for offset in range(0, total, batch_size):
+        batch = documents[offset:offset + batch_size]
+        operations = [ReplaceOne({key_field: document[key_field]}, document, upsert=True) for document in batch]
+        try:
+            result = collection.bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            errors += len(details["writeErrors"])
+            for error in details["writeErrors"][:3]:
+                print(f"  skipped {key_field}={batch[error['index']][key_field]}: {error['errmsg']}")
+        upserted += details["nUpserted"]
+        modified += details["nModified"]
+        written += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"{written}/{total} documents ({written / elapsed:.0f} docs/sec)")
+
+    elapsed = time.perf_counter() - start
+    print(f"Upserted {total} documents in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} docs/sec): "
+          f"{upserted} new, {modified} changed, {total - upserted - modified - errors} unchanged, {errors} failed")
+    return {"upserted": upserted, "modified": modified, "errors": errors, "seconds": elapsed}
+
+
+# Remove documents whose key is no longer in the upload
+def prune_documents(collection, keys, key_field="sku"):
+    result = collection.delete_many({key_field: {"$nin": list(keys)}})
+    print(f"Removed {result.deleted_count} documents no longer in the upload")
+    return result.deleted_count
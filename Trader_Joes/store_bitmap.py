@@ -0,0 +1,78 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+# Store availability as a fixed bitset over the stores in store_numbers.csv:
+# bit i (byte i // 8, bit i % 8) is set when the store on row i carries the
+# item. The 582 stores fit in 73 bytes, where the comma-joined store code list
+# of a widely stocked item is around 3 KB.
+# The API decodes the bitmaps with the same store order, which the upload
+# script stores in the Store_Index collection.
+
+
+def load_store_numbers(csv_file='store_numbers.csv'):
+    return pd.read_csv(csv_file)['Store Number'].astype(int).tolist()
+
+
+# Fingerprint of the store order; bitmaps built with one order are meaningless
+# under another, so the cleaned CSV records the order it was built with
+def store_order_hash(store_numbers):
+    return hashlib.sha256(','.join(str(int(store_code)) for store_code in store_numbers).encode()).hexdigest()
+
+
+def store_positions(store_numbers):
+    return {store_code: position for position, store_code in enumerate(store_numbers)}
+
+
+def encode_stores(store_codes, positions):
+    bitmap = bytearray((len(positions) + 7) // 8)
+    for store_code in store_codes:
+        position = positions.get(int(store_code))
+        if position is None:
+            raise ValueError(f"Store {store_code} is not in store_numbers.csv")
+        bitmap[position >> 3] |= 1 << (position & 7)
+    return bytes(bitmap)
+
+
+def decode_stores(bitmap, store_numbers):
+    return [store_code for position, store_code in enumerate(store_numbers)
+            if position >> 3 < len(bitmap) and bitmap[position >> 3] >> (position & 7) & 1]
+
+
+# Column of comma-joined store codes ("208, 576, 168") -> hex bitmaps, as
+# written to Cleaned_trader_joes_items.csv. The whole column is split into one
+# flat list of codes, then each code is set in a (rows x stores) bit matrix
+# that is packed into bytes. Codes written as floats ("208.0") are accepted.
+def store_codes_to_hex(store_codes, positions):
+    values = store_codes.fillna('').astype(str).str.strip()
+    present = values != ''
+    parts = [part.strip() for part in ','.join(values[present]).split(',')] if present.any() else []
+    counts = np.where(present, values.str.count(',') + 1, 0)
+    try:
+        codes = np.array(parts, dtype=np.float64).astype(np.int64)
+    except ValueError as e:
+        raise ValueError(f"Store code list could not be parsed: {e}")
+
+    lookup = np.full(max(max(positions), int(codes.max(initial=0))) + 1, -1, dtype=np.int64)
+    lookup[list(positions)] = list(positions.values())
+    columns = lookup[codes]
+    if (columns < 0).any():
+        raise ValueError(f"Store {codes[columns < 0][0]} is not in store_numbers.csv")
+
+    bits = np.zeros((len(values), len(positions)), dtype=bool)
+    bits[np.repeat(np.arange(len(values)), counts), columns] = True
+    packed = np.packbits(bits, axis=1, bitorder='little')
+    return pd.Series([row.tobytes().hex() for row in packed], index=store_codes.index)
+
+
+# Inverted index from store code to the skus sold there, built from the item
+# bitmaps in one pass: unpack every bitmap into a (items x stores) bit matrix
+# and read the skus of each store column
+def build_store_skus(skus, bitmaps, store_numbers):
+    width = (len(store_numbers) + 7) // 8
+    packed = np.frombuffer(b''.join(bitmap.ljust(width, b'\0') for bitmap in bitmaps), dtype=np.uint8)
+    bits = np.unpackbits(packed.reshape(len(bitmaps), width), axis=1, bitorder='little')[:, :len(store_numbers)]
+    skus = np.asarray(skus)
+    return {store_code: skus[bits[:, position] == 1].tolist() for position, store_code in enumerate(store_numbers)}
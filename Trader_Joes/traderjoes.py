@@ -1,134 +1,351 @@
-import requests
+import argparse
+import asyncio
+import hashlib
 import json
+import os
+import random
+import time
+
+import httpx
 import pandas as pd
 
-def fetch_all_items(category_id, max_page_size, store_code):
-    url = "https://www.traderjoes.com/api/graphql"
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json',
+GRAPHQL_URL = "https://www.traderjoes.com/api/graphql"
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/json',
+}
+
+PRODUCTS_QUERY = """
+query SearchProducts($categoryId: String, $currentPage: Int, $pageSize: Int, $storeCode: String, $availability: String = "1", $published: String = "1") {
+  products(
+    filter: {store_code: {eq: $storeCode}, published: {eq: $published}, availability: {match: $availability}, category_id: {eq: $categoryId}}
+    currentPage: $currentPage
+    pageSize: $pageSize
+  ) {
+    items {
+      sku
+      item_title
+      category_hierarchy {
+        id
+        name
+        __typename
+      }
+      primary_image
+      primary_image_meta {
+        url
+        metadata
+        __typename
+      }
+      sales_size
+      sales_uom_description
+      price_range {
+        minimum_price {
+          final_price {
+            currency
+            value
+            __typename
+          }
+          __typename
+        }
+        __typename
+      }
+      retail_price
+      fun_tags
+      item_characteristics
+      __typename
     }
+    total_count
+    pageInfo: page_info {
+      currentPage: current_page
+      totalPages: total_pages
+      __typename
+    }
+    aggregations {
+      attribute_code
+      label
+      count
+      options {
+        label
+        value
+        count
+        __typename
+      }
+      __typename
+    }
+    __typename
+  }
+}
+"""
+
+
+# Token bucket shared by every request: allows short bursts up to `capacity`
+# while holding the long-run rate at `rate` requests per second
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# Raised when a page still fails after every retry, so the store is not checkpointed
+class FetchError(Exception):
+    pass
+
+
+# POST one GraphQL page, retrying network errors, 429s and 5xx responses with
+# exponential backoff plus jitter (or the server's Retry-After when it sends one)
+async def fetch_page(client, limiter, variables, url=GRAPHQL_URL, max_retries=5):
+    payload = json.dumps({"query": PRODUCTS_QUERY, "variables": variables})
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        retry_after = None
+        try:
+            response = await client.post(url, headers=HEADERS, content=payload)
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = response.headers.get("Retry-After")
+                raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+            if response.status_code >= 400:
+                # Other client errors will not fix themselves on a retry
+                raise FetchError(f"HTTP {response.status_code} for store {variables['storeCode']}")
+            data = response.json()
+            if 'errors' in data:
+                raise FetchError(f"API Error: {data['errors']}")
+            return data
+        except (httpx.HTTPError, ValueError) as e:
+            if attempt == max_retries:
+                raise FetchError(f"Error fetching page {variables['currentPage']} for store {variables['storeCode']}: {e}")
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(60, 2 ** attempt) * random.uniform(0.5, 1.5)
+            await asyncio.sleep(delay)
 
+
+# Item fields that matter downstream; a change in any of them is a "changed" delta
+HASHED_FIELDS = ['item_title', 'category_hierarchy', 'sales_size', 'sales_uom_description',
+                 'retail_price', 'fun_tags', 'item_characteristics']
+
+
+def item_hash(item):
+    content = json.dumps({field: item.get(field) for field in HASHED_FIELDS}, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+# Cheap fingerprint of a store's catalog taken from its first page: the total
+# item count plus the sku and content hash of every item on that page
+def page_signature(products):
+    entries = sorted((str(item['sku']), item_hash(item)) for item in products['items'])
+    content = json.dumps([products.get('total_count'), entries])
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+# Fetch every page of items for one store. Returns (items, signature).
+# If the first page matches known_signature the store is taken as unchanged,
+# the remaining pages are skipped and items is None.
+async def fetch_all_items(client, limiter, category_id, max_page_size, store_code, url=GRAPHQL_URL, record_dir=None,
+                          known_signature=None):
     current_page = 1
     all_items = []
+    signature = None
 
     while True:
-        query = """
-        query SearchProducts($categoryId: String, $currentPage: Int, $pageSize: Int, $storeCode: String, $availability: String = "1", $published: String = "1") {
-          products(
-            filter: {store_code: {eq: $storeCode}, published: {eq: $published}, availability: {match: $availability}, category_id: {eq: $categoryId}}
-            currentPage: $currentPage
-            pageSize: $pageSize
-          ) {
-            items {
-              sku
-              item_title
-              category_hierarchy {
-                id
-                name
-                __typename
-              }
-              primary_image
-              primary_image_meta {
-                url
-                metadata
-                __typename
-              }
-              sales_size
-              sales_uom_description
-              price_range {
-                minimum_price {
-                  final_price {
-                    currency
-                    value
-                    __typename
-                  }
-                  __typename
-                }
-                __typename
-              }
-              retail_price
-              fun_tags
-              item_characteristics
-              __typename
-            }
-            total_count
-            pageInfo: page_info {
-              currentPage: current_page
-              totalPages: total_pages
-              __typename
-            }
-            aggregations {
-              attribute_code
-              label
-              count
-              options {
-                label
-                value
-                count
-                __typename
-              }
-              __typename
-            }
-            __typename
-          }
-        }
-        """
-
         variables = {
             "categoryId": category_id,
             "currentPage": current_page,
             "pageSize": max_page_size,
             "storeCode": store_code,
         }
+        data = await fetch_page(client, limiter, variables, url=url)
+        if record_dir:
+            with open(os.path.join(record_dir, f"{store_code}_{current_page}.json"), "w") as file:
+                json.dump(data, file)
 
-        payload = json.dumps({"query": query, "variables": variables})
+        if current_page == 1:
+            signature = page_signature(data['data']['products'])
+            if signature == known_signature:
+                return None, signature
 
-        try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status()
-            data = response.json()
+        items = data['data']['products']['items']
+        for item in items:
+            item['storeCode'] = str(store_code)  # Convert store code to string
+            all_items.append(item)  # Add items to the list
 
-            if 'errors' in data:
-                print(f"API Error: {data['errors']}")
-                break
-            
-            items = data['data']['products']['items']
-            for item in items:
-                item['storeCode'] = str(store_code)  # Convert store code to string
-                all_items.append(item)  # Add items to the list
-            
-            total_pages = data['data']['products']['pageInfo']['totalPages']
-
-            if current_page >= total_pages:
-                break
-            
-            current_page += 1
-
-        except requests.RequestException as e:
-            print(f"Error fetching items: {e}")
+        total_pages = data['data']['products']['pageInfo']['totalPages']
+        if current_page >= total_pages:
             break
+        current_page += 1
 
-    return all_items
+    return all_items, signature
 
-def save_to_csv(unique_items, filename):
-    df = pd.DataFrame(unique_items)
-
-    # Group by item title and aggregate store codes
-    df = df.groupby(['item_title']).agg({
-        'sku': 'first',  # Keep the first SKU
-        'storeCode': lambda x: ', '.join(sorted(set(x))),  # Combine store codes
-        'category_hierarchy': 'first',  # Keep the first occurrence
-        'primary_image': 'first',
-        'primary_image_meta': 'first',
-        'sales_size': 'first',
-        'sales_uom_description': 'first',
-        'price_range': 'first',
-        'retail_price': 'first',
-        'fun_tags': 'first',
-        'item_characteristics': 'first',
-    }).reset_index()
 
+# Checkpoints: one JSON file per finished store, so an interrupted run resumes
+# with the stores it has not fetched yet
+def checkpoint_path(checkpoint_dir, store_code):
+    return os.path.join(checkpoint_dir, f"store_{store_code}.json")
+
+
+def load_checkpoint(checkpoint_dir, store_code):
+    path = checkpoint_path(checkpoint_dir, store_code)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_checkpoint(checkpoint_dir, store_code, items):
+    path = checkpoint_path(checkpoint_dir, store_code)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(items, file)
+    os.replace(temp_path, path)  # Atomic, so a crash never leaves half a checkpoint
+
+
+# Once every store is fetched the checkpoints are removed, so the next run starts fresh
+def clear_checkpoints(checkpoint_dir):
+    for name in os.listdir(checkpoint_dir):
+        if name.startswith("store_") and name.endswith(".json"):
+            os.remove(os.path.join(checkpoint_dir, name))
+
+
+# Snapshots: the last known items of every store, kept between runs for
+# incremental scraping. Stored with the page signature and fetch time.
+def load_snapshot(snapshot_dir, store_code):
+    return load_checkpoint(snapshot_dir, store_code)
+
+
+def save_snapshot(snapshot_dir, store_code, signature, items):
+    save_checkpoint(snapshot_dir, store_code, {"signature": signature, "fetched_at": time.time(), "items": items})
+
+
+# Compare a store's previous and current items by sku and content hash and
+# return the (store, sku) pairs that were added, removed or changed
+def diff_store(store_code, old_items, new_items):
+    old = {str(item['sku']): item for item in old_items}
+    new = {str(item['sku']): item for item in new_items}
+    deltas = []
+    for sku, item in new.items():
+        if sku not in old:
+            deltas.append({"store_code": store_code, "sku": sku, "change": "added", "item": item})
+        elif item_hash(item) != item_hash(old[sku]):
+            deltas.append({"store_code": store_code, "sku": sku, "change": "changed", "item": item})
+    for sku in old:
+        if sku not in new:
+            deltas.append({"store_code": store_code, "sku": sku, "change": "removed", "item": None})
+    return deltas
+
+
+def append_deltas(delta_file, deltas):
+    with open(delta_file, "a") as file:
+        for delta in deltas:
+            file.write(json.dumps(delta) + "\n")
+
+
+# Fetch all stores with at most `concurrency` stores in flight over one pooled client.
+# With snapshot_dir set the run is incremental: a store whose first page matches
+# its snapshot is not re-crawled (unless the snapshot is older than
+# full_refresh_days), and only the added/removed/changed (store, sku) pairs are
+# appended to delta_file for apply_store_deltas.py.
+async def fetch_stores(store_codes, category_id, max_page_size, concurrency=8, rate=5.0,
+                       checkpoint_dir="scrape_checkpoints", url=GRAPHQL_URL, record_dir=None,
+                       snapshot_dir=None, delta_file="store_deltas.jsonl", full_refresh_days=7):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    if record_dir:
+        os.makedirs(record_dir, exist_ok=True)
+    if snapshot_dir:
+        os.makedirs(snapshot_dir, exist_ok=True)
+    limiter = TokenBucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+    failed = []
+    summary = {"unchanged": 0, "refetched": 0, "deltas": 0}
+
+    async def fetch_store(client, store_code):
+        items = load_checkpoint(checkpoint_dir, store_code)
+        if items is not None:
+            results[store_code] = items
+            return
+
+        snapshot = load_snapshot(snapshot_dir, store_code) if snapshot_dir else None
+        known_signature = None
+        if snapshot and time.time() - snapshot["fetched_at"] < full_refresh_days * 86400:
+            known_signature = snapshot["signature"]
+
+        async with semaphore:
+            print(f"Fetching items for store code: {store_code}")
+            try:
+                items, signature = await fetch_all_items(client, limiter, category_id, max_page_size, store_code,
+                                                         url=url, record_dir=record_dir,
+                                                         known_signature=known_signature)
+            except FetchError as e:
+                print(e)
+                failed.append(store_code)
+                return
+
+        if snapshot_dir:
+            if items is None:
+                items = snapshot["items"]
+                summary["unchanged"] += 1
+            else:
+                deltas = diff_store(store_code, snapshot["items"] if snapshot else [], items)
+                append_deltas(delta_file, deltas)
+                save_snapshot(snapshot_dir, store_code, signature, items)
+                summary["refetched"] += 1
+                summary["deltas"] += len(deltas)
+        save_checkpoint(checkpoint_dir, store_code, items)
+        results[store_code] = items
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*[fetch_store(client, store_code) for store_code in store_codes])
+
+    if failed:
+        print(f"{len(failed)} stores failed and will be retried on the next run: {', '.join(failed)}")
+    else:
+        clear_checkpoints(checkpoint_dir)
+    if snapshot_dir:
+        print(f"Incremental run: {summary['unchanged']} stores unchanged, {summary['refetched']} re-crawled, "
+              f"{summary['deltas']} (store, sku) changes written to {delta_file}")
+    # Keep the store order of store_numbers.csv
+    return [item for store_code in store_codes for item in results.get(store_code, [])]
+
+# Merge the per-store item lists into one row per sku, with the set of stores
+# that carry it. Each item is looked at once and store membership is a set
+# lookup, so this is linear in the number of (store, item) rows.
+def aggregate_items(all_items):
+    items_by_sku = {}
+    stores_by_sku = {}
+    for item in all_items:
+        sku = str(item['sku'])
+        if sku not in items_by_sku:
+            items_by_sku[sku] = item  # Keep the first occurrence
+            stores_by_sku[sku] = set()
+        stores_by_sku[sku].add(str(item['storeCode']))
+
+    unique_items = []
+    for sku, item in items_by_sku.items():
+        store_codes = sorted(stores_by_sku[sku], key=int)
+        unique_items.append({**item, 'storeCode': ', '.join(store_codes)})
+    return unique_items
+
+CSV_COLUMNS = ['item_title', 'sku', 'storeCode', 'category_hierarchy', 'primary_image', 'primary_image_meta',
+               'sales_size', 'sales_uom_description', 'price_range', 'retail_price', 'fun_tags',
+               'item_characteristics']
+
+def save_to_csv(unique_items, filename):
+    df = pd.DataFrame(unique_items).reindex(columns=CSV_COLUMNS).sort_values("item_title")
     df.to_csv(filename, index=False)
     print(f"Data saved to {filename}")
 
@@ -139,6 +356,20 @@ def load_store_codes_from_csv(csv_file):
     return store_codes
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape Trader Joe's items for every store")
+    parser.add_argument("--concurrency", type=int, default=8, help="Stores fetched at the same time")
+    parser.add_argument("--rate", type=float, default=5.0, help="Maximum GraphQL requests per second")
+    parser.add_argument("--checkpoint-dir", default="scrape_checkpoints", help="Per-store checkpoints for resuming")
+    parser.add_argument("--url", default=GRAPHQL_URL, help="GraphQL endpoint (e.g. a local replay server)")
+    parser.add_argument("--record-dir", default=None, help="Save every raw GraphQL response here for replay")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-crawl stores that changed since the last snapshot and write deltas")
+    parser.add_argument("--snapshot-dir", default="store_snapshots", help="Per-store snapshots for --incremental")
+    parser.add_argument("--delta-file", default="store_deltas.jsonl", help="Where --incremental writes deltas")
+    parser.add_argument("--full-refresh-days", type=float, default=7,
+                        help="Re-crawl a store fully once its snapshot is this old")
+    args = parser.parse_args()
+
     category_id = "8"  # Set this to the desired category ID
     max_page_size = 100  # Use the maximum allowed page size
     filename = "trader_joes_items.csv"
@@ -147,30 +378,16 @@ def main():
     csv_file = 'store_numbers.csv'  # CSV file with store codes
     store_codes = load_store_codes_from_csv(csv_file)
 
-    all_items = []
-
-    for store_code in store_codes:
-        print(f"Fetching items for store code: {store_code}")
-        items = fetch_all_items(category_id, max_page_size, store_code)
-        all_items.extend(items)
+    all_items = asyncio.run(fetch_stores(
+        store_codes, category_id, max_page_size,
+        concurrency=args.concurrency, rate=args.rate, checkpoint_dir=args.checkpoint_dir,
+        url=args.url, record_dir=args.record_dir,
+        snapshot_dir=args.snapshot_dir if args.incremental else None,
+        delta_file=args.delta_file, full_refresh_days=args.full_refresh_days,
+    ))
 
-    # Use a dictionary to ensure items are unique based on item title
-    item_dict = {}
-
-    for item in all_items:
-        item_name = item['item_title'].lower()  # Normalize the item title for uniqueness check
-        if item_name not in item_dict:
-            item_dict[item_name] = item  # Store the first occurrence
-            item_dict[item_name]['storeCode'] = str(item['storeCode'])  # Ensure storeCode is a string
-        else:
-            # Ensure that storeCode is always a string and append it
-            existing_store_codes = item_dict[item_name]['storeCode']
-            new_store_code = str(item['storeCode'])
-            if new_store_code not in existing_store_codes.split(', '):
-                item_dict[item_name]['storeCode'] += f", {new_store_code}"  # Append the new store code
-
-    # Convert the dictionary back to a list
-    unique_items = list(item_dict.values())
+    # One row per sku with every store that carries it
+    unique_items = aggregate_items(all_items)
 
     # Save the results to a CSV file
     save_to_csv(unique_items, filename)
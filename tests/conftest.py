@@ -0,0 +1,55 @@
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+import uvicorn
+
+# The scripts import their neighbours as top-level modules, so every script
+# directory goes on the path (plus the repository root for the Product package)
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("", "API", "Trader_Joes", "Edamam"):
+    path = os.path.join(root_dir, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+# Run one of the http.server stand-ins on a free port; yields its base URL
+def serve_http(handler_class):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# The fake OpenAI server on a free port, answering in 50ms. Yields the base URL
+# LLMClient expects (ending in /v1); the call counter starts at zero.
+@pytest.fixture
+def fake_llm():
+    import fake_llm_server
+
+    fake_llm_server.settings["latency"] = 0.05
+    fake_llm_server.call_count["completions"] = 0
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(fake_llm_server.app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("The fake LLM server did not start")
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}/v1"
+    finally:
+        server.should_exit = True
+        thread.join(5)
+        sock.close()
@@ -0,0 +1,90 @@
+import asyncio
+import csv
+import json
+import random
+import threading
+
+import httpx
+import pytest
+
+import Edamam_Data_Pipeline as pipeline
+from conftest import serve_http
+from mock_edamam_server import EdamamHandler, fake_hit
+
+DISHES = ["Mushroom Risotto", "Fish Tacos with Slaw", "Chicken Pot Pie", "Vegetable Lo Mein", "Shrimp Gumbo"]
+
+
+# A mock Edamam server with its own counters; yields (search URL, stats URL)
+def edamam_server(**settings):
+    settings.update(lock=threading.Lock(), request_times=[], counts={"ok": 0, "throttled": 0, "failed": 0})
+    handler = type("Handler", (EdamamHandler,), settings)
+    for base_url in serve_http(handler):
+        yield base_url + "/api/recipes/v2", base_url + "/stats"
+
+
+# Backoff between retries is cut to milliseconds so the tests stay fast
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    monkeypatch.setattr(pipeline.random, "uniform", lambda low, high: 0.005)
+
+
+def run_pipeline(url, tmp_path, dishes=DISHES, **kwargs):
+    csv_file, checkpoint = tmp_path / "recipes.csv", tmp_path / "edamam_checkpoint.jsonl"
+    finished = asyncio.run(pipeline.fetch_dishes(dishes, csv_file=str(csv_file), checkpoint=str(checkpoint),
+                                                 url=url, **kwargs))
+    return finished, csv_file, checkpoint
+
+
+def read_labels(csv_file):
+    with open(csv_file, newline="") as file:
+        return [row["recipe_label"] for row in csv.DictReader(file)]
+
+
+def test_server_errors_are_retried(tmp_path):
+    random.seed(20)
+    for url, stats_url in edamam_server(fail_rate=0.3):
+        finished, csv_file, checkpoint = run_pipeline(url, tmp_path, rate=50.0, max_rate=50.0)
+        stats = httpx.get(stats_url).json()
+    assert finished
+    assert read_labels(csv_file) == DISHES
+    assert not checkpoint.exists()
+    assert stats["failed"] > 0
+
+
+def test_rate_limit_is_honoured(tmp_path):
+    for url, stats_url in edamam_server(per_minute=2, window_seconds=0.5):
+        finished, csv_file, _ = run_pipeline(url, tmp_path, rate=20.0, max_rate=20.0)
+        stats = httpx.get(stats_url).json()
+    assert finished
+    assert read_labels(csv_file) == DISHES
+    assert stats["ok"] == len(DISHES)
+    assert stats["throttled"] > 0
+
+
+def test_unavailable_api_fails_without_retrying_forever():
+    async def fetch(url):
+        async with httpx.AsyncClient() as client:
+            return await pipeline.fetch_recipe(client, pipeline.AdaptiveRateLimiter(rate=50.0), DISHES[0],
+                                               url=url, max_retries=2)
+
+    for url, stats_url in edamam_server(fail_rate=1.0):
+        with pytest.raises(pipeline.FetchError, match="HTTP 503"):
+            asyncio.run(fetch(url))
+        stats = httpx.get(stats_url).json()
+    assert stats["failed"] == 3
+
+
+def test_run_resumes_from_the_checkpoint(tmp_path):
+    # An earlier run finished the first dish before it was interrupted
+    first_row = pipeline.recipe_row(fake_hit(DISHES[0]))
+    with open(tmp_path / "edamam_checkpoint.jsonl", "w") as file:
+        file.write(json.dumps({"dish": DISHES[0], "row": first_row}) + "\n")
+        file.write('{"dish": "Half writ')
+
+    for url, stats_url in edamam_server():
+        finished, csv_file, checkpoint = run_pipeline(url, tmp_path, rate=50.0, max_rate=50.0)
+        stats = httpx.get(stats_url).json()
+    assert finished
+    assert stats["ok"] == len(DISHES) - 1
+    assert read_labels(csv_file) == DISHES
+    assert not checkpoint.exists()
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from job_queue import JobQueue, QueueFull
+from llm_client import LLMClient
+
+
+def jobs_collection():
+    return AsyncMongoMockClient()["test"]["Meal_Plan_Jobs"]
+
+
+# A meal-plan job that asks the fake LLM server for a plan
+def plan_handler(llm_client):
+    async def handler(payload):
+        messages = [{"role": "system", "content": f"You will receive {payload['recipes']} recipes."},
+                    {"role": "user", "content": payload["mood"]}]
+        return json.loads(await llm_client.chat(messages))
+    return handler
+
+
+def test_identical_submits_share_one_job(fake_llm):
+    import fake_llm_server
+
+    async def run():
+        collection = jobs_collection()
+        insert_one = collection.insert_one
+
+        # A slow insert leaves room for the other submits to race the first one
+        async def slow_insert(document):
+            await asyncio.sleep(0.05)
+            return await insert_one(document)
+        collection.insert_one = slow_insert
+
+        llm_client = LLMClient("fake", base_url=fake_llm)
+        queue = JobQueue(collection, plan_handler(llm_client))
+        await queue.start()
+        try:
+            payload = {"mood": "happy", "recipes": 7}
+            submitted = await asyncio.gather(*[queue.submit(dict(payload)) for _ in range(5)])
+            job = await queue.get(submitted[0][0], wait=5)
+            documents = await collection.count_documents({})
+        finally:
+            await queue.stop()
+            await llm_client.close()
+        return submitted, job, documents
+
+    submitted, job, documents = asyncio.run(run())
+    assert len({job_id for job_id, _ in submitted}) == 1
+    assert sorted(deduplicated for _, deduplicated in submitted) == [False, True, True, True, True]
+    assert documents == 1
+    assert job["status"] == "done"
+    assert len(job["result"]["meals"]) == 21
+    assert fake_llm_server.call_count["completions"] == 1
+
+
+def test_full_queue_leaves_no_job_behind():
+    async def run():
+        collection = jobs_collection()
+        # No workers, so nothing leaves the queue
+        queue = JobQueue(collection, None, workers=0, max_pending=2)
+        await queue.start()
+        results = await asyncio.gather(*[queue.submit({"n": n}) for n in range(3)], return_exceptions=True)
+        await queue.stop()
+        return results, await collection.count_documents({})
+
+    results, documents = asyncio.run(run())
+    assert sum(isinstance(result, QueueFull) for result in results) == 1
+    assert documents == 2
+
+
+def test_orphaned_jobs_are_requeued_or_failed(fake_llm):
+    async def run():
+        collection = jobs_collection()
+        stale = time.time() - 60
+        # Left behind by a process that stopped mid-job; the second was written
+        # before jobs kept their payload
+        await collection.insert_many([
+            {"_id": "interrupted", "key": JobQueue.make_key({"mood": "calm", "recipes": 3}),
+             "payload": {"mood": "calm", "recipes": 3}, "status": "running", "result": None, "error": None,
+             "created_at": stale, "updated_at": stale},
+            {"_id": "no_payload", "key": None, "status": "queued", "result": None, "error": None,
+             "created_at": stale, "updated_at": stale},
+        ])
+        llm_client = LLMClient("fake", base_url=fake_llm)
+        queue = JobQueue(collection, plan_handler(llm_client), orphan_seconds=30)
+        await queue.start()
+        try:
+            interrupted = await queue.get("interrupted", wait=5)
+            no_payload = await queue.get("no_payload", wait=5)
+        finally:
+            await queue.stop()
+            await llm_client.close()
+        return interrupted, no_payload
+
+    interrupted, no_payload = asyncio.run(run())
+    assert interrupted["status"] == "done"
+    assert interrupted["result"]["meals"] == [n % 3 for n in range(21)]
+    assert no_payload["status"] == "failed"
+    assert no_payload["error"] == "Interrupted by a server restart"
+
+
+def test_recent_jobs_are_not_taken_as_orphans():
+    async def run():
+        collection = jobs_collection()
+        now = time.time()
+        await collection.insert_one({"_id": "busy", "key": "k", "payload": {"n": 1}, "status": "running",
+                                     "created_at": now, "updated_at": now})
+        queue = JobQueue(collection, None, workers=0, orphan_seconds=600)
+        queue.queue = asyncio.Queue()
+        return await queue.recover_orphans(), await collection.find_one({"_id": "busy"})
+
+    (requeued, failed), job = asyncio.run(run())
+    assert (requeued, failed) == (0, 0)
+    assert job["status"] == "running"
+
+
+def test_finished_jobs_expire_through_the_ttl_index(fake_llm):
+    async def run():
+        collection = jobs_collection()
+        llm_client = LLMClient("fake", base_url=fake_llm)
+        queue = JobQueue(collection, plan_handler(llm_client), finished_ttl_seconds=3600)
+        await queue.start()
+        try:
+            job_id, _ = await queue.submit({"mood": "tired", "recipes": 5})
+            await queue.get(job_id, wait=5)
+            indexes = await collection.index_information()
+            document = await collection.find_one({"_id": job_id})
+        finally:
+            await queue.stop()
+            await llm_client.close()
+        return indexes, document
+
+    indexes, document = asyncio.run(run())
+    assert indexes["finished_at_ttl"]["key"] == [("finished_at", 1)]
+    assert indexes["finished_at_ttl"]["expireAfterSeconds"] == 3600
+    # The TTL index only removes documents whose finished_at is a date
+    assert isinstance(document["finished_at"], datetime)
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import llm_cache
+from llm_cache import LLMCache
+from llm_client import LLMClient
+
+MESSAGES = [{"role": "system", "content": "Explain the meal plan."}, {"role": "user", "content": "happy"}]
+
+
+# Returns the two answers and the cache stats (closing the client closes the cache)
+def chat_twice(base_url, cache, validate=None):
+    async def run():
+        client = LLMClient("fake", base_url=base_url, cache=cache)
+        try:
+            answers = [await client.chat(MESSAGES, cache_inputs={"mood": "happy"}, validate=validate, temperature=0)
+                       for _ in range(2)]
+            return answers, cache.stats()
+        finally:
+            await client.close()
+    return asyncio.run(run())
+
+
+def test_repeated_prompt_is_answered_from_the_cache(fake_llm, tmp_path):
+    import fake_llm_server
+
+    (first, second), _ = chat_twice(fake_llm, LLMCache(str(tmp_path / "llm_cache.sqlite3")))
+    assert first == second
+    assert fake_llm_server.call_count["completions"] == 1
+
+    # The entry survives a restart, and a hit reports the tokens it saved
+    _, stats = chat_twice(fake_llm, LLMCache(str(tmp_path / "llm_cache.sqlite3")))
+    assert stats["entries"] == 1
+    assert fake_llm_server.call_count["completions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 0
+    assert stats["tokens_saved"] > 0
+
+
+def test_rejected_answers_are_not_cached(fake_llm, tmp_path):
+    import fake_llm_server
+
+    # The fake server explains in prose, so a JSON validator rejects every answer
+    _, stats = chat_twice(fake_llm, LLMCache(str(tmp_path / "llm_cache.sqlite3")), validate=json.loads)
+    assert fake_llm_server.call_count["completions"] == 2
+    assert stats["entries"] == 0
+
+
+def test_streamed_answer_is_cached_whole(fake_llm, tmp_path):
+    import fake_llm_server
+
+    async def run():
+        client = LLMClient("fake", base_url=fake_llm, cache=LLMCache(str(tmp_path / "llm_cache.sqlite3")))
+        try:
+            streams = []
+            for _ in range(2):
+                streams.append([chunk async for chunk in client.stream_chat(MESSAGES, cache_inputs={"mood": "happy"})])
+            return streams
+        finally:
+            await client.close()
+
+    first, second = asyncio.run(run())
+    assert len(first) > 1
+    assert second == ["".join(first)]
+    assert fake_llm_server.call_count["completions"] == 1
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite3"), ttl_seconds=60)
+    now = 1_000_000.0
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now)
+    cache.set("key", "answer", 10, 1.0)
+    now += 59
+    assert cache.get("key") == "answer"
+    now += 2
+    assert cache.get("key") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite3"), max_entries=2)
+    clock = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr(llm_cache.time, "time", lambda: float(next(clock)))
+    cache.set("a", "answer a", 10, 1.0)
+    cache.set("b", "answer b", 10, 1.0)
+    cache.get("a")
+    cache.set("c", "answer c", 10, 1.0)
+    assert cache.get("b") is None
+    assert cache.get("a") == "answer a"
+    assert cache.get("c") == "answer c"
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import random
+
+import pytest
+
+import traderjoes
+from conftest import serve_http
+from graphql_replay_server import ReplayHandler
+
+
+def make_item(sku, price=2.99):
+    return {"item_title": f"Item {sku}", "sku": str(sku), "category_hierarchy": [{"name": "Food"}],
+            "sales_size": 8, "sales_uom_description": "Oz", "retail_price": str(price),
+            "fun_tags": [], "item_characteristics": []}
+
+
+def write_page(responses_dir, store_code, page, total_pages, items, total_count):
+    payload = {"data": {"products": {"items": items, "total_count": total_count,
+                                     "pageInfo": {"currentPage": page, "totalPages": total_pages}}}}
+    with open(os.path.join(responses_dir, f"{store_code}_{page}.json"), "w") as file:
+        json.dump(payload, file)
+
+
+# Store 701 has two pages, store 702 one
+@pytest.fixture
+def responses_dir(tmp_path):
+    directory = tmp_path / "recorded_responses"
+    directory.mkdir()
+    write_page(directory, "701", 1, 2, [make_item(1), make_item(2)], 3)
+    write_page(directory, "701", 2, 2, [make_item(3)], 3)
+    write_page(directory, "702", 1, 1, [make_item(1), make_item(4)], 2)
+    return directory
+
+
+def replay_server(responses_dir, fail_rate):
+    handler = type("Handler", (ReplayHandler,), {"responses_dir": str(responses_dir), "fail_rate": fail_rate})
+    return serve_http(handler)
+
+
+@pytest.fixture
+def flaky_server(responses_dir):
+    # Seeded so the 429/503 answers are the same on every run
+    random.seed(13)
+    for base_url in replay_server(responses_dir, fail_rate=0.3):
+        yield base_url + "/api/graphql"
+
+
+@pytest.fixture
+def replay_url(responses_dir):
+    for base_url in replay_server(responses_dir, fail_rate=0.0):
+        yield base_url + "/api/graphql"
+
+
+def scrape(url, tmp_path, store_codes=("701", "702"), **kwargs):
+    return asyncio.run(traderjoes.fetch_stores(list(store_codes), "2", 100, rate=100.0, url=url,
+                                               checkpoint_dir=str(tmp_path / "checkpoints"), **kwargs))
+
+
+def test_every_page_is_fetched_despite_throttling(flaky_server, tmp_path):
+    items = scrape(flaky_server, tmp_path)
+    assert [(item["storeCode"], item["sku"]) for item in items] == [
+        ("701", "1"), ("701", "2"), ("701", "3"), ("702", "1"), ("702", "4")]
+    # A complete run leaves no checkpoints behind
+    assert os.listdir(tmp_path / "checkpoints") == []
+
+
+def test_failed_store_keeps_the_checkpoints_for_the_next_run(replay_url, responses_dir, tmp_path):
+    with open(responses_dir / "703_1.json", "w") as file:
+        json.dump({"errors": [{"message": "Internal error"}]}, file)
+    items = scrape(replay_url, tmp_path, store_codes=("701", "702", "703"))
+    assert {item["storeCode"] for item in items} == {"701", "702"}
+    assert sorted(os.listdir(tmp_path / "checkpoints")) == ["store_701.json", "store_702.json"]
+
+    # The next run takes 701 and 702 from their checkpoints, not the server
+    write_page(responses_dir, "701", 1, 1, [], 0)
+    write_page(responses_dir, "703", 1, 1, [make_item(5)], 1)
+    items = scrape(replay_url, tmp_path, store_codes=("701", "702", "703"))
+    assert [(item["storeCode"], item["sku"]) for item in items] == [
+        ("701", "1"), ("701", "2"), ("701", "3"), ("702", "1"), ("702", "4"), ("703", "5")]
+    assert os.listdir(tmp_path / "checkpoints") == []
+
+
+def test_incremental_run_writes_only_the_changes(replay_url, responses_dir, tmp_path):
+    delta_file = tmp_path / "store_deltas.jsonl"
+    incremental = {"snapshot_dir": str(tmp_path / "snapshots"), "delta_file": str(delta_file)}
+
+    scrape(replay_url, tmp_path, **incremental)
+    deltas = [json.loads(line) for line in delta_file.read_text().splitlines()]
+    assert sorted((delta["store_code"], delta["sku"], delta["change"]) for delta in deltas) == [
+        ("701", "1", "added"), ("701", "2", "added"), ("701", "3", "added"),
+        ("702", "1", "added"), ("702", "4", "added")]
+
+    # Nothing changed: every store is recognised from its first page
+    delta_file.unlink()
+    items = scrape(replay_url, tmp_path, **incremental)
+    assert not delta_file.exists()
+    assert len(items) == 5
+
+    write_page(responses_dir, "702", 1, 1, [make_item(1, price=3.49)], 1)
+    scrape(replay_url, tmp_path, **incremental)
+    deltas = [json.loads(line) for line in delta_file.read_text().splitlines()]
+    assert sorted((delta["store_code"], delta["sku"], delta["change"]) for delta in deltas) == [
+        ("702", "1", "changed"), ("702", "4", "removed")]